@@ -126,6 +126,21 @@ case $1 in
             --workdir /ws \
             $HERE/$NAME.sif /bin/bash
     ;;
+    -t) # tests; those needing Xvfb skip without it
+        shift
+        python -m pytest $HERE/tests $@
+    ;;
+    -rb) # benchmarks, compared against this machine's baseline (saved on first run)
+        shift
+        export PYTHONPATH=$HERE/src:$PYTHONPATH
+        BASELINE=$HERE/bench_baseline.json # not committed: timings are machine-specific
+        if [ -f $BASELINE ]; then
+            python -m $NAME bench --baseline $BASELINE $@
+        else
+            echo "no baseline yet, saving one to $BASELINE"
+            python -m $NAME bench --save $BASELINE $@
+        fi
+    ;;
     -rt) # single manual test
             # --size 20 \
 
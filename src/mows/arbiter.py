@@ -0,0 +1,146 @@
+"""Arbitration between clients sharing one server.
+
+Several ``mows send`` clients may drive the same machine.  Who gets to
+inject is decided per session (see resume.py) by the server's mode:
+
+  shared     every session's input is injected (the default)
+  exclusive  one session is in control; input from the others is dropped
+             until the controller has been idle for ``idle`` seconds or
+             its session ended, then the next session to send input
+             takes over
+  priority   as exclusive, except that a session with a higher priority
+             (sent in its hello) takes over at once
+
+A session losing control has the keys and buttons it holds released.
+In every mode held keys and buttons are counted across sessions, so one
+client cannot undo another's: a key already held by another session is
+not pressed again, and is only released when its last holder lets go.
+
+Each session also injects through its own injector lane (injector.py),
+so a busy client delays the others by at most one event per turn.
+"""
+
+import time
+
+from .resume import Session
+
+MODES = ("shared", "exclusive", "priority")
+IDLE = 2.0
+
+_HELD = frozenset({"key_press", "key_release", "mouse_click"})
+
+
+class Arbiter:
+    """Decides which input events are injected, and tracks held input.
+
+    ``notify(session, granted)`` is called when a session gains or loses
+    control (exclusive and priority modes).  Release events owed by a
+    session that just lost control collect in ``pending`` as (session,
+    event) pairs, for the caller to inject on that session's lane.
+    """
+
+    def __init__(self, mode: str = "shared", idle: float = IDLE, notify=None):
+        if mode not in MODES:
+            raise ValueError(f"unknown arbitration mode: {mode!r}")
+        self.mode = mode
+        self.idle = idle
+        self.notify = notify
+        self.controller = None  # Session in control, exclusive and priority modes
+        self.sessions = set()  # every session that sent input and has not ended
+        self.pending = []
+        self.handovers = 0
+        self._holders = {}  # held key or button -> set of sessions holding it
+        self._shared = mode == "shared"
+
+    def admit(self, session: Session, event: dict) -> bool:
+        """True if ``event`` from ``session`` should be injected."""
+        self.sessions.add(session)
+        if not self._shared:
+            if session is not self.controller and not self._take(session):
+                session.denied += 1
+                return False
+            session.last_input = time.monotonic()
+        if event["type"] in _HELD:
+            return self._track(session, event)
+        return True
+
+    def _take(self, session: Session) -> bool:
+        now = time.monotonic()
+        controller = self.controller
+        if controller is not None:
+            if now - controller.last_input < self.idle and not (
+                    self.mode == "priority" and session.priority > controller.priority):
+                if session.control is not False:
+                    session.control = False
+                    self._notify(session, False)
+                return False
+            self.pending += [(controller, event) for event in self.release(controller)]
+            controller.control = False
+            self._notify(controller, False)
+            self.handovers += 1
+        self.controller = session
+        session.control = True
+        self._notify(session, True)
+        return True
+
+    def _notify(self, session: Session, granted: bool):
+        if self.notify is not None:
+            self.notify(session, granted)
+
+    def _track(self, session: Session, event: dict) -> bool:
+        t = event["type"]
+        if t == "mouse_click":
+            held = ("button", event["button"])
+            press = event["pressed"]
+            if press:
+                session.buttons.add(event["button"])
+            else:
+                session.buttons.discard(event["button"])
+        else:
+            key = event["key"]
+            held = tuple(sorted(key.items()))
+            press = t == "key_press"
+            if press:
+                session.keys[held] = key
+            else:
+                session.keys.pop(held, None)
+        holders = self._holders.get(held)
+        if press:
+            if holders is None:
+                self._holders[held] = {session}
+                return True
+            holders.add(session)
+            # a repeat from the session already holding it is injected
+            # (autorepeat); a press of a key someone else holds is not
+            return len(holders) == 1
+        if holders is None:
+            return True
+        holders.discard(session)
+        if holders:
+            return False
+        del self._holders[held]
+        return True
+
+    def release(self, session: Session) -> list:
+        """Events letting go of what ``session`` holds and nobody else does."""
+        events = []
+        for event in session.release_events():
+            if event["type"] == "mouse_click":
+                held = ("button", event["button"])
+            else:
+                held = tuple(sorted(event["key"].items()))
+            holders = self._holders.get(held)
+            if holders is not None:
+                holders.discard(session)
+                if holders:
+                    continue
+                del self._holders[held]
+            events.append(event)
+        return events
+
+    def leave(self, session: Session) -> list:
+        """``session`` ended: give up its control and return its release events."""
+        self.sessions.discard(session)
+        if self.controller is session:
+            self.controller = None
+        return self.release(session)
@@ -0,0 +1,297 @@
+"""Injection backends for the mows server.
+
+A backend turns decoded events into input on the local machine.  The
+injector thread is the only caller, so backends need not be thread-safe.
+
+  move(dx, dy)            relative pointer motion
+  move_to(x, y)           absolute pointer position, in desktop pixels
+  desktop() -> bounds     (x, y, width, height) of the virtual desktop
+                          that move_to places in, or None if unknown;
+                          by default probed with screen.probe
+  button(name, pressed)   pynput Button name, e.g. "left"
+  scroll(dx, dy)
+  key(key, pressed)       serialized key dict, see protocol.serialize_key
+  type_text(text)         type a string; by default one key() press and
+                          release per character
+  clipboard_get() -> str
+  clipboard_set(text)
+  flush()                 called each time the injector drains its queue
+  close()
+
+Backends (``mows serve --backend``):
+  pynput   pynput controllers, relative moves via X11/Win32 (default)
+  xtest    native X11 XTEST, see xtest.py (Linux)
+  null     discards everything; for load-testing the network path
+  record   keeps every call in memory; for checking what was injected
+"""
+
+import sys
+import time
+from collections import Counter, deque
+
+from . import screen
+from .protocol import deserialize_button, deserialize_key
+
+# characters typed with a special key rather than as themselves
+TYPED_KEYS = {
+    "\n": {"kind": "special", "name": "enter"},
+    "\r": {"kind": "special", "name": "enter"},
+    "\t": {"kind": "special", "name": "tab"},
+    "\b": {"kind": "special", "name": "backspace"},
+}
+
+
+class Backend:
+    """Injection backend interface.  Clipboard access defaults to pyperclip."""
+
+    name = ""
+
+    def move(self, dx, dy):
+        raise NotImplementedError
+
+    def button(self, name: str, pressed: bool):
+        raise NotImplementedError
+
+    def scroll(self, dx, dy):
+        raise NotImplementedError
+
+    def key(self, key: dict, pressed: bool):
+        raise NotImplementedError
+
+    def move_to(self, x: int, y: int):
+        raise NotImplementedError
+
+    def desktop(self) -> tuple | None:
+        return screen.probe()
+
+    def type_text(self, text: str):
+        key = self.key
+        for char in text:
+            k = TYPED_KEYS.get(char) or {"kind": "char", "char": char}
+            key(k, True)
+            key(k, False)
+
+    def clipboard_get(self) -> str:
+        import pyperclip
+        return pyperclip.paste()
+
+    def clipboard_set(self, text: str):
+        import pyperclip
+        pyperclip.copy(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ── pynput ────────────────────────────────────────────────────────
+
+def _make_rel_mover():
+    """Bypass pynput's mouse.move() to avoid its position read-back,
+    which causes drift from DPI rounding (Win) or async lag (X11).
+
+    On Linux:  XWarpPointer with src=dst=0 does a true relative move
+               without querying the current position first.
+    On Windows: mouse_event(MOUSEEVENTF_MOVE) sends relative pixel
+               deltas directly; DPI awareness is set so coordinates
+               are consistent.
+    """
+    if sys.platform == 'linux':
+        try:
+            import ctypes
+            x11 = screen.libx11()
+            if x11 is None:
+                return None
+            x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            x11.XOpenDisplay.restype = ctypes.c_void_p
+            x11.XFlush.argtypes = [ctypes.c_void_p]
+            x11.XFlush.restype = ctypes.c_int
+            x11.XWarpPointer.argtypes = [
+                ctypes.c_void_p,               # Display *
+                ctypes.c_ulong, ctypes.c_ulong, # src_window, dst_window
+                ctypes.c_int, ctypes.c_int,     # src_x, src_y
+                ctypes.c_uint, ctypes.c_uint,   # src_width, src_height
+                ctypes.c_int, ctypes.c_int,     # dst_x, dst_y
+            ]
+            x11.XWarpPointer.restype = ctypes.c_int
+            dpy = x11.XOpenDisplay(None)
+            if not dpy:
+                return None
+
+            def move(dx, dy):
+                x11.XWarpPointer(dpy, 0, 0, 0, 0, 0, 0, int(dx), int(dy))
+                x11.XFlush(dpy)
+
+            return move
+        except Exception:
+            return None
+
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            try:
+                ctypes.windll.shcore.SetProcessDpiAwareness(2)
+            except Exception:
+                pass
+
+            def move(dx, dy):
+                ctypes.windll.user32.mouse_event(0x0001, int(dx), int(dy), 0, 0)
+
+            return move
+        except Exception:
+            return None
+
+    return None
+
+
+class PynputBackend(Backend):
+    """pynput controllers, with relative moves through ``_make_rel_mover``."""
+
+    name = "pynput"
+
+    def __init__(self):
+        from pynput.keyboard import Controller as KeyboardController
+        from pynput.mouse import Controller as MouseController
+        self._mouse = MouseController()
+        self._keyboard = KeyboardController()
+        self._rel_move = _make_rel_mover()
+
+    def move(self, dx, dy):
+        if self._rel_move:
+            self._rel_move(dx, dy)
+        else:
+            self._mouse.move(dx, dy)
+
+    def button(self, name: str, pressed: bool):
+        btn = deserialize_button(name)
+        if pressed:
+            self._mouse.press(btn)
+        else:
+            self._mouse.release(btn)
+
+    def move_to(self, x: int, y: int):
+        self._mouse.position = (x, y)
+
+    def scroll(self, dx, dy):
+        self._mouse.scroll(dx, dy)
+
+    def key(self, key: dict, pressed: bool):
+        k = deserialize_key(key)
+        if pressed:
+            self._keyboard.press(k)
+        else:
+            self._keyboard.release(k)
+
+    def type_text(self, text: str):
+        self._keyboard.type(text)
+
+
+# ── null and recording ────────────────────────────────────────────
+
+NOMINAL_DESKTOP = (0, 0, 1920, 1080)  # where the null backends place absolute positions
+
+class NullBackend(Backend):
+    """Accepts and discards everything; the clipboard lives in memory."""
+
+    name = "null"
+
+    def __init__(self):
+        self._clipboard = ""
+
+    def move(self, dx, dy):
+        pass
+
+    def move_to(self, x: int, y: int):
+        pass
+
+    def desktop(self) -> tuple:
+        return NOMINAL_DESKTOP
+
+    def button(self, name: str, pressed: bool):
+        pass
+
+    def scroll(self, dx, dy):
+        pass
+
+    def key(self, key: dict, pressed: bool):
+        pass
+
+    def type_text(self, text: str):
+        pass
+
+    def clipboard_get(self) -> str:
+        return self._clipboard
+
+    def clipboard_set(self, text: str):
+        self._clipboard = text
+
+
+class RecordingBackend(NullBackend):
+    """Keeps the newest ``limit`` calls as (monotonic_ns, method, args)."""
+
+    name = "record"
+
+    def __init__(self, limit: int = 1_000_000):
+        super().__init__()
+        self.calls = deque(maxlen=limit)
+        self.counts = Counter()
+
+    def _record(self, method: str, *args):
+        self.calls.append((time.monotonic_ns(), method, args))
+        self.counts[method] += 1
+
+    def move(self, dx, dy):
+        self._record("move", dx, dy)
+
+    def move_to(self, x: int, y: int):
+        self._record("move_to", x, y)
+
+    def button(self, name: str, pressed: bool):
+        self._record("button", name, pressed)
+
+    def scroll(self, dx, dy):
+        self._record("scroll", dx, dy)
+
+    def key(self, key: dict, pressed: bool):
+        self._record("key", key, pressed)
+
+    def type_text(self, text: str):
+        self._record("type_text", text)
+
+    def clipboard_get(self) -> str:
+        self._record("clipboard_get")
+        return self._clipboard
+
+    def clipboard_set(self, text: str):
+        self._record("clipboard_set", len(text))
+        self._clipboard = text
+
+    def flush(self):
+        self._record("flush")
+
+    def close(self):
+        summary = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        print(f"recorded calls: {summary or 'none'}")
+
+
+BACKENDS = ["pynput", "xtest", "null", "record"]
+
+
+def make_backend(name: str, display: str | None = None) -> Backend:
+    """Backend ``name`` injecting into X display ``display`` (default:
+    the one in DISPLAY).  The null backends accept any display."""
+    if name == "pynput":
+        if display is not None:
+            raise ValueError("the pynput backend only drives the display in DISPLAY; "
+                             "use the xtest backend for other displays")
+        return PynputBackend()
+    elif name == "xtest":
+        from .xtest import XTest
+        return XTest(display)
+    elif name == "null":
+        return NullBackend()
+    elif name == "record":
+        return RecordingBackend()
+    raise ValueError(f"unknown backend {name!r}, expected one of {', '.join(BACKENDS)}")
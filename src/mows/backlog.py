@@ -0,0 +1,233 @@
+"""Bounded send queue for ``mows send``.
+
+Hook callbacks queue encoded events faster than a stalled connection
+drains them.  Unbounded, the queue would grow for as long as the stall
+lasts and then replay the whole stale burst.  A Backlog holds at most
+``limit`` events.  When it fills, it is compacted:
+
+  - a run of adjacent moves becomes one move with the summed delta, and
+    likewise a run of adjacent scrolls; the merged event keeps the
+    capture time of the oldest
+  - of adjacent UDP motion syncs (motion.py) only the newest is kept,
+    since each carries the running totals, and likewise of adjacent
+    absolute positions (screen.py)
+  - a repeated press of a key or button already pressed in the backlog
+    (autorepeat) is dropped; the server's own autorepeat takes over
+  - everything else keeps its order, and a press and its release are
+    never merged away
+
+If that leaves it more than LOW_WATER full, the oldest events are shed
+down to LOW_WATER.  A shed press takes its release with it, even if the
+release is only captured later; a release whose press was already sent
+is never shed, so no key is left stuck on the server.  Control items
+(the pause toggle, stop and connection-lost sentinels) are always kept.
+"""
+
+import asyncio
+import json
+from collections import deque
+
+from .protocol import (
+    FLAG_TIME,
+    OP_KEY_PRESS,
+    OP_KEY_RELEASE,
+    OP_MOUSE_CLICK,
+    OP_NAMES,
+    BinaryCodec,
+    JsonCodec,
+    decode_message,
+    stamp,
+    unstamp,
+)
+
+BACKLOG = 1024
+LOW_WATER = 0.75
+
+_DELTAS = frozenset({"mouse_move", "mouse_scroll"})
+_LATEST = frozenset({"motion", "mouse_position"})  # each replaces the one before
+
+
+def _held(event: dict):
+    """(key or button, pressed) for a press or release, else (None, None)."""
+    t = event["type"]
+    if t == "mouse_click":
+        return ("button", event["button"]), event["pressed"]
+    if t == "key_press" or t == "key_release":
+        return ("key", tuple(sorted(event["key"].items()))), t == "key_press"
+    return None, None
+
+
+def _peek(item) -> list:
+    """[item, type, key or button, pressed] of an encoded event.  Binary
+    events are only looked at, not decoded: their packed key or button
+    identifies it."""
+    if isinstance(item, str):
+        event = json.loads(item)
+        return [item, event["type"], *_held(event)]
+    body = unstamp(item) if item[0] & FLAG_TIME else item
+    op = body[0]
+    if op == OP_KEY_PRESS or op == OP_KEY_RELEASE:
+        return [item, OP_NAMES[op], body[1:], op == OP_KEY_PRESS]
+    if op == OP_MOUSE_CLICK:
+        return [item, "mouse_click", body[1:2] + body[3:], bool(body[2])]
+    return [item, OP_NAMES[op], None, None]
+
+
+def _merge(entries: list, item):
+    """Add the delta of ``item`` to the move or scroll ending ``entries``."""
+    last = entries[-1]
+    event = decode_message(item)
+    if isinstance(last[0], dict):
+        last[0]["dx"] += event["dx"]
+        last[0]["dy"] += event["dy"]
+    else:
+        merged = decode_message(last[0])
+        merged["dx"] += event["dx"]
+        merged["dy"] += event["dy"]
+        merged["like"] = last[0]
+        last[0] = merged
+
+
+def _encode(event: dict):
+    """Encode a merged move or scroll like the events it was merged from."""
+    codec = JsonCodec if isinstance(event["like"], str) else BinaryCodec
+    message = getattr(codec, event["type"])(event["dx"], event["dy"])
+    return stamp(message, event["t"]) if "t" in event else message
+
+
+class Backlog:
+    """Queue of encoded events and control items for one consumer.
+
+    Has the parts of asyncio.Queue the client uses.  ``put_nowait`` runs
+    on the event loop, like the hook callbacks' ``call_soon_threadsafe``.
+    """
+
+    def __init__(self, limit: int = BACKLOG):
+        self.limit = limit
+        self._items = deque()
+        self._waiter = None
+        self._orphans = set()  # shed presses whose release is still to come
+        self.compactions = 0
+        self.compacted = 0  # events merged away
+        self.dropped = 0  # events shed
+        self._shedding = False  # reported; until the backlog drains
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def put_nowait(self, item):
+        if isinstance(item, (str, bytes)):
+            if self._orphans and self._orphan(item):
+                return
+            if len(self._items) >= self.limit:
+                self._overflow()
+        self._items.append(item)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def get_nowait(self):
+        if not self._items:
+            raise asyncio.QueueEmpty
+        return self._items.popleft()
+
+    async def get(self):
+        while not self._items:
+            self._shedding = False
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._items.popleft()
+
+    def _orphan(self, item) -> bool:
+        """True if ``item`` is the release of a shed press, and is dropped."""
+        _, _, held, pressed = _peek(item)
+        if held not in self._orphans:
+            return False
+        self._orphans.discard(held)  # a new press owns the next release
+        if pressed:
+            return False
+        self.dropped += 1
+        return True
+
+    # ── compaction ────────────────────────────────────────────────
+
+    def _overflow(self):
+        self.compactions += 1
+        entries = self._compact()
+        low = int(self.limit * LOW_WATER)
+        if len(entries) > low:
+            entries = self._shed(entries, len(entries) - low)
+            if not self._shedding:
+                self._shedding = True
+                print("send backlog full: dropping the oldest input until the connection catches up")
+        self._items = deque(_encode(item) if isinstance(item, dict) else item
+                            for item, *_ in entries)
+
+    def _compact(self) -> list:
+        """[item, type, key or button, pressed] per event left after merging
+        runs and dropping repeats; a merged item is its decoded event."""
+        out = []
+        pressed = set()  # keys and buttons pressed in the backlog, not released yet
+        merged = 0
+        for item in self._items:
+            if not isinstance(item, (str, bytes)):
+                out.append([item, None, None, None])
+                continue
+            entry = _peek(item)
+            _, t, held, press = entry
+            if out and out[-1][1] == t:
+                last = out[-1][0]
+                same = type(last["like"] if isinstance(last, dict) else last) is type(item)
+                if same and t in _DELTAS:
+                    _merge(out, item)
+                    merged += 1
+                    continue
+                if same and t in _LATEST:
+                    out[-1] = entry
+                    merged += 1
+                    continue
+            if held is not None:
+                if press:
+                    if held in pressed:
+                        merged += 1
+                        continue
+                    pressed.add(held)
+                else:
+                    pressed.discard(held)
+            out.append(entry)
+        self.compacted += merged
+        return out
+
+    def _shed(self, entries: list, excess: int) -> list:
+        """Drop ``excess`` of the oldest events, keeping presses paired."""
+        kept = []
+        shed = set()  # presses dropped here
+        for entry in entries:
+            _, t, held, press = entry
+            if t is not None:
+                if excess > 0 and (held is None or press or held in shed):
+                    excess -= 1
+                    self.dropped += 1
+                    if press:
+                        shed.add(held)
+                    elif held is not None:
+                        shed.discard(held)
+                    continue
+                if held in shed:
+                    shed.discard(held)
+                    if not press:  # its press was shed
+                        self.dropped += 1
+                        continue
+            kept.append(entry)
+        self._orphans |= shed
+        return kept
+
+    def stats_line(self) -> str:
+        return (f"backlog {len(self._items)}/{self.limit}, {self.compacted} compacted, "
+                f"{self.dropped} dropped")
@@ -0,0 +1,791 @@
+"""Micro-benchmarks for the per-event hot paths.
+
+  mows bench                       run all benchmarks, print ns per event
+  mows bench -k encode             only benchmarks whose name contains "encode"
+  mows bench --save FILE           write the results as a JSON baseline
+  mows bench --baseline FILE       exit 1 if any result is slower than the
+                                   baseline by more than --tolerance
+
+Groups:
+  encode.*    protocol constructors and serialize_key (client hook path)
+  decode.*    decode_frame per encoding
+  dispatch.*  decode + server _dispatch into the injector, null backend;
+              dispatch.udp_motion: a motion datagram from receipt to the queue
+  bridge.*    EventBridge callbacks called from a synthetic hook thread
+  workload.*  synthetic traffic through the client and server paths:
+              typing, a 1000 Hz gaming mouse, trackpad scroll storms,
+              input queued behind a stalled connection
+  latency.loopback  ping round trip to a ``mows serve`` subprocess while
+              moves stream at 1000 Hz, per transport profile (in us)
+  inject.*    real injection per backend; only with --inject, since it
+              moves the actual pointer
+  displays.xvfb  one xtest server driving N Xvfb displays, a client per
+              display streaming positions concurrently; checks that every
+              pointer ends where its own client put it.  Only with
+              --xvfb N; needs Xvfb and libXtst
+  workload.recording  a ``mows record`` file replayed through server
+              dispatch; only with --recording FILE
+  startup.*   import time of each command's modules (python -X importtime),
+              checked against a fixed budget
+
+Baselines are machine-specific: generate them with --save on the
+machine that will run the comparison.  Budgets are absolute and fail
+the run (exit 1) whenever they are exceeded, baseline or not.  A
+benchmark that raises fails the run too, unless it raised
+BenchUnavailable, and so does a baseline result that was not measured.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+class BenchFailure(Exception):
+    """Raised by a benchmark whose own check failed; fails the run."""
+
+
+class BenchUnavailable(Exception):
+    """Raised by a benchmark that cannot run on this machine (no Xvfb,
+    no X library, no display); it is skipped.  Any other exception
+    fails the run."""
+
+
+BENCHMARKS = {}  # name -> function returning (ns per event, info)
+UNITS = {}  # name -> unit of its results, if not ns/event
+BUDGETS = {}  # result name -> largest result allowed
+
+
+def bench(name: str, unit: str = "ns/event", budgets: dict | None = None):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        UNITS[name] = unit
+        for variant, ns in (budgets or {}).items():
+            BUDGETS[f"{name}.{variant}"] = ns
+        return fn
+    return register
+
+
+def _per_op(fn, n: int, repeat: int = 5) -> float:
+    """Best-of-``repeat`` nanoseconds per call of ``fn(n)``, which runs n ops."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn(n)
+        best = min(best, (time.perf_counter_ns() - start) / n)
+    return best
+
+
+# ── synthetic input ───────────────────────────────────────────────
+
+TYPING_TEXT = "The quick brown fox jumps over the lazy dog, 0123456789. " * 4
+
+
+def _typing_keys():
+    from pynput.keyboard import KeyCode
+    return [KeyCode.from_char(c) for c in TYPING_TEXT]
+
+
+def _gaming_mouse_path(n: int):
+    """Absolute positions of a fast sweeping motion, 1 to 8 px per report."""
+    x = y = 500
+    path = []
+    for i in range(n):
+        x += 1 + i % 8
+        y += (i % 5) - 2
+        path.append((x, y))
+    return path
+
+
+# ── encode ────────────────────────────────────────────────────────
+
+def _codecs():
+    from .protocol import BinaryCodec, JsonCodec
+    return (("json", JsonCodec), ("binary", BinaryCodec))
+
+
+@bench("encode.mouse_move")
+def _encode_move():
+    results = {}
+    for name, codec in _codecs():
+        def run(n, move=codec.mouse_move):
+            for i in range(n):
+                move(i, -i)
+        results[name] = _per_op(run, 20000)
+    return results
+
+
+@bench("encode.key_press")
+def _encode_key():
+    keys = _typing_keys()
+    results = {}
+    for name, codec in _codecs():
+        def run(n, press=codec.key_press):
+            for i in range(n):
+                press(keys[i % len(keys)])
+        results[name] = _per_op(run, 20000)
+    return results
+
+
+@bench("encode.serialize_key")
+def _serialize_key():
+    from .protocol import serialize_key
+    keys = _typing_keys()
+
+    def run(n):
+        for i in range(n):
+            serialize_key(keys[i % len(keys)])
+    return {"": _per_op(run, 20000)}
+
+
+# ── decode and dispatch ───────────────────────────────────────────
+
+def _sample_messages(codec) -> list:
+    from pynput.mouse import Button
+    keys = _typing_keys()[:16]
+    messages = [codec.mouse_move(i, -i) for i in range(16)]
+    messages += [codec.key_press(k) for k in keys] + [codec.key_release(k) for k in keys]
+    messages += [codec.mouse_click(Button.left, p) for p in (True, False)]
+    messages += [codec.mouse_scroll(0, 1) for _ in range(4)]
+    return messages
+
+
+@bench("decode.frame")
+def _decode():
+    from .protocol import decode_frame
+    results = {}
+    for name, codec in _codecs():
+        messages = _sample_messages(codec)
+
+        def run(n):
+            for i in range(n):
+                decode_frame(messages[i % len(messages)])
+        results[name] = _per_op(run, 20000)
+    return results
+
+
+class _StubSocket:
+    subprotocol = None
+    remote_address = ("bench", 0)
+
+    async def send(self, message):
+        pass
+
+
+def _dispatch_per_event(messages: list, n: int) -> float:
+    from .backends import NullBackend
+    from .injector import Injector
+    from .protocol import decode_frame
+    from .arbiter import Arbiter
+    from .resume import Sessions
+    from .server import _Client, _ClipboardHub, _dispatch, _make_injection
+
+    async def run():
+        injector = Injector(_make_injection(NullBackend()), asyncio.get_running_loop())
+        injector.start()
+        client = _Client(_StubSocket(), injector)
+        hub, sessions, arbiter = _ClipboardHub(injector), Sessions(), Arbiter()
+        try:
+            start = time.perf_counter_ns()
+            for i in range(n):
+                for event in decode_frame(messages[i % len(messages)]):
+                    await _dispatch(event, client, injector, hub, sessions, arbiter)
+            while injector.depth:
+                await asyncio.sleep(0)
+            return (time.perf_counter_ns() - start) / n
+        finally:
+            injector.stop()
+
+    return min(asyncio.run(run()) for _ in range(3))
+
+
+@bench("dispatch.event")
+def _dispatch_event():
+    return {name: _dispatch_per_event(_sample_messages(codec), 20000)
+            for name, codec in _codecs()}
+
+
+@bench("dispatch.udp_motion")
+def _dispatch_udp_motion():
+    """Per datagram: authenticate, take the totals, queue the move."""
+    from .arbiter import Arbiter
+    from .backends import NullBackend
+    from .injector import Injector
+    from .motion import _BODY, MotionEndpoint, _mac
+    from .server import _Client, _make_injection, _open_motion
+
+    async def run(n):
+        injector = Injector(_make_injection(NullBackend()), asyncio.get_running_loop())
+        injector.start()
+        endpoint = MotionEndpoint()
+        offer = _open_motion(_Client(_StubSocket(), injector), endpoint, injector, Arbiter())
+        key = bytes.fromhex(offer["key"])
+        datagrams = []
+        for seq in range(1, n + 1):
+            body = _BODY.pack(offer["channel"], seq, seq * 3, -seq)
+            datagrams.append(body + _mac(key, body))
+        try:
+            start = time.perf_counter_ns()
+            for datagram in datagrams:
+                endpoint.datagram_received(datagram, None)
+            elapsed = time.perf_counter_ns() - start
+            while injector.depth:
+                await asyncio.sleep(0)
+            return elapsed / n
+        finally:
+            injector.stop()
+
+    return {"": min(asyncio.run(run(20000)) for _ in range(3))}
+
+
+# ── client bridge ─────────────────────────────────────────────────
+
+def _drive_bridge(drive, codec=None, **bridge_args):
+    """Run ``drive(bridge)`` on a synthetic hook thread while an event
+    loop consumes the queue.  Returns (ns per callback, queued messages)."""
+    from .client import EventBridge
+    from .protocol import BinaryCodec
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        bridge = EventBridge(loop, queue, **bridge_args)
+        bridge.codec = codec or BinaryCodec
+        calls = await asyncio.to_thread(drive, bridge)
+        elapsed = calls.pop()
+        bridge.flush_pending()
+        await asyncio.sleep(0.1)  # let queued puts and flush timers land
+        messages = []
+        while not queue.empty():
+            messages.append(queue.get_nowait())
+        return elapsed / calls[0], messages
+
+    return asyncio.run(run())
+
+
+def _timed_calls(n, call):
+    start = time.perf_counter_ns()
+    call()
+    return [n, time.perf_counter_ns() - start]
+
+
+@bench("bridge.on_move")
+def _bridge_move():
+    path = _gaming_mouse_path(20000)
+
+    def drive(bridge):
+        def call():
+            for x, y in path:
+                bridge.on_move(x, y)
+        return _timed_calls(len(path), call)
+    ns, messages = _drive_bridge(drive)
+    return {"": ns}, {"messages": len(messages)}
+
+
+@bench("bridge.on_press")
+def _bridge_press():
+    keys = _typing_keys()
+
+    def drive(bridge):
+        def call():
+            for _ in range(20):
+                for k in keys:
+                    bridge.on_press(k)
+                    bridge.on_release(k)
+        return _timed_calls(40 * len(keys), call)
+    ns, _ = _drive_bridge(drive)
+    return {"": ns}
+
+
+# ── workloads ─────────────────────────────────────────────────────
+
+def _server_cost(messages: list) -> float:
+    return _dispatch_per_event(messages, max(len(messages), 1000))
+
+
+@bench("workload.typing")
+def _typing():
+    """Press/release pairs for a paragraph of text, hook to injector."""
+    keys = _typing_keys()
+
+    def drive(bridge):
+        def call():
+            for k in keys:
+                bridge.on_press(k)
+                bridge.on_release(k)
+        return _timed_calls(2 * len(keys), call)
+    hook_ns, messages = _drive_bridge(drive)
+    return ({"hook": hook_ns, "server": _server_cost(messages)},
+            {"messages": len(messages), "bytes": sum(len(m) for m in messages)})
+
+
+@bench("workload.gaming_mouse")
+def _gaming_mouse():
+    """One second of 1000 Hz pointer reports, paced in real time."""
+    path = _gaming_mouse_path(1000)
+
+    def drive(bridge):
+        elapsed = 0
+        next_at = time.perf_counter()
+        for x, y in path:
+            start = time.perf_counter_ns()
+            bridge.on_move(x, y)
+            elapsed += time.perf_counter_ns() - start
+            next_at += 0.001
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return [len(path), elapsed]
+    hook_ns, messages = _drive_bridge(drive)
+    return ({"hook": hook_ns, "server": _server_cost(messages)},
+            {"messages": len(messages), "bytes": sum(len(m) for m in messages)})
+
+
+@bench("workload.trackpad_scroll")
+def _trackpad_scroll():
+    """Bursts of small scroll deltas at high-resolution trackpad rates."""
+
+    def drive(bridge):
+        elapsed = 0
+        calls = 0
+        for burst in range(10):
+            for i in range(120):
+                start = time.perf_counter_ns()
+                bridge.on_scroll(500, 500, 0, 1 if burst % 2 else -1)
+                elapsed += time.perf_counter_ns() - start
+                calls += 1
+                time.sleep(0.0005)
+            time.sleep(0.02)
+        return [calls, elapsed]
+    hook_ns, messages = _drive_bridge(drive)
+    return ({"hook": hook_ns, "server": _server_cost(messages)},
+            {"messages": len(messages), "bytes": sum(len(m) for m in messages)})
+
+
+@bench("workload.stalled_link")
+def _stalled_link():
+    """Coalesced moves and typing queued while nothing drains the send
+    backlog, including its compaction and shedding."""
+    from .backlog import Backlog
+    from .protocol import BinaryCodec
+    keys = _typing_keys()
+    events = []
+    for i, k in enumerate(keys * 20):
+        events += [BinaryCodec.mouse_move(1 + i % 8, i % 5 - 2)] * 4
+        events += [BinaryCodec.key_press(k), BinaryCodec.key_release(k)]
+    backlog = None
+
+    def run(n):
+        nonlocal backlog
+        backlog = Backlog()
+        put = backlog.put_nowait
+        for i in range(n):
+            put(events[i % len(events)])
+    ns = _per_op(run, len(events), repeat=3)
+    return {"": ns}, {"depth": backlog.qsize(), "compacted": backlog.compacted,
+                      "dropped": backlog.dropped}
+
+
+# ── loopback latency ──────────────────────────────────────────────
+
+LOOPBACK_PINGS = 2000
+LOOPBACK_LOAD_HZ = 1000  # mouse moves per second sent alongside the pings
+
+
+def _env() -> dict:
+    """Environment for a child interpreter that imports this copy of mows."""
+    src = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")])))
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _ping_under_load(port: int, profile: str, n: int) -> list:
+    """Round trips of ``n`` pings, in microseconds, while moves stream."""
+    import websockets
+    from . import profiles
+    from .protocol import BINARY_SUBPROTOCOL, BinaryCodec
+
+    for _ in range(100):  # wait for the server to come up
+        try:
+            ws = await websockets.connect(f"ws://127.0.0.1:{port}", subprotocols=[BINARY_SUBPROTOCOL],
+                                          **profiles.options(profile))
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    else:
+        raise RuntimeError(f"no server on port {port}")
+    profiles.tune(ws, profile)
+
+    async def load():
+        move = BinaryCodec.mouse_move(1, 0)
+        while True:
+            await ws.send(move)
+            await asyncio.sleep(1 / LOOPBACK_LOAD_HZ)
+
+    loader = asyncio.create_task(load())
+    rtts = []
+    try:
+        for _ in range(n):
+            start = time.perf_counter_ns()
+            await ws.send(json.dumps({"type": "ping", "t": start}))
+            while True:
+                message = await ws.recv()
+                if isinstance(message, str) and '"pong"' in message:
+                    break
+            rtts.append((time.perf_counter_ns() - start) / 1e3)
+            await asyncio.sleep(0.001)
+    finally:
+        loader.cancel()
+        await ws.close()
+    return rtts
+
+
+@bench("latency.loopback", unit="us")
+def _loopback_latency():
+    """Ping round trip to a ``mows serve --backend null`` subprocess, per profile."""
+    from . import profiles
+
+    results = {}
+    for profile in profiles.PROFILES:
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "mows", "serve", "--host", "127.0.0.1", "--port", str(port),
+             "--backend", "null", "--profile", profile],
+            env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            rtts = sorted(profiles.run(_ping_under_load(port, profile, LOOPBACK_PINGS), profile))
+        finally:
+            server.terminate()
+            server.wait()
+        results[f"{profile}.p50"] = rtts[len(rtts) // 2]
+        results[f"{profile}.p99"] = rtts[int(len(rtts) * 0.99)]
+    return results
+
+
+# ── real injection ────────────────────────────────────────────────
+
+def _inject_benchmarks(backends: list):
+    from .backends import make_backend
+    keys = [{"kind": "char", "char": c} for c in "abcdefghij"]
+    for name in backends:
+        def run_backend(name=name):
+            try:
+                backend = make_backend(name)
+            except OSError as e:
+                raise BenchUnavailable(str(e)) from e
+            try:
+                def moves(n):
+                    for i in range(n):
+                        backend.move(1 if i % 2 else -1, 0)
+                    backend.flush()
+
+                def typing(n):
+                    for i in range(n):
+                        backend.key(keys[i % len(keys)], True)
+                        backend.key(keys[i % len(keys)], False)
+                    backend.flush()
+                return {"move": _per_op(moves, 2000, 3), "key": _per_op(typing, 200, 3) / 2}
+            finally:
+                backend.close()
+        BENCHMARKS[f"inject.{name}"] = run_backend
+        UNITS[f"inject.{name}"] = "ns/event"
+
+
+# ── several displays ──────────────────────────────────────────────
+
+XVFB_SCREEN = (1280, 800)
+XVFB_POSITIONS = 2000  # absolute positions sent to each display
+
+
+def _start_xvfb(count: int) -> list:
+    """(display name, process) of ``count`` new Xvfb servers, each on a
+    display number it picked itself."""
+    import ctypes.util
+    import shutil
+    if shutil.which("Xvfb") is None:
+        raise BenchUnavailable("Xvfb not found")
+    if not (ctypes.util.find_library("X11") and ctypes.util.find_library("Xtst")):
+        raise BenchUnavailable("libX11 or libXtst not found")
+    started = []
+    try:
+        for _ in range(count):
+            read, write = os.pipe()
+            proc = subprocess.Popen(
+                ["Xvfb", "-displayfd", str(write), "-nolisten", "tcp",
+                 "-screen", "0", "%dx%dx24" % XVFB_SCREEN],
+                pass_fds=(write,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            os.close(write)
+            with os.fdopen(read) as f:
+                number = f.readline().strip()
+            if not number:
+                proc.kill()
+                raise RuntimeError("Xvfb did not start")
+            started.append((f":{number}", proc))
+    except BaseException:
+        _stop_xvfb(started)
+        raise
+    return started
+
+
+def _stop_xvfb(started: list):
+    for _, proc in started:
+        proc.terminate()
+    for _, proc in started:
+        proc.wait()
+
+
+class _PointerProbe:
+    """Reads where the pointer of one X display is."""
+
+    def __init__(self, name: str):
+        import ctypes
+
+        from .screen import libx11
+        x11 = self._x11 = libx11()
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        window_p, int_p = ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int)
+        x11.XQueryPointer.argtypes = [ctypes.c_void_p, ctypes.c_ulong, window_p, window_p,
+                                      int_p, int_p, int_p, int_p, ctypes.POINTER(ctypes.c_uint)]
+        self._dpy = x11.XOpenDisplay(name.encode())
+        if not self._dpy:
+            raise RuntimeError(f"cannot open display {name}")
+        self._root = x11.XDefaultRootWindow(self._dpy)
+        self._ctypes = ctypes
+
+    def position(self) -> tuple:
+        c = self._ctypes
+        root, child = c.c_ulong(), c.c_ulong()
+        x, y, wx, wy, mask = c.c_int(), c.c_int(), c.c_int(), c.c_int(), c.c_uint()
+        self._x11.XQueryPointer(self._dpy, self._root, c.byref(root), c.byref(child),
+                                c.byref(x), c.byref(y), c.byref(wx), c.byref(wy), c.byref(mask))
+        return x.value, y.value
+
+    def close(self):
+        self._x11.XCloseDisplay(self._dpy)
+
+
+async def _drive_displays(port: int, probes: dict, misplaced: list) -> float:
+    """Stream positions to every display in ``probes`` at once, each
+    ending on a different pixel; ns per position until every pointer is
+    on its pixel.  Displays whose pointer ends elsewhere go in
+    ``misplaced``."""
+    import websockets
+    from .protocol import BINARY_SUBPROTOCOL, BinaryCodec, display_path
+    from .screen import Desktop
+
+    place = Desktop(lambda: (0, 0, *XVFB_SCREEN)).place
+
+    async def drive(i: int, name: str, probe: _PointerProbe):
+        target = (0.1 + 0.8 * (i % 5) / 4, 0.9 - 0.8 * (i % 3) / 2)
+        expected = place(*target)
+        uri = f"ws://127.0.0.1:{port}{display_path(name)}"
+        async with websockets.connect(uri, subprotocols=[BINARY_SUBPROTOCOL]) as ws:
+            for k in range(1, XVFB_POSITIONS + 1):
+                f = k / XVFB_POSITIONS
+                await ws.send(BinaryCodec.mouse_position(target[0] * f, target[1] * f))
+            deadline = time.monotonic() + 5
+            while probe.position() != expected and time.monotonic() < deadline:
+                await asyncio.sleep(0.001)
+        if probe.position() != expected:
+            misplaced.append(f"{name} at {probe.position()}, expected {expected}")
+
+    start = time.perf_counter_ns()
+    await asyncio.gather(*(drive(i, name, probe) for i, (name, probe) in enumerate(probes.items())))
+    return (time.perf_counter_ns() - start) / (XVFB_POSITIONS * len(probes))
+
+
+def _xvfb_benchmark(count: int):
+    """displays.xvfb: one ``mows serve --backend xtest`` driving ``count``
+    Xvfb displays, with a client per display streaming at the same time."""
+
+    def run_displays():
+        xvfbs = _start_xvfb(count)
+        names = [name for name, _ in xvfbs]
+        probes = {}
+        port = _free_port()
+        args = [a for name in names for a in ("--display", name)]
+        server = subprocess.Popen(
+            [sys.executable, "-m", "mows", "serve", "--host", "127.0.0.1", "--port", str(port),
+             "--backend", "xtest", *args],
+            env=dict(_env(), DISPLAY=names[0]), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        misplaced = []
+        try:
+            probes = {name: _PointerProbe(name) for name in names}
+            _wait_for_port(port)
+            results = {}
+            for n in sorted({1, count}):
+                results[str(n)] = asyncio.run(_drive_displays(
+                    port, dict(list(probes.items())[:n]), misplaced))
+        finally:
+            server.terminate()
+            server.wait()
+            for probe in probes.values():
+                probe.close()
+            _stop_xvfb(xvfbs)
+        if misplaced:
+            raise BenchFailure("pointer misplaced: " + "; ".join(misplaced))
+        return results, {"displays": count, "positions": XVFB_POSITIONS}
+
+    BENCHMARKS["displays.xvfb"] = run_displays
+    UNITS["displays.xvfb"] = "ns/event"
+
+
+def _wait_for_port(port: int, timeout: float = 10):
+    import socket
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"no server on port {port}")
+            time.sleep(0.05)
+
+
+# ── recorded sessions ─────────────────────────────────────────────
+
+def _recording_benchmark(path: str):
+    """workload.recording: a ``mows record`` file through server dispatch."""
+    from .recording import Recording
+
+    with Recording(path) as rec:
+        messages = [event for _, event in rec.events()]
+    if not messages:
+        return
+
+    def run_recording():
+        return {"": _dispatch_per_event(messages, max(len(messages), 1000))}, {"events": len(messages)}
+    BENCHMARKS["workload.recording"] = run_recording
+    UNITS["workload.recording"] = "ns/event"
+
+
+# ── startup ───────────────────────────────────────────────────────
+
+# modules each command imports before doing any work
+STARTUP_IMPORTS = {
+    "help": "mows.cli",
+    "copy_session": "mows.cli, mows.control",  # copy-to/copy-from via a running session
+    "send": "mows.cli, mows.client",
+    "serve": "mows.cli, mows.server",
+}
+
+
+def _import_us(modules: str) -> tuple[int, list]:
+    """Import time of ``modules`` in a fresh interpreter, in microseconds,
+    and the heavy optional packages it pulled in."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modules}"],
+                         env=_env(), capture_output=True, text=True, check=True).stderr
+    total, loaded = 0, set()
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith(" mows") and not name.startswith("  "):  # top level
+            total += int(cumulative)
+        package = name.strip().split(".")[0]
+        if package in ("pynput", "pyperclip", "websockets"):
+            loaded.add(package)
+    return total, sorted(loaded)
+
+
+@bench("startup.import", unit="us", budgets={
+    "help": 50_000, "copy_session": 60_000, "send": 250_000, "serve": 250_000})
+def _startup_import():
+    results, info = {}, {}
+    for variant, modules in STARTUP_IMPORTS.items():
+        runs = [_import_us(modules) for _ in range(5)]
+        results[variant] = min(us for us, _ in runs)
+        info[variant] = "+".join(runs[0][1]) or "-"
+    return results, info
+
+
+# ── runner ────────────────────────────────────────────────────────
+
+def _benchmark_of(key: str) -> str | None:
+    """Name of the registered benchmark that produces result ``key``."""
+    names = [name for name in BENCHMARKS if key == name or key.startswith(f"{name}.")]
+    return max(names, key=len, default=None)
+
+
+def run_benchmarks(select: str = "", baseline: str | None = None, save: str | None = None,
+                   tolerance: float = 0.3, inject: list | None = None,
+                   recording: str | None = None, xvfb: int = 0) -> int:
+    """Run benchmarks and print ns per event.  Returns the exit status:
+    1 if a result is over its budget, a benchmark failed, or a baseline
+    was given and a result regressed past ``tolerance`` or is missing."""
+    if inject:
+        _inject_benchmarks(inject)
+    if xvfb:
+        _xvfb_benchmark(xvfb)
+    if recording:
+        _recording_benchmark(recording)
+    expected = {}
+    if baseline:
+        with open(baseline) as f:
+            expected = json.load(f)
+
+    results = {}
+    regressions = []
+    over_budget = []
+    failed = []
+    for name, fn in BENCHMARKS.items():
+        if select not in name:
+            continue
+        try:
+            out = fn()
+        except BenchUnavailable as e:
+            print(f"{name:<32} skipped: {e}")
+            continue
+        except Exception as e:
+            print(f"{name:<32} FAILED: {e if isinstance(e, BenchFailure) else repr(e)}")
+            failed.append(name)
+            continue
+        values, info = out if isinstance(out, tuple) else (out, {})
+        for variant, ns in values.items():
+            key = f"{name}.{variant}" if variant else name
+            results[key] = round(ns, 1)
+            line = f"{key:<32} {ns:>10.1f} {UNITS[name]}"
+            base = expected.get(key)
+            if base:
+                change = ns / base - 1
+                line += f"  ({change:+.0%} vs baseline)"
+                if change > tolerance:
+                    regressions.append(key)
+                    line += "  REGRESSION"
+            budget = BUDGETS.get(key)
+            if budget is not None and ns > budget:
+                over_budget.append(key)
+                line += f"  OVER BUDGET ({budget:.0f} {UNITS[name]})"
+            print(line)
+        if info:
+            print(f"{'':<32} " + " ".join(f"{k}={v}" for k, v in info.items()))
+
+    missing = sorted(key for key in expected
+                     if key not in results and select in (_benchmark_of(key) or key))
+    if save:
+        with open(save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"saved {len(results)} results to {save}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}: {', '.join(regressions)}",
+              file=sys.stderr)
+    if over_budget:
+        print(f"{len(over_budget)} result(s) over budget: {', '.join(over_budget)}", file=sys.stderr)
+    if failed:
+        print(f"{len(failed)} benchmark(s) failed: {', '.join(failed)}", file=sys.stderr)
+    if missing:
+        print(f"{len(missing)} baseline result(s) not measured: {', '.join(missing)}", file=sys.stderr)
+    return 1 if regressions or over_budget or failed or missing else 0
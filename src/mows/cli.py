@@ -1,7 +1,7 @@
 import os, sys
 import argparse
 
-from .utils import NAME, VERSION, ENTRY_POINTS
+from .utils import NAME, ENTRY_POINTS
 
 CLI_ENTRY = ENTRY_POINTS[0]
 
@@ -26,10 +26,61 @@ class CommandLineInterface:
         )
         parser.add_argument('--host', default='0.0.0.0', help='bind address (default: 0.0.0.0)')
         parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--queue-size', type=int, default=256,
+                            help='max events of one client waiting for the injection thread (default: 256)')
+        parser.add_argument('--stats', type=float, default=0, metavar='SECONDS',
+                            help='print injector and latency stats every SECONDS (default: off)')
+        parser.add_argument('--backend', choices=['pynput', 'xtest', 'null', 'record'], default='pynput',
+                            help='injection backend; xtest is native X11 (Linux), null and record '
+                                 'inject nothing, for headless load tests (default: pynput)')
+        parser.add_argument('--metrics-port', type=int, default=None,
+                            help='serve /metrics (Prometheus text) and /stats (JSON) over HTTP on this port')
+        parser.add_argument('--metrics-host', default='127.0.0.1',
+                            help='bind address for the metrics endpoint (default: 127.0.0.1)')
+        parser.add_argument('--max-clipboard-mb', type=float, default=64,
+                            help='largest clipboard accepted from clients, in MB (default: 64)')
+        parser.add_argument('--resume-grace', type=float, default=2.0, metavar='SECONDS',
+                            help='how long a dropped client may take to reconnect before its held '
+                                 'keys and buttons are released (default: 2)')
+        parser.add_argument('--arbitration', choices=['shared', 'exclusive', 'priority'], default='shared',
+                            help='with several clients: inject everyone\'s input (shared), only the '
+                                 'client in control (exclusive), or let a higher --priority client '
+                                 'take control at once (priority) (default: shared)')
+        parser.add_argument('--idle-handover', type=float, default=2.0, metavar='SECONDS',
+                            help='idle time after which another client may take control (default: 2)')
+        parser.add_argument('--udp-motion', action='store_true', default=False,
+                            help='accept pointer motion from clients as UDP datagrams')
+        parser.add_argument('--udp-port', type=int, default=None,
+                            help='UDP port for --udp-motion (default: same as --port)')
+        parser.add_argument('--profile', choices=['default', 'low-latency'], default='default',
+                            help='transport tuning; low-latency drops compression, sets TCP_NODELAY, '
+                                 'shrinks buffers and uses uvloop if installed (default: default)')
+        parser.add_argument('--sensitivity', type=float, default=1.0,
+                            help='scale received pointer motion by this factor, keeping sub-pixel '
+                                 'remainders (default: 1)')
+        parser.add_argument('--interpolate', type=float, nargs='?', const=60.0, default=0, metavar='HZ',
+                            help='spread each received move over one display refresh interval in '
+                                 '1 ms micro-moves; HZ is the refresh rate (default: off, 60 if given '
+                                 'without HZ)')
+        parser.add_argument('--trace', default=None, metavar='FILE',
+                            help='write sampled per-stage spans to FILE on exit, as Chrome trace JSON '
+                                 '(chrome://tracing, ui.perfetto.dev)')
+        parser.add_argument('--trace-sample', type=int, default=1, metavar='N',
+                            help='with --trace, trace one event in N (default: 1)')
+        parser.add_argument('--display', action='append', default=[], metavar='NAME',
+                            help='also inject into X display NAME, for clients connecting to '
+                                 'ws://HOST:PORT/display/NAME; opened on first use, with its own '
+                                 'injection thread (repeatable; not with the pynput backend)')
         parsed = parser.parse_args(args)
+        if parsed.display and parsed.backend == 'pynput':
+            parser.error('--display needs a backend that can open other displays, e.g. --backend xtest')
 
         from .server import run_server
-        run_server(parsed.host, parsed.port)
+        run_server(parsed.host, parsed.port, parsed.queue_size, parsed.stats, parsed.backend,
+                   parsed.metrics_port, parsed.metrics_host, int(parsed.max_clipboard_mb * 1e6),
+                   parsed.resume_grace, parsed.arbitration, parsed.idle_handover,
+                   parsed.udp_motion, parsed.udp_port, parsed.profile, parsed.sensitivity,
+                   parsed.interpolate, parsed.trace, parsed.trace_sample, parsed.display)
 
     @classmethod
     def send(cls, args):
@@ -41,10 +92,62 @@ class CommandLineInterface:
         parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
         parser.add_argument('--suppress', action='store_true', default=False,
                             help='block input events from reaching the client OS (Windows)')
+        parser.add_argument('--encoding', choices=['binary', 'json'], default='binary',
+                            help='preferred wire encoding, falls back to json if the server lacks binary (default: binary)')
+        parser.add_argument('--batch', action='store_true', default=False,
+                            help='send all queued events as one multi-event frame')
+        parser.add_argument('--batch-latency-us', type=int, default=0,
+                            help='with --batch, wait up to this many microseconds for more events (default: 0)')
+        parser.add_argument('--move-hz', type=float, default=250,
+                            help='pointer update rate at normal speed, faster motion goes up to 1000 (default: 250)')
+        parser.add_argument('--scroll-hz', type=float, default=60,
+                            help='scroll update rate at normal speed (default: 60)')
+        parser.add_argument('--max-staleness-ms', type=float, default=50,
+                            help='longest time motion or scroll is held back before sending (default: 50)')
+        parser.add_argument('--latency', action='store_true', default=False,
+                            help='timestamp events and sync clocks so the server can measure end-to-end latency')
+        parser.add_argument('--stats', type=float, default=0, metavar='SECONDS',
+                            help='print client latency stats every SECONDS, implies --latency (default: off)')
+        parser.add_argument('--clipboard-sync', action='store_true', default=False,
+                            help='keep the local and server clipboards in sync while connected')
+        parser.add_argument('--priority', type=int, default=0,
+                            help='priority for servers arbitrating in priority mode; higher '
+                                 'takes control from lower (default: 0)')
+        parser.add_argument('--udp-motion', action='store_true', default=False,
+                            help='send pointer motion as UDP datagrams if the server offers it')
+        parser.add_argument('--udp-loss', type=float, default=0.0, metavar='FRACTION',
+                            help='drop this fraction of motion datagrams, to test a lossy link (default: 0)')
+        parser.add_argument('--display', default=None, metavar='NAME',
+                            help='drive X display NAME of a server started with --display NAME '
+                                 '(default: the server\'s own display)')
+        parser.add_argument('--pointer', choices=['relative', 'absolute'], default='relative',
+                            help='send pointer motion as deltas, or as positions on the desktop that '
+                                 'the server maps onto its own screens (default: relative)')
+        parser.add_argument('--profile', choices=['default', 'low-latency'], default='default',
+                            help='transport tuning; low-latency drops compression, sets TCP_NODELAY, '
+                                 'shrinks buffers and uses uvloop if installed (default: default)')
+        parser.add_argument('--backlog', type=int, default=1024, metavar='EVENTS',
+                            help='most events queued while the connection is slow; beyond that '
+                                 'moves and scrolls are merged and the oldest input dropped (default: 1024)')
+        parser.add_argument('--trace', default=None, metavar='FILE',
+                            help='write sampled per-stage spans to FILE on exit, as Chrome trace JSON '
+                                 '(chrome://tracing, ui.perfetto.dev)')
+        parser.add_argument('--trace-sample', type=int, default=1, metavar='N',
+                            help='with --trace, trace one event in N (default: 1)')
         parsed = parser.parse_args(args)
+        if parsed.pointer == 'absolute' and parsed.udp_motion:
+            parser.error('--udp-motion carries relative motion only; it cannot be used with --pointer absolute')
 
+        batch_latency = parsed.batch_latency_us / 1e6 if parsed.batch else None
+        from .coalesce import CoalescePolicy
+        staleness = parsed.max_staleness_ms / 1e3
+        move_policy = CoalescePolicy(parsed.move_hz, staleness)
+        scroll_policy = CoalescePolicy.scroll(parsed.scroll_hz, staleness)
         from .client import run_client
-        run_client(parsed.host, parsed.port, parsed.suppress)
+        run_client(parsed.host, parsed.port, parsed.suppress, parsed.encoding, batch_latency,
+                   move_policy, scroll_policy, parsed.latency, parsed.stats, parsed.clipboard_sync,
+                   parsed.priority, parsed.udp_motion, parsed.udp_loss, parsed.profile, parsed.backlog,
+                   parsed.trace, parsed.trace_sample, parsed.pointer, parsed.display)
 
     @classmethod
     def copy_to(cls, args):
@@ -54,10 +157,17 @@ class CommandLineInterface:
         )
         parser.add_argument('--host', default='localhost', help='server address (default: localhost)')
         parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--direct', action='store_true', default=False,
+                            help='open a new connection even if a mows send/daemon session is running')
+        parser.add_argument('--display', default=None, metavar='NAME',
+                            help='act on X display NAME of a server started with --display NAME, '
+                                 'through the mows send --display NAME session if one is running')
         parsed = parser.parse_args(args)
 
-        from .client import run_copy_to
-        run_copy_to(parsed.host, parsed.port)
+        if not parsed.direct and _via_session(parsed.host, parsed.port, 'copy-to', parsed.display):
+            return
+        from .clipboard import run_copy_to
+        run_copy_to(parsed.host, parsed.port, parsed.display)
 
     @classmethod
     def copy_from(cls, args):
@@ -67,13 +177,189 @@ class CommandLineInterface:
         )
         parser.add_argument('--host', default='localhost', help='server address (default: localhost)')
         parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--direct', action='store_true', default=False,
+                            help='open a new connection even if a mows send/daemon session is running')
+        parser.add_argument('--display', default=None, metavar='NAME',
+                            help='act on X display NAME of a server started with --display NAME, '
+                                 'through the mows send --display NAME session if one is running')
         parsed = parser.parse_args(args)
 
-        from .client import run_copy_from
-        run_copy_from(parsed.host, parsed.port)
+        if not parsed.direct and _via_session(parsed.host, parsed.port, 'copy-from', parsed.display):
+            return
+        from .clipboard import run_copy_from
+        run_copy_from(parsed.host, parsed.port, parsed.display)
+
+    @classmethod
+    def type(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} type',
+            description='Type text on the server, sent as one message',
+        )
+        parser.add_argument('text', nargs='?', default=None,
+                            help='text to type (default: read from standard input)')
+        parser.add_argument('--host', default='localhost', help='server address (default: localhost)')
+        parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--rate', type=float, default=0, metavar='CPS',
+                            help='type at most this many characters per second, for applications '
+                                 'that drop fast input (default: as fast as possible)')
+        parser.add_argument('--direct', action='store_true', default=False,
+                            help='open a new connection even if a mows send/daemon session is running')
+        parser.add_argument('--display', default=None, metavar='NAME',
+                            help='act on X display NAME of a server started with --display NAME, '
+                                 'through the mows send --display NAME session if one is running')
+        parsed = parser.parse_args(args)
+
+        text = sys.stdin.read() if parsed.text is None else parsed.text
+        if not parsed.direct and _via_session(parsed.host, parsed.port, 'type', parsed.display,
+                                              text=text, rate=parsed.rate):
+            return
+        from .text import run_type
+        run_type(text, parsed.host, parsed.port, parsed.rate, parsed.display)
+
+    @classmethod
+    def daemon(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} daemon',
+            description='Keep warm connections to servers for copy-to/copy-from and status',
+        )
+        parser.add_argument('--server', action='append', default=None, metavar='HOST:PORT',
+                            help='server to keep connected, repeatable (default: localhost:8765)')
+        parsed = parser.parse_args(args)
+
+        servers = []
+        for spec in parsed.server or ['localhost:8765']:
+            host, _, port = spec.rpartition(':')
+            if not host or not port.isdigit():
+                parser.error(f'expected HOST:PORT, got {spec!r}')
+            servers.append((host, int(port)))
+        from .daemon import run_daemon
+        run_daemon(servers)
+
+    @classmethod
+    def status(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} status',
+            description='Show the connection of a running mows send/daemon session',
+        )
+        parser.add_argument('--host', default='localhost', help='server address (default: localhost)')
+        parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--display', default=None, metavar='NAME',
+                            help='act on X display NAME of a server started with --display NAME, '
+                                 'through the mows send --display NAME session if one is running')
+        parsed = parser.parse_args(args)
+
+        if not _via_session(parsed.host, parsed.port, 'status', parsed.display):
+            print(f"no mows send/daemon session for {parsed.host}:{parsed.port}"
+                  + (f" display {parsed.display}" if parsed.display else ""))
+            sys.exit(1)
+
+    @classmethod
+    def stats(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} stats',
+            description='Show latency stats from a server started with --metrics-port',
+        )
+        parser.add_argument('--host', default='localhost', help='metrics address (default: localhost)')
+        parser.add_argument('--port', type=int, default=8766, help='metrics port (default: 8766)')
+        parser.add_argument('--watch', type=float, default=0, metavar='SECONDS',
+                            help='refresh every SECONDS until interrupted (default: show once)')
+        parsed = parser.parse_args(args)
+
+        from .metrics import run_stats
+        run_stats(parsed.host, parsed.port, parsed.watch)
+
+    @classmethod
+    def trace_merge(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} trace-merge',
+            description='Merge --trace files of a server and its clients into one timeline',
+        )
+        parser.add_argument('files', nargs='+', help='trace files written by mows serve/send --trace')
+        parser.add_argument('-o', '--output', required=True, help='merged trace to write')
+        parsed = parser.parse_args(args)
+
+        from .trace import merge
+        try:
+            merge(parsed.files, parsed.output)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{CLI_ENTRY} trace-merge: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    @classmethod
+    def bench(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} bench',
+            description='Run micro-benchmarks of the per-event hot paths',
+        )
+        parser.add_argument('-k', dest='select', default='',
+                            help='only run benchmarks whose name contains this string')
+        parser.add_argument('--baseline', default=None,
+                            help='JSON baseline to compare against; exit 1 on regressions')
+        parser.add_argument('--save', default=None, help='write results as a JSON baseline')
+        parser.add_argument('--tolerance', type=float, default=0.3,
+                            help='allowed slowdown vs baseline, as a fraction (default: 0.3)')
+        parser.add_argument('--inject', nargs='+', default=None, metavar='BACKEND',
+                            help='also benchmark real injection through these backends (moves the pointer)')
+        parser.add_argument('--recording', default=None, metavar='FILE',
+                            help='also benchmark server dispatch of a mows record file')
+        parser.add_argument('--xvfb', type=int, default=0, metavar='N',
+                            help='also drive N Xvfb displays from one xtest server at once, and check '
+                                 'every pointer ends where its client put it (needs Xvfb)')
+        parsed = parser.parse_args(args)
+
+        from .bench import run_benchmarks
+        sys.exit(run_benchmarks(parsed.select, parsed.baseline, parsed.save,
+                                parsed.tolerance, parsed.inject, parsed.recording, parsed.xvfb))
+
+    @classmethod
+    def record(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} record',
+            description='Record local mouse/keyboard input to a file for mows replay',
+        )
+        parser.add_argument('file', help='recording to create')
+        parser.add_argument('--force', action='store_true', default=False,
+                            help='overwrite FILE if it exists (default: refuse)')
+        parsed = parser.parse_args(args)
+
+        from .recording import run_record
+        try:
+            run_record(parsed.file, parsed.force)
+        except FileExistsError:
+            parser.error(f'{parsed.file} exists; pass --force to overwrite it')
+
+    @classmethod
+    def replay(cls, args):
+        parser = ArgumentParser(
+            prog=f'{CLI_ENTRY} replay',
+            description='Play a recording into a server',
+        )
+        parser.add_argument('file', help='recording made with mows record')
+        parser.add_argument('--host', default='localhost', help='server address (default: localhost)')
+        parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='playback speed factor; 0 sends as fast as possible (default: 1)')
+        parser.add_argument('--start', type=float, default=0, metavar='SECONDS',
+                            help='skip to this point of the recording (default: 0)')
+        parser.add_argument('--end', type=float, default=None, metavar='SECONDS',
+                            help='stop at this point of the recording (default: the end)')
+        parser.add_argument('--info', action='store_true', default=False,
+                            help='describe the recording instead of playing it')
+        parsed = parser.parse_args(args)
+
+        from .recording import RecordingError, describe, run_replay
+        try:
+            if parsed.info:
+                print(describe(parsed.file))
+            else:
+                run_replay(parsed.file, parsed.host, parsed.port, parsed.speed, parsed.start, parsed.end)
+        except (OSError, RecordingError) as e:
+            print(f"{CLI_ENTRY} replay: {e}", file=sys.stderr)
+            sys.exit(1)
 
     @classmethod
     def help(cls, args=None):
+        from .utils import VERSION
         help = [
             f"{NAME} v{VERSION}",
             f"Mouse Over WebSocket",
@@ -89,6 +375,19 @@ class CommandLineInterface:
         help = "\n".join(help)
         print(help)
 
+def _via_session(host, port, cmd, display=None, **args):
+    """Run ``cmd`` with ``args`` through a running session's control
+    socket for ``display`` on ``host``:``port``.  False if there is
+    none; exits with status 1 if the command failed."""
+    from .control import request
+    reply = request(host, port, cmd, display, **args)
+    if reply is None:
+        return False
+    print(reply["message"])
+    if not reply["ok"]:
+        sys.exit(1)
+    return True
+
 COMMANDS = [k for k in CommandLineInterface.__dict__ if not k.startswith("_")]
 
 def main():
@@ -2,22 +2,52 @@
 
 import asyncio
 import json
-import threading
+import time
+from collections import deque
 
-import pyperclip
 import websockets
-from pynput.keyboard import Key, Listener as KeyboardListener
-from pynput.mouse import Listener as MouseListener
 
+from . import control, profiles
+from .backlog import BACKLOG, Backlog
+from .clipboard import ClipboardSession, ClipboardWatcher, read_local, write_local
+from .coalesce import CoalescePolicy, Coalescer
+from .daemon import Link
+from .metrics import PING_INTERVAL, ClockSync, Metrics, format_snapshot
+from .motion import MotionSender
 from .protocol import (
-    key_press_event,
-    key_release_event,
-    mouse_click_event,
-    mouse_move_event,
-    mouse_scroll_event,
+    BINARY_SUBPROTOCOL,
+    JSON_SUBPROTOCOL,
+    MAX_FRAME_EVENTS,
+    BinaryCodec,
+    JsonCodec,
+    codec_for,
+    decode_message,
+    display_path,
+    peek_stamp,
+    stamp,
 )
+from .resume import KEEPALIVE, Backoff, ReplayBuffer, new_session_id
+from .screen import Desktop, probe
+from .trace import HOOK, LOOP, Tracer
 
 _TOGGLE = object()  # sentinel queued on Ctrl+Tab
+_NO_CONTROL = object()  # batch ended without reaching a sentinel
+_LOST = object()  # queued when the connection drops
+
+# pynput, imported by _pynput() when capture starts: importing it sets up
+# the platform input backend, which only ``mows send`` needs
+Key = KeyboardListener = MouseListener = None
+
+
+def _pynput():
+    global Key, KeyboardListener, MouseListener
+    from pynput.keyboard import Key, Listener as KeyboardListener
+    from pynput.mouse import Listener as MouseListener
+
+
+# kinds of raw hook records, indexed into EventBridge._handlers
+_MOVE, _CLICK, _SCROLL, _PRESS, _RELEASE = range(5)
+_RECORDS = ("mouse_move", "mouse_click", "mouse_scroll", "key_press", "key_release")
 
 
 class EventBridge:
@@ -30,12 +60,32 @@ class EventBridge:
     The keyboard listener runs for the entire session (never restarted)
     so hotkeys always work.  Only the mouse listener is restarted on
     toggle to change the suppress setting.
-    """
 
-    MOVE_INTERVAL = 0.1  # seconds between buffered move flushes
+    The hook callbacks do as little as possible, since the OS drops or
+    unhooks a low-level hook that is slow to return, and on X11 their
+    time is input lag: each appends a raw (kind, args..., capture time)
+    tuple to an inbox deque and, if the loop is not already due to look
+    at it, wakes the loop once.  Appending to a deque is atomic, so no
+    lock is taken.  Everything else — hotkeys, coalescing, encoding —
+    runs on the event loop when it drains the inbox, a batch at a time.
+    Motion does not wake the loop while a coalescing flush is armed:
+    the flush drains the inbox first.
+
+    Events are encoded with ``codec``, which starts as JSON and is
+    switched once the connection has negotiated a subprotocol.  With
+    ``timestamps`` set, each event carries its capture time.  While
+    ``motion`` (a MotionSender) is set, moves go out as UDP datagrams.
+    With ``desktop`` (a screen.Desktop) set, the pointer goes out as
+    absolute mouse_position events instead of deltas: when a flush is
+    due, only the newest position is sent.
+    With a ``tracer``, loop-side handling of sampled records is traced.
+    """
 
     def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue,
-                 suppress: bool = False):
+                 suppress: bool = False, move_policy: CoalescePolicy | None = None,
+                 scroll_policy: CoalescePolicy | None = None):
+        if Key is None:
+            _pynput()
         self._loop = loop
         self._queue = queue
         self._suppress = suppress
@@ -43,187 +93,656 @@ class EventBridge:
         self._ctrl_pressed = False
         self._ctrl_key = None
         self._last_mouse_pos = None
-        self._move_lock = threading.Lock()
-        self._pending_dx = 0
-        self._pending_dy = 0
-        self._flush_scheduled = False
+        self._moves = Coalescer(move_policy or CoalescePolicy())
+        self._scrolls = Coalescer(scroll_policy or CoalescePolicy.scroll())
+        self.codec = JsonCodec
+        self.timestamps = False
+        self.motion = None
+        self.tracer = None
+        self.desktop = None
+        self._position = None  # absolute pointer position, in local desktop pixels
+        self._sent = None  # the position last sent
+        self._inbox = deque()
+        self._draining = False  # a drain is scheduled on the loop
+        self._flushing = False  # a coalescing flush is armed, and will drain first
+        self._handlers = (self._move, self._click, self._scroll, self._press, self._release)
+        self.batches = 0
+        self.drained = 0
+
+    # ── hook thread ──────────────────────────────────────────────────
+
+    def _wake(self):
+        self._draining = True
+        self._loop.call_soon_threadsafe(self._drain)
+
+    def on_move(self, x, y):
+        self._inbox.append((_MOVE, x, y, time.monotonic_ns()))
+        if not (self._draining or self._flushing):
+            self._wake()
 
-    def _put(self, data):
-        self._loop.call_soon_threadsafe(self._queue.put_nowait, data)
+    def on_scroll(self, x, y, dx, dy):
+        self._inbox.append((_SCROLL, x, y, dx, dy, time.monotonic_ns()))
+        if not (self._draining or self._flushing):
+            self._wake()
 
-    # ── buffered mouse movement ──────────────────────────────────────
+    def on_click(self, x, y, button, pressed):
+        self._inbox.append((_CLICK, x, y, button, pressed, time.monotonic_ns()))
+        if not self._draining:
+            self._wake()
+
+    def on_press(self, key):
+        self._inbox.append((_PRESS, key, time.monotonic_ns()))
+        if not self._draining:
+            self._wake()
+
+    def on_release(self, key):
+        self._inbox.append((_RELEASE, key, time.monotonic_ns()))
+        if not self._draining:
+            self._wake()
+
+    # ── event loop ───────────────────────────────────────────────────
+
+    def _drain(self):
+        """Handle everything the hooks captured so far, in order."""
+        # cleared before popping: a hook appending after the last pop
+        # sees it clear and wakes the loop again
+        self._draining = False
+        inbox, handlers, tracer = self._inbox, self._handlers, self.tracer
+        n = 0
+        while inbox:
+            record = inbox.popleft()
+            if tracer is None:
+                handlers[record[0]](*record[1:])
+            else:
+                start = time.monotonic_ns()
+                handlers[record[0]](*record[1:])
+                if tracer.sampled(record[-1]):
+                    tracer.span("serialize", start, time.monotonic_ns(), LOOP,
+                                {"event": _RECORDS[record[0]]})
+            n += 1
+        if n:
+            self.batches += 1
+            self.drained += n
+
+    def _emit(self, message, t: int | None = None):
+        """Queue an encoded event captured at monotonic time ``t`` (ns, default now)."""
+        if self.timestamps:
+            message = stamp(message, time.monotonic_ns() if t is None else t)
+        self._queue.put_nowait(message)
+
+    # coalesced mouse movement and scrolling
+
+    def _schedule(self, coalescer: Coalescer, flush):
+        """Arm the flush timer for ``coalescer``."""
+        self._flushing = True
+        self._loop.call_later(coalescer.delay(self._queue.qsize()), self._due, flush)
+
+    def _due(self, flush):
+        self._flushing = False  # before draining, as in _drain
+        self._drain()
+        flush()
 
     def flush_pending_move(self):
-        """Send accumulated mouse deltas now.  Thread-safe."""
-        with self._move_lock:
-            dx, dy = self._pending_dx, self._pending_dy
-            self._pending_dx = 0
-            self._pending_dy = 0
-            self._flush_scheduled = False
+        """Send accumulated mouse deltas, or the newest absolute position, now."""
+        dx, dy, since = self._moves.take()
+        if self.desktop is not None:
+            if since is not None and self._position != self._sent:
+                self._sent = self._position
+                message = self.codec.mouse_position(*self.desktop.normalize(*self._position))
+                self._emit(message, int(since * 1e9))
+            return
         if dx != 0 or dy != 0:
-            self._put(mouse_move_event(dx, dy))
+            motion = self.motion
+            if motion is not None:
+                motion.move(dx, dy)
+            else:
+                self._emit(self.codec.mouse_move(dx, dy), int(since * 1e9))
+
+    def _sync_motion(self, t: int):
+        """Send the UDP motion totals reliably, ahead of a click or scroll."""
+        motion = self.motion
+        if motion is not None:
+            message = motion.sync()
+            if message is not None:
+                self._emit(message, t)
+
+    def flush_pending_scroll(self):
+        """Send accumulated scroll deltas now."""
+        dx, dy, since = self._scrolls.take()
+        if dx != 0 or dy != 0:
+            self._emit(self.codec.mouse_scroll(dx, dy), int(since * 1e9))
 
-    # mouse callbacks
-    def on_move(self, x, y):
+    def flush_pending(self):
+        """Handle captured input and send accumulated deltas now."""
+        self._drain()
+        self.flush_pending_scroll()
+        self.flush_pending_move()
+
+    # mouse
+
+    def _move(self, x, y, t):
         if not self._active:
             return
         if self._last_mouse_pos is not None:
             lx, ly = self._last_mouse_pos
             dx, dy = x - lx, y - ly
-            with self._move_lock:
-                self._pending_dx += dx
-                self._pending_dy += dy
-                if not self._flush_scheduled:
-                    self._flush_scheduled = True
-                    self._loop.call_soon_threadsafe(
-                        self._loop.call_later,
-                        self.MOVE_INTERVAL,
-                        self.flush_pending_move,
-                    )
+            if self.desktop is not None:
+                self._locate(x, y, dx, dy)
+            if self._scrolls.pending:
+                self.flush_pending_scroll()
+            if self._moves.add(dx, dy, t / 1e9):
+                self._schedule(self._moves, self.flush_pending_move)
+        elif self.desktop is not None:
+            self._locate(x, y, 0, 0)
         # When suppress=True the cursor is frozen; each callback reports
         # frozen_pos + this_event's_raw_delta.  Keep _last pinned to the
         # frozen position so we always subtract it, yielding the true delta.
         if self._last_mouse_pos is None or not self._suppress:
             self._last_mouse_pos = (x, y)
 
-    def on_click(self, x, y, button, pressed):
+    def _locate(self, x, y, dx, dy):
+        """Track the absolute position: where the pointer is, or with
+        suppress, where it would be had it not been frozen."""
+        if self._suppress and self._position is not None:
+            px, py = self._position
+            x, y = self.desktop.clamp(px + dx, py + dy)
+        self._position = (x, y)
+
+    def _click(self, x, y, button, pressed, t):
         if not self._active:
             return
         if not self._suppress:
             self._last_mouse_pos = (x, y)
+        self.flush_pending_scroll()
         self.flush_pending_move()
-        self._put(mouse_click_event(button, pressed))
+        self._sync_motion(t)
+        self._emit(self.codec.mouse_click(button, pressed), t)
 
-    def on_scroll(self, x, y, dx, dy):
+    def _scroll(self, x, y, dx, dy, t):
         if not self._active:
             return
         if not self._suppress:
             self._last_mouse_pos = (x, y)
-        self.flush_pending_move()
-        self._put(mouse_scroll_event(dx, dy))
+        if self._moves.pending:
+            self.flush_pending_move()
+        if self.motion is not None:
+            self._sync_motion(t)
+        if self._scrolls.add(dx, dy, t / 1e9):
+            self._schedule(self._scrolls, self.flush_pending_scroll)
 
-    # keyboard callbacks
-    def on_press(self, key):
+    # keyboard
+
+    def _press(self, key, t):
         if key in (Key.ctrl_l, Key.ctrl_r):
             self._ctrl_pressed = True
             self._ctrl_key = key
             if self._active:
-                self._put(key_press_event(key))
+                self._emit(self.codec.key_press(key), t)
             return
 
         if self._ctrl_pressed:
             if key == Key.tab:
                 # Release Ctrl on the server before pausing
                 if self._active:
-                    self._put(key_release_event(self._ctrl_key))
-                    self._put(key_release_event(Key.tab))
-                self._put(_TOGGLE)
+                    self._emit(self.codec.key_release(self._ctrl_key), t)
+                    self._emit(self.codec.key_release(Key.tab), t)
+                self._queue.put_nowait(_TOGGLE)
                 return
             if key == Key.esc:
                 if self._active:
+                    self.flush_pending_scroll()
                     self.flush_pending_move()
-                    self._put(key_release_event(Key.esc))
-                    self._put(key_release_event(self._ctrl_key))
-                self._put(None)  # sentinel: stop send loop
-                return False  # stop keyboard listener
+                    self._emit(self.codec.key_release(Key.esc), t)
+                    self._emit(self.codec.key_release(self._ctrl_key), t)
+                self._queue.put_nowait(None)  # sentinel: stop send loop
+                return
 
         if self._active:
-            self._put(key_press_event(key))
+            self._emit(self.codec.key_press(key), t)
 
-    def on_release(self, key):
+    def _release(self, key, t):
         if key in (Key.ctrl_l, Key.ctrl_r):
             self._ctrl_pressed = False
         if self._active:
-            self._put(key_release_event(key))
+            self._emit(self.codec.key_release(key), t)
+
+
+def _start_capture(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, suppress: bool,
+                   move_policy: CoalescePolicy | None, scroll_policy: CoalescePolicy | None,
+                   timestamps: bool, codec=JsonCodec, tracer: Tracer | None = None):
+    """Import pynput, then create the bridge and start both listeners.
+    Runs in a worker thread while the connection is being made; events
+    captured before it is ready wait in ``queue``."""
+    bridge = EventBridge(loop, queue, suppress=suppress,
+                         move_policy=move_policy, scroll_policy=scroll_policy)
+    bridge.timestamps = timestamps
+    bridge.codec = codec
+    bridge.tracer = tracer
+
+    # Keyboard listener runs the entire session — never restarted so the
+    # WH_KEYBOARD_LL hook stays reliably installed.
+    kl = KeyboardListener(
+        on_press=_hook(bridge, bridge.on_press),
+        on_release=_hook(bridge, bridge.on_release),
+        suppress=suppress,
+    )
+    kl.start()
+    return bridge, kl, _start_mouse_listener(bridge, suppress)
 
 
 def _start_mouse_listener(bridge, sup):
     ml = MouseListener(
-        on_move=bridge.on_move,
-        on_click=bridge.on_click,
-        on_scroll=bridge.on_scroll,
+        on_move=_hook(bridge, bridge.on_move),
+        on_click=_hook(bridge, bridge.on_click),
+        on_scroll=_hook(bridge, bridge.on_scroll),
         suppress=sup,
     )
     ml.start()
     return ml
 
 
-async def _send(host: str, port: int, suppress: bool):
-    uri = f"ws://{host}:{port}"
-    queue: asyncio.Queue = asyncio.Queue()
-    loop = asyncio.get_running_loop()
-    bridge = EventBridge(loop, queue, suppress=suppress)
+def _hook(bridge: EventBridge, callback):
+    """``callback`` as the listener should call it: traced if the bridge is."""
+    if bridge.tracer is None:
+        return callback
+    return bridge.tracer.wrap("hook", callback, HOOK)
 
-    # Keyboard listener runs the entire session — never restarted so the
-    # WH_KEYBOARD_LL hook stays reliably installed.
-    kl = KeyboardListener(
-        on_press=bridge.on_press,
-        on_release=bridge.on_release,
-        suppress=suppress,
-    )
-    kl.start()
 
-    active = True
-    ml = _start_mouse_listener(bridge, suppress)
+async def _collect(queue: asyncio.Queue, first, max_latency: float):
+    """Drain queued events behind ``first`` into one ordered batch.
+
+    Waits up to ``max_latency`` seconds after ``first`` for more events.
+    Stops early at a control sentinel, which is returned alongside the
+    batch so the caller can handle it after sending.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_latency
+    batch = [first]
+    while len(batch) < MAX_FRAME_EVENTS:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), remaining)
+            except TimeoutError:
+                break
+        if item is None or item is _TOGGLE or item is _LOST:
+            return batch, item
+        batch.append(item)
+    return batch, _NO_CONTROL
+
+
+def _frames(events: list):
+    """Pack a batch into frames.  Events queued before the subprotocol was
+    negotiated are JSON, so consecutive runs of each encoding get their
+    own frame; a lone event is sent unwrapped."""
+    run = []
+    for e in events:
+        if run and type(e) is not type(run[0]):
+            yield _pack_run(run)
+            run = []
+        run.append(e)
+    if run:
+        yield _pack_run(run)
+
+
+def _pack_run(run: list):
+    if len(run) == 1:
+        return run[0]
+    codec = JsonCodec if isinstance(run[0], str) else BinaryCodec
+    return codec.frame(run)
+
+
+async def _send_traced(ws, events: list, tracer: Tracer):
+    """Send a batch, tracing its sampled events' queue wait and the sends."""
+    now = time.monotonic_ns()
+    sampled = False
+    for e in events:
+        kind, t = peek_stamp(e)
+        if tracer.sampled(t):
+            sampled = True
+            tracer.span("queue", t, now, LOOP, {"event": kind})
+    for frame in _frames(events):
+        start = time.monotonic_ns()
+        await ws.send(frame)
+        if sampled:
+            tracer.span("ws.send", start, time.monotonic_ns(), LOOP, {"bytes": len(frame)})
+
+
+def _record_sent(events: list, metrics: Metrics):
+    now = time.monotonic_ns()
+    for e in events:
+        kind, t = peek_stamp(e)
+        metrics.record("queue", kind, now - t)
+
+
+async def _sync_clock(ws, clock: ClockSync):
+    while True:
+        await ws.send(clock.ping())
+        await asyncio.sleep(PING_INTERVAL)
+
+
+async def _receive(ws, queue: asyncio.Queue, replay: ReplayBuffer, clock: ClockSync | None,
+                   metrics: Metrics | None, clipboard: ClipboardSession | None,
+                   motion_channel=None):
+    """Handle messages from the server: acks trim the replay buffer; pongs
+    update the clock offset, which is passed on so the server can place
+    capture times; typed replies are reported; clipboard messages go to
+    the sync session; a motion channel offer goes to ``motion_channel``.  Queues _LOST when the
+    connection goes away."""
+    try:
+        async for message in ws:
+            event = decode_message(message)
+            t = event["type"]
+            if t == "ack":
+                replay.ack(event["seq"])
+            elif t == "welcome":
+                _welcome(event, replay)
+            elif t == "motion_channel":
+                if motion_channel is not None:
+                    motion_channel(event)
+            elif t == "typed":
+                print(f"typed {event['chars']} chars on the server")
+            elif t == "control":
+                print("input control granted" if event["granted"]
+                      else "another client has control; input is ignored until it is idle")
+            elif t == "pong":
+                if clock is not None:
+                    metrics.record("rtt", "ping", clock.pong(event))
+                    await ws.send(clock.clock_message())
+            elif clipboard is not None:
+                await clipboard.handle(event)
+    except websockets.ConnectionClosed:
+        pass
+    queue.put_nowait(_LOST)
+
+
+async def _offline(queue: Backlog, unsent: Backlog, delay: float, toggle) -> bool:
+    """Move input captured while disconnected for ``delay`` seconds to
+    ``unsent``, which compacts it like the send queue until it can go out
+    after the replay; True if Ctrl+Esc was pressed meanwhile."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + delay
+    while (remaining := deadline - loop.time()) > 0:
+        try:
+            event = await asyncio.wait_for(queue.get(), remaining)
+        except TimeoutError:
+            break
+        if event is None:
+            return True
+        if event is _TOGGLE:
+            toggle()
+        elif event is not _LOST:
+            unsent.put_nowait(event)
+    return False
+
+
+def _welcome(event: dict, replay: ReplayBuffer):
+    replay.welcomed()
+    if event["resumed"]:
+        replay.ack(event["ack"])
+        if replay.dropped:
+            print(f"session resumed; {replay.dropped} unacknowledged events were lost (replay buffer full)")
+            replay.dropped = 0
+    elif len(replay):
+        print(f"session expired on the server; {len(replay)} buffered events discarded")
+        replay.clear()
+
+
+def _clipboard_session(ws, codec, spawn, sync: bool):
+    """Clipboard session for one connection, used by control commands and,
+    with ``sync``, a watcher keeping both clipboards in step."""
+
+    async def write(text: str):
+        await write_local(text)
+        if sync:
+            print(f"clipboard updated from server ({len(text)} chars)")
+
+    session = ClipboardSession(ws.send, codec, read=read_local, write=write, spawn=spawn)
+    if not sync:
+        return session, None
+
+    async def changed(text: str):
+        result = await session.push(text)
+        if result == "done":
+            print(f"clipboard sent to server ({len(text)} chars)")
+        elif result != "have":
+            print(f"clipboard rejected by server: {result}")
+
+    return session, ClipboardWatcher(read_local, changed)
+
+
+async def _report(metrics: Metrics, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        print(format_snapshot(metrics.snapshot()))
+
+
+_ENCODINGS = {
+    "binary": [BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL],
+    "json": [JSON_SUBPROTOCOL],
+}
+
+
+async def _send(host: str, port: int, suppress: bool, encoding: str = "binary",
+                batch_latency: float | None = None,
+                move_policy: CoalescePolicy | None = None,
+                scroll_policy: CoalescePolicy | None = None,
+                latency: bool = False, stats_interval: float = 0,
+                clipboard_sync: bool = False, priority: int = 0,
+                udp_motion: bool = False, udp_loss: float = 0.0, profile: str = "default",
+                backlog: int = BACKLOG, trace: str | None = None, trace_sample: int = 1,
+                pointer: str = "relative", display: str | None = None):
+    uri = f"ws://{host}:{port}{display_path(display)}"
+    queue = Backlog(backlog)
+    loop = asyncio.get_running_loop()
+    latency = latency or stats_interval > 0 or trace is not None
+    tracer = Tracer(trace, "client", trace_sample) if trace else None
+    metrics = Metrics() if latency else None
+    clock = None
+    if latency:
+        clock = ClockSync()
+        metrics.gauges["queue_depth"] = queue.qsize
+        metrics.gauges["queue_compacted"] = lambda: queue.compacted
+        metrics.gauges["queue_dropped"] = lambda: queue.dropped
+        metrics.gauges["clock_offset_ms"] = lambda: (
+            None if clock.offset is None else round(clock.offset / 1e6, 3))
+    replay = ReplayBuffer()
+    unsent = Backlog(backlog)  # captured while disconnected; sent first on reconnect
+    session_id = new_session_id()
+    backoff = Backoff()
+    tasks = set()
+    if stats_interval > 0:
+        metrics.gauges["replay_buffered"] = lambda: len(replay)
+        tasks.add(asyncio.create_task(_report(metrics, stats_interval)))
+
+    def dial():
+        return asyncio.ensure_future(websockets.connect(
+            uri, subprotocols=_ENCODINGS[encoding], ping_interval=KEEPALIVE, ping_timeout=KEEPALIVE,
+            **profiles.options(profile)))
 
     print(f"connecting to {uri} ...")
+    dialing = dial()
     try:
-        async with websockets.connect(uri) as ws:
+        bridge, kl, ml = await asyncio.to_thread(
+            _start_capture, loop, queue, suppress, move_policy, scroll_policy, latency,
+            JsonCodec, tracer)
+    except BaseException:
+        dialing.cancel()
+        raise
+    if pointer == "absolute":
+        desktop = Desktop(probe)
+        try:
+            desktop.update()
+        except RuntimeError:
+            print("cannot find the desktop size; sending relative pointer motion")
+        else:
+            bridge.desktop = desktop
+    active = True
+
+    def toggle():
+        nonlocal active, ml
+        ml.stop()
+        bridge.flush_pending()
+        active = not active
+        bridge._active = active
+        bridge._last_mouse_pos = None
+        sup = suppress if active else False
+        bridge._suppress = sup
+        ml = _start_mouse_listener(bridge, sup)
+        if active:
+            mode = "suppress ON" if suppress else "suppress off"
+            print(f"ACTIVE ({mode})")
+        else:
+            print("PAUSED (local input)")
+
+    async def connection(ws) -> bool:
+        """Pump events over ``ws`` until Ctrl+Esc (True) or the connection is lost."""
+        conn_tasks = set()
+
+        def spawn(coro):
+            task = asyncio.create_task(coro)
+            conn_tasks.add(task)
+            task.add_done_callback(conn_tasks.discard)
+
+        bridge.codec = codec_for(ws.subprotocol)
+        profiles.tune(ws, profile)
+        watcher = sender = None
+
+        async def send_input(message: str):
+            bridge._emit(message)  # numbered and sent in order with live input
+
+        def motion_channel(event):
+            nonlocal sender
+            if event["port"] is None:
+                print("server does not offer udp motion; moves stay on the WebSocket")
+                return
+            sender = MotionSender(loop, host, event["port"], event["channel"],
+                                  bytes.fromhex(event["key"]), udp_loss)
+            bridge.flush_pending_move()
+            bridge.motion = sender
+            print(f"udp motion on (port {event['port']})")
+
+        async def send(events):
+            replay.add(events)
+            if tracer is not None:
+                await _send_traced(ws, events, tracer)
+            else:
+                for frame in _frames(events):
+                    await ws.send(frame)
+            if metrics is not None:
+                _record_sent(events, metrics)
+
+        try:
+            await ws.send(replay.hello(session_id, priority))
+            for frame in _frames(replay.pending()):
+                await ws.send(frame)
+            if not unsent.empty():
+                await send([unsent.get_nowait() for _ in range(unsent.qsize())])
             mode = "suppress ON" if suppress else "suppress off"
-            print(f"connected — ACTIVE ({mode}, Ctrl+Tab to toggle, Ctrl+Esc to stop)")
+            print(f"connected ({bridge.codec.subprotocol}, {profile} profile on {profiles.loop_name()}) "
+                  f"— ACTIVE ({mode}, Ctrl+Tab to toggle, Ctrl+Esc to stop)")
+            clipboard, watcher = _clipboard_session(ws, bridge.codec, spawn, clipboard_sync)
+            link.attach(clipboard, ws.subprotocol, send_input)
+            if watcher is not None:
+                await ws.send(json.dumps({"type": "clipboard_sync"}))
+                watcher.start()
+                print("clipboard sync on")
+            if udp_motion:
+                await ws.send(json.dumps({"type": "motion_open"}))
+            if latency:
+                spawn(_sync_clock(ws, clock))
+            spawn(_receive(ws, queue, replay, clock, metrics, clipboard,
+                           motion_channel if udp_motion else None))
+
             while True:
                 event = await queue.get()
+                if batch_latency is not None and event is not None and event is not _TOGGLE \
+                        and event is not _LOST:
+                    events, event = await _collect(queue, event, batch_latency)
+                    await send(events)
+                    if event is _NO_CONTROL:
+                        continue
                 if event is None:
-                    break
+                    return True
+                if event is _LOST:
+                    return False
                 if event is _TOGGLE:
-                    ml.stop()
-                    bridge.flush_pending_move()
-                    active = not active
-                    bridge._active = active
-                    bridge._last_mouse_pos = None
-                    sup = suppress if active else False
-                    bridge._suppress = sup
-                    ml = _start_mouse_listener(bridge, sup)
-                    if active:
-                        mode = "suppress ON" if suppress else "suppress off"
-                        print(f"ACTIVE ({mode})")
-                    else:
-                        print("PAUSED (local input)")
+                    toggle()
                     continue
-                await ws.send(event)
+                await send([event])
+        finally:
+            link.detach()
+            if sender is not None:
+                bridge.motion = None
+                sender.close()
+                print(sender.stats_line())
+            if watcher is not None:
+                watcher.stop()
+            for task in list(conn_tasks):
+                task.cancel()
+
+    link = Link(host, port)
+    link.status_extra = lambda: (f"{len(replay)} events unacknowledged, {unsent.qsize()} unsent, "
+                                 f"{queue.stats_line()}")
+    listener = await control.serve(host, port, link.commands(), display)
+
+    try:
+        while True:
+            try:
+                async with await dialing as ws:
+                    backoff.reset()
+                    if await connection(ws):
+                        break
+                    reason = "connection lost"
+            except (OSError, TimeoutError, websockets.WebSocketException) as e:
+                reason = str(e) or type(e).__name__
+            delay = backoff.next()
+            print(f"{reason}, reconnecting in {delay:.1f}s ({len(replay) + unsent.qsize()} events buffered)")
+            if await _offline(queue, unsent, delay, toggle):
+                break
+            dialing = dial()
     finally:
+        dialing.cancel()
+        control.close(listener, host, port, display)
+        for task in tasks:
+            task.cancel()
         ml.stop()
         kl.stop()
+        if tracer is not None:
+            tracer.clock_offset = clock.offset
+            tracer.write()
         print("stopped")
 
 
-def run_client(host: str = "localhost", port: int = 8765, suppress: bool = False):
-    asyncio.run(_send(host, port, suppress))
-
-
-# ── Clipboard ─────────────────────────────────────────────────────
-
-async def _copy_to(host: str, port: int):
-    uri = f"ws://{host}:{port}"
-    text = pyperclip.paste()
-    async with websockets.connect(uri) as ws:
-        await ws.send(json.dumps({"type": "clipboard_push", "text": text}))
-    print(f"clipboard sent to server ({len(text)} chars)")
-
-
-async def _copy_from(host: str, port: int):
-    uri = f"ws://{host}:{port}"
-    async with websockets.connect(uri) as ws:
-        await ws.send(json.dumps({"type": "clipboard_pull"}))
-        response = await ws.recv()
-    data = json.loads(response)
-    pyperclip.copy(data["text"])
-    print(f"clipboard received from server ({len(data['text'])} chars)")
-
-
-def run_copy_to(host: str = "localhost", port: int = 8765):
-    asyncio.run(_copy_to(host, port))
-
-
-def run_copy_from(host: str = "localhost", port: int = 8765):
-    asyncio.run(_copy_from(host, port))
+def run_client(host: str = "localhost", port: int = 8765, suppress: bool = False,
+               encoding: str = "binary", batch_latency: float | None = None,
+               move_policy: CoalescePolicy | None = None,
+               scroll_policy: CoalescePolicy | None = None,
+               latency: bool = False, stats_interval: float = 0,
+               clipboard_sync: bool = False, priority: int = 0,
+               udp_motion: bool = False, udp_loss: float = 0.0, profile: str = "default",
+               backlog: int = BACKLOG, trace: str | None = None, trace_sample: int = 1,
+               pointer: str = "relative", display: str | None = None):
+    """``batch_latency`` enables multi-event frames: queued events are
+    drained into one message, waiting at most that many seconds.
+    ``latency`` timestamps events and keeps the server's clock offset
+    estimate current; ``stats_interval`` also prints latency stats.
+    ``clipboard_sync`` keeps both clipboards in step for the session.
+    ``priority`` counts on servers arbitrating in priority mode.
+    ``udp_motion`` sends pointer motion as UDP datagrams if the server
+    offers it, dropping the ``udp_loss`` fraction of them to simulate a
+    lossy link.  ``profile`` is a transport profile from profiles.py.
+    ``backlog`` bounds the events queued for sending (see backlog.py).
+    ``trace`` writes sampled per-stage spans to that file on exit, one
+    event in ``trace_sample`` (see trace.py); it implies ``latency``.
+    ``pointer`` "absolute" sends pointer positions as fractions of the
+    desktop instead of deltas (see screen.py).  ``display`` picks one of
+    the displays a server started with ``--display`` serves."""
+    profiles.run(_send(host, port, suppress, encoding, batch_latency,
+                       move_policy, scroll_policy, latency, stats_interval,
+                       clipboard_sync, priority, udp_motion, udp_loss, profile, backlog,
+                       trace, trace_sample, pointer, display), profile)
@@ -0,0 +1,570 @@
+"""Streamed clipboard transfer.
+
+Clipboard content is sent as a stream of chunks instead of one JSON
+string, so a large paste neither has to be JSON-escaped as a whole nor
+holds up input events sharing the connection.
+
+  sender                                  receiver
+  clipboard_offer {id, size, hash,  --->
+                   compressed, chunks}
+                                    <---  clipboard_want {id}
+                                          or clipboard_have {id}  (same hash held)
+                                          or clipboard_error {id, error}
+  clipboard_chunk {id, seq, data}   --->  (binary frame, or base64 in JSON)
+  ...
+                                    <---  clipboard_done {id}  (content applied)
+
+A pull (``clipboard_pull`` with ``stream: true`` and the puller's own
+content hash) is answered with clipboard_have, or with an offer that is
+followed by its chunks straight away.
+
+``size`` and ``hash`` (sha256) refer to the UTF-8 text; chunks carry it
+zlib-compressed when that made it meaningfully smaller.
+
+Continuous sync (``mows send --clipboard-sync``) runs the same transfers
+over the live session in both directions: each end watches its own
+clipboard (ClipboardWatcher) and pushes changes.  Each ClipboardSession
+remembers the hash both ends are known to hold, so unchanged content is
+never re-sent and content just received is not echoed back.
+"""
+
+import asyncio
+import base64
+import ctypes
+import ctypes.util
+import hashlib
+import itertools
+import json
+import os
+import select
+import sys
+import threading
+import zlib
+
+CHUNK_SIZE = 256 * 1024
+MAX_CLIPBOARD = 64 * 1024 * 1024  # bytes of UTF-8 text
+COMPRESS_RATIO = 0.9  # compress only if it saves at least 10%
+REPLY_TIMEOUT = 30.0  # copy-to / copy-from: longest wait for each server message
+
+_ids = itertools.count(1)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class Transfer:
+    """Outgoing clipboard content, ready to be chunked."""
+
+    def __init__(self, text: str):
+        self.raw = text.encode()
+        self.hash = content_hash(self.raw)
+        packed = zlib.compress(self.raw, 1)
+        self.compressed = len(packed) < COMPRESS_RATIO * len(self.raw)
+        self.payload = packed if self.compressed else self.raw
+        self.id = next(_ids)
+
+    @property
+    def chunks(self) -> int:
+        return max(1, -(-len(self.payload) // CHUNK_SIZE))
+
+    def offer(self, **extra) -> str:
+        return json.dumps({
+            "type": "clipboard_offer", "id": self.id, "size": len(self.raw),
+            "hash": self.hash, "compressed": self.compressed, "chunks": self.chunks,
+            **extra,
+        })
+
+    async def stream(self, send, codec, progress=None):
+        """Send every chunk through ``send``, yielding to the event loop
+        between them so other traffic on the connection is interleaved."""
+        for seq in range(self.chunks):
+            data = self.payload[seq * CHUNK_SIZE:(seq + 1) * CHUNK_SIZE]
+            await send(codec.clipboard_chunk(self.id, seq, data))
+            if progress is not None:
+                progress(min((seq + 1) * CHUNK_SIZE, len(self.payload)), len(self.payload))
+            await asyncio.sleep(0)
+
+
+class TransferError(Exception):
+    pass
+
+
+class Receiver:
+    """Reassembles one incoming transfer, decompressing as chunks arrive."""
+
+    def __init__(self, offer: dict, limit: int = MAX_CLIPBOARD):
+        if offer["size"] > limit:
+            raise TransferError(f"clipboard of {offer['size']} bytes exceeds limit of {limit}")
+        self.id = offer["id"]
+        self.size = offer["size"]
+        self.hash = offer["hash"]
+        self.chunks = offer["chunks"]
+        self._inflate = zlib.decompressobj() if offer["compressed"] else None
+        self._parts = []
+        self._received = 0
+        self._next = 0
+
+    @property
+    def received(self) -> int:
+        return self._received
+
+    def add(self, chunk: dict) -> bool:
+        """Take a clipboard_chunk event.  Returns True once complete."""
+        if chunk["seq"] != self._next:
+            raise TransferError(f"chunk {chunk['seq']} out of order, expected {self._next}")
+        data = chunk["data"]
+        if isinstance(data, str):
+            data = base64.b64decode(data)
+        if self._inflate is not None:
+            # never inflate past the announced size
+            data = self._inflate.decompress(data, self.size - self._received + 1)
+            if self._inflate.unconsumed_tail:
+                raise TransferError("clipboard data larger than announced")
+        self._received += len(data)
+        if self._received > self.size:
+            raise TransferError("clipboard data larger than announced")
+        self._parts.append(data)
+        self._next += 1
+        return self._next == self.chunks
+
+    def text(self) -> str:
+        raw = b"".join(self._parts)
+        if len(raw) != self.size or content_hash(raw) != self.hash:
+            raise TransferError("clipboard content does not match its hash")
+        return raw.decode()
+
+
+async def read_local() -> str:
+    """This machine's clipboard text."""
+    import pyperclip
+    return await asyncio.to_thread(pyperclip.paste)
+
+
+async def write_local(text: str):
+    import pyperclip
+    await asyncio.to_thread(pyperclip.copy, text)
+
+
+def progress_printer(label: str):
+    """Progress callback printing a single updating line."""
+
+    def show(done: int, total: int):
+        pct = 100 * done // total if total else 100
+        print(f"\r{label}: {done / 1e6:.1f}/{total / 1e6:.1f} MB ({pct}%)",
+              end="\n" if done >= total else "", file=sys.stderr, flush=True)
+
+    return show
+
+
+# ── Sessions ──────────────────────────────────────────────────────
+
+_REPLIES = ("clipboard_want", "clipboard_have", "clipboard_done", "clipboard_error")
+
+
+class ClipboardSession:
+    """Clipboard transfers in both directions over one connection.
+
+    ``send`` sends a message to the peer; ``read`` and ``write`` get and
+    set the local clipboard.  All three are async callables.  ``spawn``
+    runs background work (applying a finished transfer, answering a pull)
+    alongside the connection.  ``known`` is the hash of the content both
+    ends are known to hold.
+    """
+
+    def __init__(self, send, codec, read, write, limit: int = MAX_CLIPBOARD, spawn=None):
+        self._send = send
+        self.codec = codec
+        self._read = read
+        self._write = write
+        self._limit = limit
+        self.known = None
+        self._incoming = {}  # transfer id -> Receiver
+        self._replies = {}   # transfer or pull id -> asyncio.Queue of replies
+        self._pulled = {}    # incoming transfer id -> id of the pull it answers
+        self._spawn = spawn or asyncio.ensure_future
+
+    async def handle(self, event: dict) -> bool:
+        """Process a clipboard message from the peer.  False if it is not one."""
+        t = event["type"]
+        if t == "clipboard_chunk":
+            await self._chunk(event)
+        elif t == "clipboard_offer":
+            await self._offer(event)
+        elif t == "clipboard_pull" and event.get("stream"):
+            self._spawn(self._serve_pull(event))
+        elif t in _REPLIES:
+            replies = self._replies.get(event.get("pull", event["id"]))
+            if replies is not None:
+                replies.put_nowait(event)
+        else:
+            return False
+        return True
+
+    # ── outgoing ─────────────────────────────────────────────────────
+
+    async def push(self, text: str, progress=None) -> str:
+        """Send ``text`` unless the peer already holds it.  Returns "have",
+        "done", or the peer's error message."""
+        transfer = await asyncio.to_thread(Transfer, text)
+        return await self.push_transfer(transfer, progress)
+
+    async def push_transfer(self, transfer: Transfer, progress=None) -> str:
+        """Like push(), for an already prepared Transfer."""
+        if transfer.hash == self.known:
+            return "have"
+        replies = self._replies[transfer.id] = asyncio.Queue()
+        try:
+            await self._send(transfer.offer())
+            reply = await replies.get()
+            if reply["type"] == "clipboard_want":
+                await transfer.stream(self._send, self.codec, progress)
+                reply = await replies.get()
+        finally:
+            del self._replies[transfer.id]
+        if reply["type"] == "clipboard_error":
+            return reply["error"]
+        self.known = transfer.hash
+        return reply["type"][len("clipboard_"):]
+
+    async def pull(self) -> str:
+        """Copy the peer's clipboard into the local one.  Returns "have",
+        "done", or the error."""
+        pull_id = next(_ids)
+        replies = self._replies[pull_id] = asyncio.Queue()
+        try:
+            await self._send(json.dumps({"type": "clipboard_pull", "stream": True,
+                                         "id": pull_id, "hash": await self._local_hash()}))
+            reply = await replies.get()
+        finally:
+            del self._replies[pull_id]
+        if reply["type"] == "clipboard_error":
+            return reply["error"]
+        return reply["type"][len("clipboard_"):]
+
+    async def _serve_pull(self, event: dict):
+        text = await self._read()
+        transfer = await asyncio.to_thread(Transfer, text)
+        pull = {"pull": event["id"]} if "id" in event else {}
+        if transfer.hash == event.get("hash"):
+            await self._send(json.dumps({"type": "clipboard_have", "id": transfer.id, **pull}))
+            return
+        await self._send(transfer.offer(**pull))
+        await transfer.stream(self._send, self.codec)
+        self.known = transfer.hash
+        print(f"clipboard sent ({len(transfer.raw)} bytes)")
+
+    # ── incoming ─────────────────────────────────────────────────────
+
+    async def _offer(self, event: dict):
+        if "pull" in event:  # answers our pull; chunks follow unasked
+            try:
+                self._incoming[event["id"]] = Receiver(event, self._limit)
+            except TransferError as e:
+                self._pulled[event["id"]] = event["pull"]
+                await self._finish(event["id"], {"type": "clipboard_error", "error": str(e)})
+            else:
+                self._pulled[event["id"]] = event["pull"]
+            return
+        reply = {"type": "clipboard_want", "id": event["id"]}
+        try:
+            receiver = Receiver(event, self._limit)
+        except TransferError as e:
+            reply = {"type": "clipboard_error", "id": event["id"], "error": str(e)}
+        else:
+            if event["hash"] == self.known or event["hash"] == await self._local_hash():
+                self.known = event["hash"]
+                reply["type"] = "clipboard_have"
+            else:
+                self._incoming[event["id"]] = receiver
+        await self._send(json.dumps(reply))
+
+    async def _local_hash(self) -> str:
+        text = await self._read()
+        return await asyncio.to_thread(lambda: content_hash(text.encode()))
+
+    async def _chunk(self, event: dict):
+        receiver = self._incoming.get(event["id"])
+        if receiver is None:
+            return
+        try:
+            done = receiver.add(event)
+        except TransferError as e:
+            del self._incoming[event["id"]]
+            await self._finish(event["id"], {"type": "clipboard_error", "error": str(e)})
+            return
+        if done:
+            del self._incoming[event["id"]]
+            self._spawn(self._apply(receiver))
+
+    async def _apply(self, receiver: Receiver):
+        try:
+            text = await asyncio.to_thread(receiver.text)
+        except TransferError as e:
+            await self._finish(receiver.id, {"type": "clipboard_error", "error": str(e)})
+            return
+        self.known = receiver.hash
+        await self._write(text)
+        await self._finish(receiver.id, {"type": "clipboard_done"})
+
+    async def _finish(self, transfer_id: int, reply: dict):
+        """Report the outcome of an incoming transfer: to the peer, or to
+        our own pull() if the transfer answered one."""
+        pull = self._pulled.pop(transfer_id, None)
+        if pull is None:
+            await self._send(json.dumps({**reply, "id": transfer_id}))
+        elif pull in self._replies:
+            self._replies[pull].put_nowait({**reply, "id": pull})
+
+
+# ── Change detection ──────────────────────────────────────────────
+
+class ClipboardWatcher:
+    """Calls ``on_change(text)`` when the local clipboard content changes.
+
+    On X11 with XFixes, the clipboard is re-read when its selection owner
+    changes, with a slow poll as a safety net.  Elsewhere it is polled,
+    backing off from POLL_MIN to POLL_MAX while nothing changes.  Reads
+    are compared against the previous text before anything is hashed or
+    sent.  ``read`` and ``on_change`` are async callables.  ``display``
+    is the X display whose selection is watched (default: DISPLAY).
+    The X connection and its thread are the watcher's own, and are
+    closed by ``stop``.
+    """
+
+    POLL_MIN = 0.25
+    POLL_MAX = 4.0
+
+    def __init__(self, read, on_change, initial: bool = True, display: str | None = None):
+        self._read = read
+        self._on_change = on_change
+        self._initial = initial
+        self._display = display
+        self._task = None
+        self._selection = None  # _SelectionWatch while running
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._selection is not None:
+            self._selection.close()
+
+    async def _run(self):
+        self._selection = _SelectionWatch.open(asyncio.get_running_loop(), self._display)
+        try:
+            await self._poll(self._selection and self._selection.changed)
+        finally:
+            if self._selection is not None:
+                self._selection.close()
+
+    async def _poll(self, changed: asyncio.Event | None):
+        last = await self._read()
+        if self._initial:
+            await self._on_change(last)
+        delay = self.POLL_MIN
+        while True:
+            if changed is not None:
+                try:
+                    await asyncio.wait_for(changed.wait(), self.POLL_MAX)
+                except asyncio.TimeoutError:
+                    pass
+                changed.clear()
+            else:
+                await asyncio.sleep(delay)
+            text = await self._read()
+            if text == last:
+                delay = min(delay * 2, self.POLL_MAX)
+                continue
+            last = text
+            delay = self.POLL_MIN
+            try:
+                await self._on_change(text)
+            except Exception as e:
+                print(f"clipboard sync failed: {e!r}")
+
+
+class _SelectionWatch:
+    """XFixes notifications of CLIPBOARD owner changes on one display.
+
+    A thread waits on the X connection and on a wakeup pipe with
+    select(); ``changed`` is set on the loop for every notification.
+    ``close`` wakes the thread through the pipe, joins it, and only then
+    closes the display, so nothing touches the loop after it returns.
+    """
+
+    def __init__(self, loop, x11, dpy):
+        self._loop = loop
+        self._x11 = x11
+        self._dpy = dpy
+        self.changed = asyncio.Event()
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="mows-clipboard-watch", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def open(cls, loop, display: str | None = None):
+        """Watch ``display`` (default: DISPLAY); None if the display or
+        the XFixes extension is unavailable."""
+        if sys.platform != "linux":
+            return None
+        from .screen import libx11
+
+        x11 = libx11()
+        xfixes_path = ctypes.util.find_library("Xfixes")
+        if x11 is None or not xfixes_path:
+            return None
+        try:
+            xfixes = ctypes.cdll.LoadLibrary(xfixes_path)
+            x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            x11.XOpenDisplay.restype = ctypes.c_void_p
+            x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+            x11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+            x11.XPending.argtypes = [ctypes.c_void_p]
+            x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+            x11.XDefaultRootWindow.restype = ctypes.c_ulong
+            x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+            x11.XInternAtom.restype = ctypes.c_ulong
+            x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+            x11.XFlush.argtypes = [ctypes.c_void_p]
+            xfixes.XFixesQueryExtension.argtypes = [
+                ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+            xfixes.XFixesSelectSelectionInput.argtypes = [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+            dpy = x11.XOpenDisplay(display.encode() if display else None)
+            if not dpy:
+                return None
+            base, err = ctypes.c_int(), ctypes.c_int()
+            if not xfixes.XFixesQueryExtension(dpy, ctypes.byref(base), ctypes.byref(err)):
+                x11.XCloseDisplay(dpy)
+                return None
+            clipboard = x11.XInternAtom(dpy, b"CLIPBOARD", 0)
+            set_owner_mask = 1  # XFixesSetSelectionOwnerNotifyMask
+            xfixes.XFixesSelectSelectionInput(dpy, x11.XDefaultRootWindow(dpy), clipboard,
+                                              set_owner_mask)
+            x11.XFlush(dpy)
+        except (OSError, AttributeError):
+            return None
+        return cls(loop, x11, dpy)
+
+    def _run(self):
+        x11, dpy = self._x11, self._dpy
+        fd = x11.XConnectionNumber(dpy)
+        event = ctypes.create_string_buffer(192)  # sizeof(XEvent)
+        while True:
+            # XPending reads what has arrived; events already queued by
+            # Xlib would not make the socket readable again
+            seen = False
+            while x11.XPending(dpy):
+                x11.XNextEvent(dpy, event)
+                seen = True
+            if seen:
+                self._loop.call_soon_threadsafe(self.changed.set)
+            ready, _, _ = select.select([fd, self._wake_r], [], [])
+            if self._wake_r in ready:
+                return
+
+    def close(self):
+        """Stop the thread and close the display; safe to call twice."""
+        if self._dpy is None:
+            return
+        os.write(self._wake_w, b"x")
+        self._thread.join()
+        self._x11.XCloseDisplay(self._dpy)
+        self._dpy = None
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+# ── One-shot commands ─────────────────────────────────────────────
+
+async def _recv(ws, decode=json.loads):
+    try:
+        return decode(await asyncio.wait_for(ws.recv(), REPLY_TIMEOUT))
+    except TimeoutError:
+        raise TransferError(f"no reply from the server within {REPLY_TIMEOUT:.0f}s") from None
+
+
+async def _copy_to(host: str, port: int, display: str | None = None):
+    import websockets
+    from .protocol import SUBPROTOCOLS, codec_for, display_path
+
+    uri = f"ws://{host}:{port}{display_path(display)}"
+    text = await read_local()
+    transfer = await asyncio.to_thread(Transfer, text)
+    try:
+        async with websockets.connect(uri, subprotocols=SUBPROTOCOLS) as ws:
+            await ws.send(transfer.offer())
+            reply = await _recv(ws)
+            if reply["type"] == "clipboard_have":
+                print("server clipboard already up to date")
+                return
+            if reply["type"] == "clipboard_error":
+                print(f"clipboard rejected by server: {reply['error']}")
+                return
+            await transfer.stream(ws.send, codec_for(ws.subprotocol),
+                                  progress_printer("sending clipboard"))
+            reply = await _recv(ws)
+    except TransferError as e:
+        print(f"clipboard transfer failed: {e}")
+        return
+    if reply["type"] == "clipboard_error":
+        print(f"clipboard transfer failed: {reply['error']}")
+    else:
+        print(f"clipboard sent to server ({len(text)} chars)")
+
+
+async def _copy_from(host: str, port: int, display: str | None = None):
+    import websockets
+    from .protocol import SUBPROTOCOLS, decode_message, display_path
+
+    uri = f"ws://{host}:{port}{display_path(display)}"
+    local = content_hash((await read_local()).encode())
+    try:
+        async with websockets.connect(uri, subprotocols=SUBPROTOCOLS) as ws:
+            await ws.send(json.dumps({"type": "clipboard_pull", "stream": True, "hash": local}))
+            text = await _pulled(ws, decode_message)
+    except TransferError as e:
+        print(f"clipboard transfer failed: {e}")
+        return
+    if text is None:
+        print("local clipboard already up to date")
+        return
+    await write_local(text)
+    print(f"clipboard received from server ({len(text)} chars)")
+
+
+async def _pulled(ws, decode) -> str | None:
+    """The text answering a clipboard_pull sent on ``ws``; None if the
+    local clipboard already holds it.  Raises TransferError."""
+    offer = await _recv(ws, decode)
+    t = offer["type"]
+    if t == "clipboard_have":
+        return None
+    if t == "clipboard_data":  # server without streaming
+        return offer["text"]
+    if t == "clipboard_error":
+        raise TransferError(f"rejected by server: {offer['error']}")
+    if t != "clipboard_offer":
+        raise TransferError(f"unexpected {t} from server")
+    receiver = Receiver(offer)
+    progress = progress_printer("receiving clipboard")
+    while True:
+        chunk = await _recv(ws, decode)
+        if chunk["type"] == "clipboard_error":
+            raise TransferError(chunk["error"])
+        if receiver.add(chunk):
+            break
+        progress(receiver.received, receiver.size)
+    progress(receiver.size, receiver.size)
+    return await asyncio.to_thread(receiver.text)
+
+
+def run_copy_to(host: str = "localhost", port: int = 8765, display: str | None = None):
+    asyncio.run(_copy_to(host, port, display))
+
+
+def run_copy_from(host: str = "localhost", port: int = 8765, display: str | None = None):
+    asyncio.run(_copy_from(host, port, display))
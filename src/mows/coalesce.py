@@ -0,0 +1,102 @@
+"""Adaptive coalescing of pointer motion and scroll deltas.
+
+Captured deltas are added to a Coalescer; the event loop flushes the
+accumulated sum on a timer whose period follows a CoalescePolicy:
+
+  - the flush rate scales with how fast the pointer is moving, from the
+    policy's target rate at its reference speed up to MAX_HZ
+  - a growing send backlog slows flushes down so the link is not flooded
+  - pending motion is never held longer than ``max_staleness``
+  - with nothing pending no timer runs at all
+
+Deltas are added on the event loop too: the hook threads only queue raw
+events for it (see client.EventBridge), so a Coalescer takes no lock.
+"""
+
+import time
+
+MAX_HZ = 1000.0
+
+
+class CoalescePolicy:
+    """Flush-rate policy for one kind of delta.
+
+    ``target_hz`` is the flush rate while deltas arrive at
+    ``reference_speed`` units per second; faster motion flushes more
+    often (up to MAX_HZ), slower motion less often.  ``backlog_soft`` is
+    the queue depth at which the rate is halved.
+    """
+
+    def __init__(self, target_hz: float = 250.0, max_staleness: float = 0.05,
+                 reference_speed: float = 1000.0, backlog_soft: int = 32):
+        self.target_hz = min(target_hz, MAX_HZ)
+        self.max_staleness = max_staleness
+        self.reference_speed = reference_speed
+        self.backlog_soft = backlog_soft
+
+    @classmethod
+    def scroll(cls, target_hz: float = 60.0, max_staleness: float = 0.05):
+        """Policy for scroll ticks, which arrive far slower than pixels."""
+        return cls(target_hz, max_staleness, reference_speed=20.0, backlog_soft=8)
+
+    def interval(self, speed: float, backlog: int) -> float:
+        """Seconds between flushes for the given speed and queue depth."""
+        hz = self.target_hz * speed / self.reference_speed
+        hz = min(max(hz, 1.0 / self.max_staleness), MAX_HZ)
+        if backlog:
+            hz /= 1 + backlog / self.backlog_soft
+        return min(1.0 / hz, self.max_staleness)
+
+
+class Coalescer:
+    """Accumulates (dx, dy) deltas until flushed.  Not thread-safe: only
+    the event loop uses it."""
+
+    def __init__(self, policy: CoalescePolicy):
+        self.policy = policy
+        self._dx = 0
+        self._dy = 0
+        self._since = None  # monotonic time of the oldest unflushed delta
+        self._last_flush = 0.0
+        self._speed = policy.reference_speed
+
+    @property
+    def pending(self) -> bool:
+        return self._since is not None
+
+    def add(self, dx, dy, now: float | None = None) -> bool:
+        """Accumulate a delta captured at monotonic time ``now`` (default:
+        now).  Returns True if a flush must be scheduled."""
+        self._dx += dx
+        self._dy += dy
+        if self._since is None:
+            self._since = time.monotonic() if now is None else now
+            return True
+        return False
+
+    def delay(self, backlog: int) -> float:
+        """Seconds from now until the pending delta is due."""
+        since = self._since
+        if since is None:
+            return 0.0
+        # motion starting after an idle period is assumed to be moving at
+        # the reference speed until a flush has measured it
+        if since - self._last_flush > self.policy.max_staleness:
+            self._speed = self.policy.reference_speed
+        due = since + self.policy.interval(self._speed, backlog)
+        return max(0.0, due - time.monotonic())
+
+    def take(self):
+        """Return and reset the pending (dx, dy, since), where ``since`` is
+        the monotonic time of its oldest delta; updates the speed estimate."""
+        dx, dy, since = self._dx, self._dy, self._since
+        self._dx = 0
+        self._dy = 0
+        self._since = None
+        if since is None:
+            return 0, 0, None
+        now = time.monotonic()
+        sample = (abs(dx) + abs(dy)) / (now - since + 1.0 / MAX_HZ)
+        self._speed = 0.5 * self._speed + 0.5 * sample
+        self._last_flush = now
+        return dx, dy, since
@@ -0,0 +1,175 @@
+"""Local control socket for one-shot commands.
+
+A running ``mows send`` or ``mows daemon`` listens on a Unix-domain
+socket per server it is connected to, so commands like ``mows copy-to``
+can reuse that warm connection instead of starting their own.  The
+exchange is one JSON line each way:
+
+    -> {"cmd": "copy-to"}
+    <- {"ok": true, "message": "clipboard sent to server (12 chars)"}
+
+The socket lives in ``$XDG_RUNTIME_DIR``, or in ``/tmp/mows-<uid>``
+without one.  Whoever can write to that directory could put their own
+socket in place of ours, so both sides refuse to use it unless it is a
+real directory owned by this user with mode 0700.
+
+This module only uses the standard library, and the command side does
+not even import asyncio, so it stays cheap to start.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+
+TIMEOUT = 120.0  # longest a command may take, e.g. a large clipboard
+LIMIT = 64 * 1024 * 1024  # longest request or reply line, as clipboard.MAX_CLIPBOARD
+
+
+class CommandError(Exception):
+    """A control command failed; the message goes back to the caller."""
+
+
+def available() -> bool:
+    return sys.platform != "win32" and hasattr(socket, "AF_UNIX")
+
+
+def control_path(host: str, port: int, display: str | None = None) -> str:
+    """Socket path for the connection to ``host``:``port`` (and ``display``
+    on it, if named), private to this user."""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if not base:
+        import tempfile
+        base = os.path.join(tempfile.gettempdir(), f"mows-{os.getuid()}")
+    name = f"mows-{host}-{port}" if display is None else f"mows-{host}-{port}-{display}"
+    return os.path.join(base, f"{name}.sock")
+
+
+def _unsafe(base: str) -> str | None:
+    """Why the socket directory ``base`` must not be used, or None if it
+    is a directory (not a symlink) owned by this user with mode 0700."""
+    try:
+        st = os.lstat(base)
+    except OSError as e:
+        return str(e)
+    if not stat.S_ISDIR(st.st_mode):
+        return f"{base} is not a directory"
+    if st.st_uid != os.getuid():
+        return f"{base} is owned by uid {st.st_uid}, not {os.getuid()}"
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        return f"{base} has mode {stat.S_IMODE(st.st_mode):o}, not 700"
+    return None
+
+
+# ── Command side ──────────────────────────────────────────────────
+
+def request(host: str, port: int, cmd: str, display: str | None = None, **args) -> dict | None:
+    """Run ``cmd`` through a session connected to ``host``:``port``
+    (``display``).  None if no session is listening."""
+    if not available():
+        return None
+    path = control_path(host, port, display)
+    if os.path.exists(path) and (reason := _unsafe(os.path.dirname(path))):
+        print(f"not using control socket: {reason}", file=sys.stderr)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        sock.settimeout(TIMEOUT)
+        sock.sendall(json.dumps({"cmd": cmd, **args}).encode() + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+            if len(data) > LIMIT:
+                return {"ok": False, "message": "control reply too long"}
+    if not data:
+        return {"ok": False, "message": "control socket closed without a reply"}
+    return json.loads(data)
+
+
+# ── Session side ──────────────────────────────────────────────────
+
+async def serve(host: str, port: int, commands: dict, display: str | None = None):
+    """Listen for commands on the control socket for ``host``:``port``
+    (``display``).
+
+    ``commands`` maps a command name to an async callable taking the
+    request dict and returning the reply message.  Returns the server,
+    or None if sockets are unsupported, the socket directory is unsafe or
+    another live session already owns the path.
+    """
+    import asyncio
+
+    if not available():
+        return None
+    path = control_path(host, port, display)
+    base = os.path.dirname(path)
+    try:
+        os.mkdir(base, 0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        print(f"control socket directory {base}: {e}; not listening")
+        return None
+    if reason := _unsafe(base):
+        print(f"control socket directory unsafe: {reason}; not listening")
+        return None
+    if os.path.exists(path):
+        if _alive(path):
+            print(f"control socket {path} is owned by another session; not listening")
+            return None
+        os.unlink(path)
+
+    async def handle(reader, writer):
+        try:
+            line = await reader.readline()  # ValueError past LIMIT
+            req = json.loads(line)
+            command = commands.get(req.get("cmd"))
+            if command is None:
+                reply = {"ok": False, "message": f"unknown command: {req.get('cmd')!r}"}
+            else:
+                reply = {"ok": True, "message": await asyncio.wait_for(command(req), TIMEOUT)}
+        except Exception as e:
+            reply = {"ok": False, "message": str(e) or type(e).__name__}
+        try:
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+        finally:
+            writer.close()
+
+    umask = os.umask(0o077)  # so the socket is never bound open to others
+    try:
+        server = await asyncio.start_unix_server(handle, path, limit=LIMIT)
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+    return server
+
+
+def close(server, host: str, port: int, display: str | None = None):
+    if server is None:
+        return
+    server.close()
+    try:
+        os.unlink(control_path(host, port, display))
+    except OSError:
+        pass
+
+
+def _alive(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
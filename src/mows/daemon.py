@@ -0,0 +1,140 @@
+"""mows daemon — keeps warm connections for one-shot commands.
+
+Each configured server gets a WebSocket connection that is kept open
+(reconnecting with backoff) and a control socket (see control.py), so
+``mows copy-to`` / ``copy-from`` / ``type`` skip the connect and
+handshake.  A running ``mows send`` session offers the same commands for
+its server.
+"""
+
+import asyncio
+import time
+
+import websockets
+
+from . import control
+from .clipboard import ClipboardSession, read_local, write_local
+from .control import CommandError
+from .protocol import SUBPROTOCOLS, codec_for, decode_message
+from .resume import KEEPALIVE, Backoff
+from .text import type_text_message
+
+
+class Link:
+    """The connection to one server, as seen by control commands."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.clipboard = None  # ClipboardSession while connected
+        self.send_input = None  # async callable sending an input message, while connected
+        self.subprotocol = None
+        self.since = None
+        self.connects = 0
+        self.status_extra = None  # optional callable adding to the status line
+
+    def attach(self, clipboard: ClipboardSession, subprotocol: str | None, send_input=None):
+        self.clipboard = clipboard
+        self.send_input = send_input
+        self.subprotocol = subprotocol
+        self.since = time.monotonic()
+        self.connects += 1
+
+    def detach(self):
+        self.clipboard = None
+        self.send_input = None
+
+    def commands(self) -> dict:
+        return {"copy-to": self._copy_to, "copy-from": self._copy_from, "type": self._type,
+                "status": self._status}
+
+    def _session(self) -> ClipboardSession:
+        if self.clipboard is None:
+            raise CommandError(f"not connected to {self.host}:{self.port} (reconnecting)")
+        return self.clipboard
+
+    async def _copy_to(self, req: dict) -> str:
+        session = self._session()
+        text = await read_local()
+        result = await session.push(text)
+        if result == "have":
+            return "server clipboard already up to date"
+        if result != "done":
+            raise CommandError(f"clipboard rejected by server: {result}")
+        return f"clipboard sent to server ({len(text)} chars)"
+
+    async def _copy_from(self, req: dict) -> str:
+        result = await self._session().pull()
+        if result == "have":
+            return "local clipboard already up to date"
+        if result != "done":
+            raise CommandError(f"clipboard transfer failed: {result}")
+        return "clipboard received from server"
+
+    async def _type(self, req: dict) -> str:
+        self._session()
+        text = req["text"]
+        await self.send_input(type_text_message(text, req.get("rate") or 0))
+        return f"{len(text)} chars sent to the server for typing"
+
+    async def _status(self, req: dict) -> str:
+        if self.clipboard is None:
+            line = f"ws://{self.host}:{self.port}: not connected"
+        else:
+            line = (f"ws://{self.host}:{self.port}: connected ({self.subprotocol or 'json'}) "
+                    f"for {time.monotonic() - self.since:.0f}s, {self.connects} connect(s)")
+        if self.status_extra is not None:
+            line += ", " + self.status_extra()
+        return line
+
+
+async def _keep(link: Link):
+    uri = f"ws://{link.host}:{link.port}"
+    backoff = Backoff()
+    while True:
+        try:
+            async with websockets.connect(uri, subprotocols=SUBPROTOCOLS,
+                                          ping_interval=KEEPALIVE, ping_timeout=KEEPALIVE) as ws:
+                backoff.reset()
+                session = ClipboardSession(ws.send, codec_for(ws.subprotocol),
+                                           read=read_local, write=write_local)
+                link.attach(session, ws.subprotocol, ws.send)
+                print(f"connected to {uri} ({ws.subprotocol or 'json'})")
+                async for message in ws:
+                    await session.handle(decode_message(message))
+            reason = "connection closed"
+        except (OSError, TimeoutError, websockets.WebSocketException) as e:
+            reason = str(e) or type(e).__name__
+        finally:
+            link.detach()
+        delay = backoff.next()
+        print(f"{uri}: {reason}, reconnecting in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def _daemon(servers: list):
+    if not control.available():
+        print("control sockets are not supported on this platform")
+        return
+    links = [Link(host, port) for host, port in servers]
+    listeners = []
+    try:
+        for link in links:
+            listener = await control.serve(link.host, link.port, link.commands())
+            if listener is not None:
+                listeners.append((listener, link))
+                print(f"control socket {control.control_path(link.host, link.port)}")
+        if not listeners:
+            return
+        await asyncio.gather(*(_keep(link) for _, link in listeners))
+    finally:
+        for listener, link in listeners:
+            control.close(listener, link.host, link.port)
+
+
+def run_daemon(servers: list):
+    """``servers`` is a list of (host, port) pairs to keep connected."""
+    try:
+        asyncio.run(_daemon(servers))
+    except KeyboardInterrupt:
+        print('goodbye')
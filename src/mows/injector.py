@@ -0,0 +1,276 @@
+"""Injection worker for the mows server.
+
+Injection calls (pynput, X11/Win32 via ctypes) and clipboard access can
+block, so they run on a dedicated thread fed by a bounded queue instead
+of on the asyncio loop that reads every client's socket.
+
+Each producer (a client session, or None for the server itself) gets
+its own lane: a bounded queue of its events.  The worker takes one event
+from each non-empty lane in turn, so a client flooding its lane cannot
+delay or starve the others.
+
+Lane ordering:
+  - events are applied in arrival order, except that key events jump
+    ahead of relative moves and absolute positions still waiting at the
+    tail of the lane (keys do not depend on the pointer position; clicks
+    and scrolls do, so they stay behind the motion that precedes them)
+  - a move arriving while the newest op of its lane is also a move is
+    merged into it, so a lagging injector applies one catch-up jump
+    instead of replaying stale motion step by step
+  - likewise an absolute position replaces a position at the tail: only
+    the newest one matters
+  - when a lane is full, ``put`` waits, pushing back on that producer's
+    socket only
+
+``flush`` (optional) runs on the worker each time the queue drains, so
+backends that buffer requests flush once per batch, not once per event.
+
+``tick`` (optional) is work the worker does on a timer, between events:
+it is called every time round and returns how many seconds until it
+wants to be called again, or None if it has nothing to do.  Interpolated
+pointer playback (pointer.py) runs this way, on the one thread that
+talks to the backend.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+_MOVE = "mouse_move"
+_POSITION = "mouse_position"
+_MOTION = (_MOVE, _POSITION)
+_KEYS = ("key_press", "key_release")
+
+
+class _Lane:
+    """One producer's queued ops and counters."""
+
+    def __init__(self, producer):
+        self.producer = producer
+        self.ops = deque()  # [event, future | None]
+        self.space = asyncio.Event()
+        self.blocked = False
+        self.ready = False  # in the worker's round-robin
+        self.closed = False
+        self.peak_depth = 0
+        self.merged = 0
+        self.waits = 0  # times ``put`` had to wait for space
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self.ops),
+            "peak_depth": self.peak_depth,
+            "merged": self.merged,
+            "waits": self.waits,
+        }
+
+
+class Injector:
+    """Applies events on a worker thread via ``apply(event)``.
+
+    ``maxsize`` bounds each lane, not the total.
+    """
+
+    def __init__(self, apply, loop: asyncio.AbstractEventLoop, maxsize: int = 256,
+                 flush=None, tick=None):
+        self._apply = apply
+        self._flush = flush
+        self._tick = tick
+        self._loop = loop
+        self._maxsize = maxsize
+        self._lanes = {}  # producer -> _Lane
+        self._ready = deque()  # lanes with ops, in round-robin order
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="mows-injector", daemon=True)
+        self.peak_depth = 0
+        self.merged = 0
+        self.injected = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=1)
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "peak_depth": self.peak_depth,
+            "merged": self.merged,
+            "injected": self.injected,
+            "lanes": len(self._lanes),
+        }
+
+    def stats_line(self) -> str:
+        return " ".join(f"{k}={v}" for k, v in self.stats().items())
+
+    def lane_stats(self, producer) -> dict | None:
+        lane = self._lanes.get(producer)
+        return None if lane is None else lane.stats()
+
+    # ── producer side (event loop) ───────────────────────────────────
+
+    async def put(self, event: dict, producer=None):
+        """Queue an event on ``producer``'s lane, waiting while it is full."""
+        lane = self._lanes.get(producer)
+        if lane is None or lane.closed:
+            lane = self._lane(producer)
+        while True:
+            lane.space.clear()
+            if self._offer(lane, event, None):
+                return
+            lane.waits += 1
+            await lane.space.wait()
+
+    async def call(self, event: dict, producer=None):
+        """Queue an event and wait for the value ``apply`` returns for it."""
+        lane = self._lanes.get(producer)
+        if lane is None or lane.closed:
+            lane = self._lane(producer)
+        fut = self._loop.create_future()
+        while True:
+            lane.space.clear()
+            if self._offer(lane, event, fut):
+                return await fut
+            lane.waits += 1
+            await lane.space.wait()
+
+    def offer(self, event: dict, producer=None) -> bool:
+        """Queue an event without waiting; False if the lane is full."""
+        lane = self._lanes.get(producer)
+        if lane is None or lane.closed:
+            lane = self._lane(producer)
+        return self._offer(lane, event, None)
+
+    def close(self, producer):
+        """``producer`` is gone: forget its lane once the worker drained it."""
+        with self._cond:
+            lane = self._lanes.get(producer)
+            if lane is None:
+                return
+            lane.closed = True
+            if not lane.ops:
+                del self._lanes[producer]
+
+    def _lane(self, producer) -> _Lane:
+        with self._cond:
+            lane = self._lanes.get(producer)
+            if lane is None:
+                lane = self._lanes[producer] = _Lane(producer)
+            lane.closed = False  # a resumed session keeps its undrained lane
+            return lane
+
+    def _offer(self, lane: _Lane, event: dict, fut) -> bool:
+        with self._cond:
+            ops = lane.ops
+            t = event["type"]
+            if t == _MOVE and ops and ops[-1][0]["type"] == _MOVE:
+                # the merged move keeps the older move's other fields,
+                # e.g. its capture timestamp
+                last = ops[-1][0]
+                merged = dict(last)
+                merged["dx"] = last["dx"] + event["dx"]
+                merged["dy"] = last["dy"] + event["dy"]
+                ops[-1][0] = merged
+                lane.merged += 1
+                self.merged += 1
+                return True
+            if t == _POSITION and ops and ops[-1][0]["type"] == _POSITION:
+                # latest wins; the capture timestamp stays the older one's,
+                # as for merged moves
+                last = ops[-1][0]
+                ops[-1][0] = dict(last, x=event["x"], y=event["y"])
+                lane.merged += 1
+                self.merged += 1
+                return True
+            if len(ops) >= self._maxsize:
+                lane.blocked = True
+                return False
+            if t in _KEYS and ops and ops[-1][0]["type"] in _MOTION:
+                ops.insert(len(ops) - 1, [event, fut])
+            else:
+                ops.append([event, fut])
+            if len(ops) > lane.peak_depth:
+                lane.peak_depth = len(ops)
+            self._depth += 1
+            if self._depth > self.peak_depth:
+                self.peak_depth = self._depth
+            if not lane.ready:
+                lane.ready = True
+                self._ready.append(lane)
+            self._cond.notify()
+            return True
+
+    # ── worker thread ────────────────────────────────────────────────
+
+    def _run(self):
+        dirty = False
+        ready = self._ready
+        tick = self._tick
+        delay = None
+        while True:
+            if tick is not None:
+                try:
+                    delay = tick()
+                except Exception as e:
+                    print(f"injection tick failed: {e!r}")
+                    delay = None
+                if delay is not None:
+                    dirty = True
+            if dirty and self._flush is not None and not ready:
+                dirty = False
+                try:
+                    self._flush()
+                except Exception as e:
+                    print(f"injection flush failed: {e!r}")
+            with self._cond:
+                if delay is not None:
+                    if not ready and not self._stopped:
+                        self._cond.wait(delay)
+                    if not ready and not self._stopped:
+                        continue  # time for the next tick
+                while not ready and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                lane = ready.popleft()
+                event, fut = lane.ops.popleft()
+                self._depth -= 1
+                if lane.ops:
+                    ready.append(lane)
+                else:
+                    lane.ready = False
+                    if lane.closed and self._lanes.get(lane.producer) is lane:
+                        del self._lanes[lane.producer]
+                if lane.blocked:
+                    lane.blocked = False
+                    self._loop.call_soon_threadsafe(lane.space.set)
+            dirty = True
+            try:
+                result = self._apply(event)
+            except Exception as e:
+                print(f"injection failed for {event['type']}: {e!r}")
+                if fut is not None:
+                    self._loop.call_soon_threadsafe(_settle, fut, None, e)
+                continue
+            self.injected += 1
+            if fut is not None:
+                self._loop.call_soon_threadsafe(_settle, fut, result, None)
+
+
+def _settle(fut: asyncio.Future, result, exc):
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
@@ -0,0 +1,151 @@
+"""Latency metrics for mows.
+
+Events can carry the client's capture timestamp (``t``, monotonic ns).
+Client and server clocks are unrelated, so the client estimates the
+offset between them from ping/pong round trips (ClockSync) and tells
+the server, which can then place capture times on its own clock.
+
+Latencies are kept per (stage, event type) in rolling windows of the
+newest samples, and reported as p50/p95/p99:
+
+  client  queue      capture -> handed to the socket
+          rtt        ping round trip
+  server  transport  capture -> frame received
+          queue      frame received -> injection starts
+          inject     injection call
+          total      capture -> injection done
+"""
+
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+PING_INTERVAL = 2.0  # seconds between clock-sync pings
+
+
+class LatencyWindow:
+    """The newest ``size`` samples of one latency, in nanoseconds."""
+
+    def __init__(self, size: int = WINDOW):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, ns: int):
+        self._samples.append(ns)
+        self.count += 1
+
+    def quantiles(self, qs=QUANTILES) -> list:
+        s = sorted(self._samples)
+        if not s:
+            return [None for _ in qs]
+        return [s[min(len(s) - 1, int(q * len(s)))] for q in qs]
+
+
+class Metrics:
+    """Rolling latency windows plus named gauges.
+
+    ``record`` may be called from any thread.
+    """
+
+    def __init__(self, size: int = WINDOW):
+        self._size = size
+        self._windows = {}  # (stage, event type) -> LatencyWindow
+        self.gauges = {}    # name -> callable returning a number
+
+    def record(self, stage: str, kind: str, ns: int):
+        w = self._windows.get((stage, kind))
+        if w is None:
+            w = self._windows.setdefault((stage, kind), LatencyWindow(self._size))
+        w.add(ns)
+
+    def snapshot(self) -> dict:
+        rows = []
+        for (stage, kind), w in sorted(self._windows.items()):
+            qs = w.quantiles()
+            rows.append({
+                "stage": stage, "type": kind, "count": w.count,
+                **{f"p{round(q * 100)}_ms": None if v is None else v / 1e6
+                   for q, v in zip(QUANTILES, qs)},
+            })
+        gauges = {name: f() for name, f in self.gauges.items()}
+        return {"latency": rows, "gauges": gauges}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the current snapshot."""
+        lines = [
+            "# HELP mows_latency_seconds event latency per stage over a rolling window",
+            "# TYPE mows_latency_seconds summary",
+        ]
+        for (stage, kind), w in sorted(self._windows.items()):
+            labels = f'stage="{stage}",type="{kind}"'
+            for q, v in zip(QUANTILES, w.quantiles()):
+                if v is not None:
+                    lines.append(f'mows_latency_seconds{{{labels},quantile="{q}"}} {v / 1e9:.9f}')
+            lines.append(f"mows_latency_seconds_count{{{labels}}} {w.count}")
+        for name, f in self.gauges.items():
+            lines.append(f"# TYPE mows_{name} gauge")
+            lines.append(f"mows_{name} {f()}")
+        return "\n".join(lines) + "\n"
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """Human-readable table of a ``Metrics.snapshot()``."""
+
+    def ms(v):
+        return "-" if v is None else f"{v:.2f}"
+
+    lines = [f"{'stage':<10} {'type':<14} {'count':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+    for r in snapshot["latency"]:
+        lines.append(f"{r['stage']:<10} {r['type']:<14} {r['count']:>8} "
+                     f"{ms(r['p50_ms']):>8} {ms(r['p95_ms']):>8} {ms(r['p99_ms']):>8}")
+    if snapshot["gauges"]:
+        lines.append(" ".join(f"{k}={v}" for k, v in snapshot["gauges"].items()))
+    return "\n".join(lines)
+
+
+class ClockSync:
+    """Estimates (server clock - client clock) from ping/pong round trips.
+
+    Of the last few samples, the one with the smallest round trip is
+    trusted, since its one-way delays are the most nearly symmetric.
+    """
+
+    def __init__(self, keep: int = 8):
+        self._samples = deque(maxlen=keep)  # (rtt_ns, offset_ns)
+        self.offset = None
+
+    def ping(self) -> str:
+        return json.dumps({"type": "ping", "t": time.monotonic_ns()})
+
+    def pong(self, event: dict):
+        """Take a pong reply; returns the sample's round trip in ns."""
+        now = time.monotonic_ns()
+        rtt = now - event["t"]
+        self._samples.append((rtt, event["server"] - (event["t"] + now) // 2))
+        self.offset = min(self._samples)[1]
+        return rtt
+
+    def clock_message(self) -> str:
+        return json.dumps({"type": "clock", "offset": self.offset})
+
+
+def run_stats(host: str = "localhost", port: int = 8766, watch: float = 0):
+    """Print a server's latency table, fetched from its /stats endpoint."""
+    url = f"http://{host}:{port}/stats"
+    try:
+        while True:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                snapshot = json.load(response)
+            print(format_snapshot(snapshot))
+            if watch <= 0:
+                return
+            time.sleep(watch)
+            print()
+    except urllib.error.URLError as e:
+        print(f"cannot reach {url}: {e.reason}")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,262 @@
+"""Lossy UDP side channel for pointer motion.
+
+On the WebSocket every event shares one ordered TCP stream, so a single
+lost segment holds back all the motion queued behind it and the cursor
+stutters.  With ``mows send --udp-motion`` against a server started with
+``--udp-motion``, relative moves travel as UDP datagrams instead.  Keys,
+clicks, scrolls and clipboard stay on the WebSocket.
+
+The channel is negotiated over the WebSocket:
+
+    -> {"type": "motion_open"}
+    <- {"type": "motion_channel", "port": p, "channel": id, "key": hex}
+       (port is null if the server does not offer UDP motion)
+
+Datagram, little-endian:
+
+    I channel | Q seq | q total dx | q total dy | 16s MAC
+
+The MAC is keyed BLAKE2b over the preceding bytes, with the per-channel
+key.  It is a fraction of the cost of HMAC-SHA256, which matters at one
+datagram per pointer update.
+
+A datagram carries the running totals of all motion sent on the channel,
+not a delta.  The receiver applies the difference between the newest
+totals and what it applied so far, so a lost datagram costs nothing once
+a later one arrives.  A datagram whose seq is not above the newest seen
+is stale and dropped.  Gaps in seq are counted as lost, and a datagram
+arriving after a newer one as reordered (a late datagram filling a gap
+counts as both).  The sender
+repeats its newest datagram once motion pauses for TAIL seconds, in case
+the last one of a burst was lost.
+
+Before a click or scroll the client sends the same totals reliably:
+
+    {"type": "motion", "channel": id, "seq": n, "dx": total, "dy": total}
+
+so the pointer has arrived before the button goes down, however late the
+datagrams are.  It travels as an input event, numbered for resume.
+"""
+
+import hmac
+import json
+import random
+import secrets
+import socket
+import struct
+import threading
+from hashlib import blake2b
+
+TAIL = 0.03
+KEY_BYTES = 32
+MAC_BYTES = 16
+
+_BODY = struct.Struct("<IQqq")
+_CHANNEL = struct.Struct("<I")
+DATAGRAM_SIZE = _BODY.size + MAC_BYTES
+
+
+def _mac(key: bytes, body: bytes) -> bytes:
+    return blake2b(body, key=key, digest_size=MAC_BYTES).digest()
+
+
+# ── Client ────────────────────────────────────────────────────────
+
+class MotionSender:
+    """Sends motion totals for one negotiated channel.
+
+    ``move`` may be called from any thread.  ``loss`` drops that fraction
+    of datagrams on purpose, to try the channel over a clean link.
+    """
+
+    def __init__(self, loop, host: str, port: int, channel: int, key: bytes,
+                 loss: float = 0.0):
+        self._loop = loop
+        self.channel = channel
+        self._key = key
+        self._lock = threading.Lock()
+        family, _, _, _, addr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._sock.connect(addr)
+        self._loss = loss
+        self.seq = 0
+        self.dx = self.dy = 0
+        self._synced = 0  # seq last sent over the WebSocket
+        self._last = None  # newest datagram
+        self._tail = None  # TimerHandle while a repeat is due
+        self._tail_seq = 0
+        self.sent = 0
+        self.dropped = 0  # by ``loss``
+        self.errors = 0
+
+    def move(self, dx: int, dy: int):
+        with self._lock:
+            self.seq += 1
+            self.dx += dx
+            self.dy += dy
+            body = _BODY.pack(self.channel, self.seq, self.dx, self.dy)
+            self._last = datagram = body + _mac(self._key, body)
+            self._send(datagram)
+            if self._tail is None:
+                self._tail = True  # claimed; the handle is set on the loop
+                self._loop.call_soon_threadsafe(self._arm)
+
+    def _send(self, datagram: bytes):
+        if self._sock is None:  # closed while a hook thread was moving
+            return
+        if self._loss and random.random() < self._loss:
+            self.dropped += 1
+            return
+        try:
+            self._sock.send(datagram)
+            self.sent += 1
+        except OSError:  # e.g. ICMP port unreachable from an earlier datagram
+            self.errors += 1
+
+    def _arm(self):
+        with self._lock:
+            if self._sock is not None:
+                self._tail = self._loop.call_later(TAIL, self._repeat)
+
+    def _repeat(self):
+        with self._lock:
+            if self.seq != self._tail_seq:  # still moving: check again later
+                self._tail_seq = self.seq
+                self._tail = self._loop.call_later(TAIL, self._repeat)
+                return
+            self._tail = None
+            self._send(self._last)
+
+    def sync(self) -> str | None:
+        """Reliable copy of the current totals, if they changed since the last one."""
+        with self._lock:
+            if self.seq == self._synced:
+                return None
+            self._synced = self.seq
+            return json.dumps({"type": "motion", "channel": self.channel, "seq": self.seq,
+                               "dx": self.dx, "dy": self.dy})
+
+    def close(self):
+        with self._lock:
+            if self._tail is not None and self._tail is not True:
+                self._tail.cancel()
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def stats_line(self) -> str:
+        line = f"udp motion sent={self.sent} errors={self.errors}"
+        if self._loss:
+            line += f" dropped={self.dropped}"
+        return line
+
+
+# ── Server ────────────────────────────────────────────────────────
+
+class MotionChannel:
+    """Receiving end of one client's channel."""
+
+    def __init__(self, channel: int, key: bytes):
+        self.channel = channel
+        self.key = key
+        self.seq = 0  # seq of the newest totals, from a datagram or a sync
+        self.dx = self.dy = 0
+        self._newest = 0  # newest datagram seq, for the loss counters
+        self.applied_dx = self.applied_dy = 0
+        self.on_motion = None  # called with the channel after a fresh datagram
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def offer(self) -> dict:
+        return {"channel": self.channel, "key": self.key.hex()}
+
+    def datagram(self, data: bytes) -> bool:
+        """Take a datagram; True if it brought newer totals."""
+        if len(data) != DATAGRAM_SIZE or not hmac.compare_digest(
+                _mac(self.key, data[:_BODY.size]), data[_BODY.size:]):
+            self.rejected += 1
+            return False
+        _, seq, dx, dy = _BODY.unpack_from(data)
+        self.received += 1
+        newest = self._newest
+        if seq > newest:
+            self.lost += seq - newest - 1
+            self._newest = seq
+        elif seq == newest:
+            self.duplicates += 1
+        else:
+            self.reordered += 1
+        return self._update(seq, dx, dy)
+
+    def sync(self, event: dict) -> bool:
+        """Take totals sent over the WebSocket; True if they are newer."""
+        if event["channel"] != self.channel:
+            return False  # from a channel of an earlier connection
+        return self._update(event["seq"], event["dx"], event["dy"])
+
+    def _update(self, seq: int, dx: int, dy: int) -> bool:
+        if seq <= self.seq:
+            return False
+        self.seq, self.dx, self.dy = seq, dx, dy
+        return True
+
+    def pending(self) -> tuple[int, int]:
+        """Motion received but not applied yet."""
+        return self.dx - self.applied_dx, self.dy - self.applied_dy
+
+    def applied(self):
+        self.applied_dx, self.applied_dy = self.dx, self.dy
+
+    def stats(self) -> dict:
+        return {
+            "udp_received": self.received,
+            "udp_lost": self.lost,
+            "udp_reordered": self.reordered,
+            "udp_duplicates": self.duplicates,
+            "udp_rejected": self.rejected,
+        }
+
+
+class MotionEndpoint:
+    """asyncio datagram protocol routing datagrams to their channel."""
+
+    def __init__(self):
+        self.channels = {}  # channel id -> MotionChannel
+        self.unknown = 0
+        self.port = None
+        self.transport = None
+
+    def open(self) -> MotionChannel:
+        while True:
+            channel_id = secrets.randbits(32)
+            if channel_id not in self.channels:
+                break
+        channel = self.channels[channel_id] = MotionChannel(channel_id, secrets.token_bytes(KEY_BYTES))
+        return channel
+
+    def close(self, channel: MotionChannel):
+        self.channels.pop(channel.channel, None)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < _CHANNEL.size:
+            self.unknown += 1
+            return
+        channel = self.channels.get(_CHANNEL.unpack_from(data)[0])
+        if channel is None:
+            self.unknown += 1
+            return
+        if channel.datagram(data) and channel.on_motion is not None:
+            channel.on_motion(channel)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        pass
@@ -0,0 +1,92 @@
+"""Server-side shaping of relative pointer motion.
+
+Received deltas pass through a Pointer before they reach the backend:
+
+  sensitivity   every delta is multiplied by this factor (a DPI scale);
+                the fractional part of the result is carried over to the
+                next move instead of being truncated away, so slow or
+                scaled-down motion is not lost
+  interpolation with ``refresh_hz`` set, a delta is not applied as one
+                jump: the motion still to play is spread over the next
+                refresh interval in evenly timed micro-moves, STEP apart,
+                so coarse wire rates still look smooth.  This adds up to
+                one refresh interval of latency.
+
+Clicks and scrolls depend on where the pointer is, so the injection
+calls ``settle`` before them, which plays any outstanding motion at once.
+Playback runs on the injector thread through its ``tick`` hook, so the
+backend still has a single caller.
+"""
+
+import math
+import time
+
+STEP = 0.001  # seconds between micro-moves
+_EPS = 1e-6
+
+
+class Pointer:
+    """Scales deltas, keeps sub-pixel remainders, and optionally plays
+    motion back over time through ``move(dx, dy)`` with whole pixels."""
+
+    def __init__(self, move, sensitivity: float = 1.0, refresh_hz: float = 0.0,
+                 step: float = STEP):
+        self._move = move
+        self.sensitivity = sensitivity
+        self.interval = 1 / refresh_hz if refresh_hz > 0 else 0.0
+        self._step = step
+        self._fx = self._fy = 0.0  # moved less than a pixel, carried over
+        self._rx = self._ry = 0.0  # still to play back
+        self._end = 0.0  # when the motion still to play should be done
+        self._next = 0.0  # time of the next micro-move
+        self.moves = 0  # backend calls
+
+    def move(self, dx, dy):
+        dx *= self.sensitivity
+        dy *= self.sensitivity
+        if not self.interval:
+            self._emit(dx, dy)
+            return
+        now = time.monotonic()
+        if not (self._rx or self._ry):
+            self._next = now
+        self._rx += dx
+        self._ry += dy
+        self._end = now + self.interval
+
+    def _emit(self, dx: float, dy: float):
+        fx = self._fx + dx
+        fy = self._fy + dy
+        # micro-moves that add up to a whole pixel can fall a hair short
+        ix = int(fx + _EPS if fx > 0 else fx - _EPS)
+        iy = int(fy + _EPS if fy > 0 else fy - _EPS)
+        self._fx, self._fy = fx - ix, fy - iy
+        if ix or iy:
+            self._move(ix, iy)
+            self.moves += 1
+
+    def settle(self):
+        """Play all outstanding motion now."""
+        if self._rx or self._ry:
+            rx, ry = self._rx, self._ry
+            self._rx = self._ry = 0.0
+            self._emit(rx, ry)
+
+    def tick(self) -> float | None:
+        """Make the micro-move that is due; seconds until the next one, or
+        None when there is nothing left to play."""
+        if not (self._rx or self._ry):
+            return None
+        now = time.monotonic()
+        if now < self._next:
+            return self._next - now
+        steps = math.ceil((self._end - now) / self._step)
+        if steps <= 1:
+            self.settle()
+            return None
+        dx, dy = self._rx / steps, self._ry / steps
+        self._rx -= dx
+        self._ry -= dy
+        self._emit(dx, dy)
+        self._next = now + self._step
+        return self._step
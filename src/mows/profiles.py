@@ -0,0 +1,60 @@
+"""Transport profiles for ``mows send`` and ``mows serve``.
+
+  default      websockets' defaults: permessage-deflate, 32 KiB write
+               buffer, 16 queued incoming messages, the stock asyncio loop
+  low-latency  tuned for a stream of tiny frames: no permessage-deflate
+               (input frames are a few bytes, and clipboard chunks are
+               already compressed), TCP_NODELAY set explicitly, small
+               write and socket send buffers so a backlog waits in the
+               client queue, where the coalescer can still merge it,
+               instead of in buffers nothing can touch; and uvloop when
+               it is installed
+
+Both ends pick their profile independently; compression is only used
+if both allow it.
+"""
+
+import asyncio
+import socket
+
+PROFILES = ("default", "low-latency")
+
+_OPTIONS = {
+    "default": {},
+    "low-latency": {"compression": None, "write_limit": 4096, "max_queue": 4},
+}
+_SNDBUF = 32 * 1024
+
+
+def options(profile: str) -> dict:
+    """Keyword arguments for ``websockets.connect`` / ``websockets.serve``."""
+    return _OPTIONS[profile]
+
+
+def tune(websocket, profile: str):
+    """Set the profile's socket options on an open connection."""
+    if profile != "low-latency":
+        return
+    sock = websocket.transport.get_extra_info("socket")
+    if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SNDBUF)
+
+
+def run(main, profile: str):
+    """``asyncio.run(main)``, on uvloop if the profile asks for it and it
+    is installed."""
+    if profile == "low-latency":
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.run(main)
+    return asyncio.run(main)
+
+
+def loop_name() -> str:
+    loop = asyncio.get_running_loop()
+    return "uvloop" if type(loop).__module__.startswith("uvloop") else "asyncio"
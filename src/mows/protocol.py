@@ -1,18 +1,77 @@
 """Shared event serialization/deserialization for mows protocol.
 
-JSON messages with a "type" field:
-  mouse_move, mouse_click, mouse_scroll, key_press, key_release
+Two encodings are offered as WebSocket subprotocols during the handshake,
+in order of preference:
+
+  mows.bin   fixed-layout binary frames, one opcode byte + packed fields
+  mows.json  JSON messages with a "type" field (fallback)
+
+Event types:
+  mouse_move, mouse_position, mouse_click, mouse_scroll, key_press,
+  key_release
+
+mouse_position carries an absolute pointer position as fractions of the
+desktop, see screen.py.
+
+Both encodings decode to the same dict shape, so the server does not
+care which one a client picked.  Control messages are always JSON;
+clipboard chunks use a binary frame where negotiated (see clipboard.py).
+
+Any event may carry an optional capture timestamp ``t`` (client
+monotonic ns), used for latency metrics.
+
+Several events may share one WebSocket message (a "frame"): a JSON
+array of event objects, or a binary OP_FRAME message of length-prefixed
+events.  Events in a frame are dispatched in order.
 """
 
+import base64
 import json
-from pynput.keyboard import Key, KeyCode
-from pynput.mouse import Button
+import struct
+from urllib.parse import quote, unquote
+
+# pynput's key and button types, imported by _pynput() on first use:
+# loading pynput initializes the platform input backend, which decoding
+# does not need (e.g. on a headless server with the null backend)
+Key = KeyCode = Button = None
+
+
+def _pynput():
+    global Key, KeyCode, Button
+    from pynput.keyboard import Key, KeyCode
+    from pynput.mouse import Button
+
+BINARY_SUBPROTOCOL = "mows.bin"
+JSON_SUBPROTOCOL = "mows.json"
+SUBPROTOCOLS = [BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL]
+
+# WebSocket path selecting one of several displays a server injects
+# into, e.g. /display/:3; "/" is the display the server was started on
+DISPLAY_PATH = "/display/"
+
+
+def display_path(display: str | None) -> str:
+    """What follows ws://HOST:PORT in the URI of ``display``."""
+    return "" if display is None else DISPLAY_PATH + quote(display, safe=":.")
+
+
+def path_display(path: str) -> str | None:
+    """The display named by a request path; None for the default one.
+    Raises ValueError for any other path."""
+    path = path.split("?", 1)[0]
+    if path == "/":
+        return None
+    if path.startswith(DISPLAY_PATH) and len(path) > len(DISPLAY_PATH):
+        return unquote(path[len(DISPLAY_PATH):])
+    raise ValueError(f"unknown path {path!r}")
 
 
 # ── Key serialization ──────────────────────────────────────────────
 
 def serialize_key(key) -> dict:
     """Convert a pynput key to a JSON-safe dict."""
+    if Key is None:
+        _pynput()
     if isinstance(key, Key):
         return {"kind": "special", "name": key.name}
     elif isinstance(key, KeyCode):
@@ -24,15 +83,50 @@ def serialize_key(key) -> dict:
         return {"kind": "char", "char": str(key)}
 
 
+_KEY_FIELDS = {"special": "name", "char": "char", "vk": "vk"}
+_CACHE_SIZE = 4096  # per cache; keyboards only have so many keys
+_decoded_keys = {}  # (kind, value) -> pynput key
+
+
 def deserialize_key(data: dict):
-    """Reconstruct a pynput key from a dict."""
+    """Reconstruct a pynput key from a dict.  Results are memoized."""
     kind = data["kind"]
-    if kind == "special":
-        return Key[data["name"]]
-    elif kind == "char":
-        return KeyCode.from_char(data["char"])
-    elif kind == "vk":
-        return KeyCode.from_vk(data["vk"])
+    ident = (kind, data[_KEY_FIELDS[kind]])
+    key = _decoded_keys.get(ident)
+    if key is None:
+        if Key is None:
+            _pynput()
+        if kind == "special":
+            key = Key[ident[1]]
+        elif kind == "char":
+            key = KeyCode.from_char(ident[1])
+        else:
+            key = KeyCode.from_vk(ident[1])
+        if len(_decoded_keys) < _CACHE_SIZE:
+            _decoded_keys[ident] = key
+    return key
+
+
+def _memoized(encode):
+    """Cache an event constructor's output by its (hashable) arguments.
+
+    Key and click events are fully determined by their arguments, so the
+    hook thread only pays for serialization the first time it sees one.
+    """
+    cache = {}
+
+    def encoded(*args):
+        try:
+            return cache[args]
+        except KeyError:
+            pass
+        message = encode(*args)
+        if len(cache) < _CACHE_SIZE:
+            cache[args] = message
+        return message
+
+    encoded.__doc__ = encode.__doc__
+    return encoded
 
 
 # ── Button serialization ──────────────────────────────────────────
@@ -42,6 +136,8 @@ def serialize_button(button) -> str:
 
 
 def deserialize_button(name: str):
+    if Button is None:
+        _pynput()
     return Button[name]
 
 
@@ -51,6 +147,10 @@ def mouse_move_event(dx: int, dy: int) -> str:
     return json.dumps({"type": "mouse_move", "dx": dx, "dy": dy})
 
 
+def mouse_position_event(x: float, y: float) -> str:
+    return json.dumps({"type": "mouse_position", "x": round(x, 6), "y": round(y, 6)})
+
+
 def mouse_click_event(button, pressed: bool) -> str:
     return json.dumps({
         "type": "mouse_click",
@@ -78,3 +178,350 @@ def key_release_event(key) -> str:
         "type": "key_release",
         "key": serialize_key(key),
     })
+
+
+def clipboard_chunk_event(transfer_id: int, seq: int, data: bytes) -> str:
+    return json.dumps({
+        "type": "clipboard_chunk",
+        "id": transfer_id, "seq": seq,
+        "data": base64.b64encode(data).decode(),
+    })
+
+
+# ── Binary encoding ───────────────────────────────────────────────
+#
+#   mouse_move    B op | i dx | i dy
+#   mouse_click   B op | B button | B pressed  [| utf-8 name if button == 0xff]
+#   mouse_scroll  B op | i dx | i dy
+#   key_press     B op | B kind | key payload
+#   key_release   B op | B kind | key payload
+#   mouse_pos     B op | f x | f y          (fractions of the desktop)
+#   frame         B op | (H length | event)*
+#   clip chunk    B op | I transfer id | I seq | data
+#
+# An event opcode with FLAG_TIME set is followed by a q capture
+# timestamp, then the event's usual fields.
+#
+# Key payload by kind:
+#   special  H index into SPECIAL_KEYS
+#   named    utf-8 name (special keys not in SPECIAL_KEYS)
+#   char     utf-8 char
+#   vk       i vk
+#
+# All integers are little-endian.  The id tables below are part of the
+# wire format: only ever append to them.
+
+OP_FRAME = 0x00
+OP_MOUSE_MOVE = 0x01
+OP_MOUSE_CLICK = 0x02
+OP_MOUSE_SCROLL = 0x03
+OP_KEY_PRESS = 0x04
+OP_KEY_RELEASE = 0x05
+OP_MOUSE_POSITION = 0x06
+OP_CLIPBOARD_CHUNK = 0x10
+
+FLAG_TIME = 0x80
+
+KIND_SPECIAL = 0
+KIND_NAMED = 1
+KIND_CHAR = 2
+KIND_VK = 3
+
+BUTTON_NAMED = 0xff
+
+# union of pynput's Key members across platforms
+SPECIAL_KEYS = (
+    "alt", "alt_l", "alt_r", "alt_gr", "backspace", "caps_lock",
+    "cmd", "cmd_l", "cmd_r", "ctrl", "ctrl_l", "ctrl_r", "delete",
+    "down", "end", "enter", "esc", "home", "left", "page_down",
+    "page_up", "right", "shift", "shift_l", "shift_r", "space", "tab",
+    "up", "insert", "menu", "num_lock", "pause", "print_screen",
+    "scroll_lock",
+    "media_play_pause", "media_stop", "media_volume_mute",
+    "media_volume_down", "media_volume_up", "media_previous",
+    "media_next", "media_eject",
+) + tuple(f"f{i}" for i in range(1, 25))
+
+BUTTONS = (
+    "unknown", "left", "middle", "right", "x1", "x2",
+    "scroll_up", "scroll_down", "scroll_left", "scroll_right",
+) + tuple(f"button{i}" for i in range(8, 31))
+
+OP_NAMES = {
+    OP_MOUSE_MOVE: "mouse_move",
+    OP_MOUSE_CLICK: "mouse_click",
+    OP_MOUSE_SCROLL: "mouse_scroll",
+    OP_KEY_PRESS: "key_press",
+    OP_KEY_RELEASE: "key_release",
+    OP_MOUSE_POSITION: "mouse_position",
+    OP_CLIPBOARD_CHUNK: "clipboard_chunk",
+}
+
+_SPECIAL_KEY_IDS = {name: i for i, name in enumerate(SPECIAL_KEYS)}
+_BUTTON_IDS = {name: i for i, name in enumerate(BUTTONS)}
+
+_DELTA = struct.Struct("<Bii")
+_POSITION = struct.Struct("<Bff")
+_CLICK = struct.Struct("<BBB")
+_SPECIAL_ID = struct.Struct("<H")
+_VK = struct.Struct("<i")
+_LENGTH = struct.Struct("<H")
+_TIME = struct.Struct("<q")
+_CHUNK = struct.Struct("<BII")
+
+MAX_FRAME_EVENTS = 256
+
+
+def pack_key(key) -> bytes:
+    """Encode a pynput key as a kind byte followed by its payload."""
+    if Key is None:
+        _pynput()
+    if isinstance(key, Key):
+        i = _SPECIAL_KEY_IDS.get(key.name)
+        if i is None:
+            return bytes([KIND_NAMED]) + key.name.encode()
+        return bytes([KIND_SPECIAL]) + _SPECIAL_ID.pack(i)
+    elif isinstance(key, KeyCode):
+        if key.char is not None:
+            return bytes([KIND_CHAR]) + key.char.encode()
+        else:
+            return bytes([KIND_VK]) + _VK.pack(key.vk)
+    else:
+        return bytes([KIND_CHAR]) + str(key).encode()
+
+
+_unpacked_keys = {}  # packed key bytes -> key dict
+
+
+def unpack_key(data: bytes) -> dict:
+    """Decode a packed key into the same dict ``serialize_key`` returns.
+
+    Results are memoized by the packed bytes; callers must not mutate them.
+    """
+    raw = bytes(data)
+    key = _unpacked_keys.get(raw)
+    if key is not None:
+        return key
+    kind = raw[0]
+    if kind == KIND_SPECIAL:
+        key = {"kind": "special", "name": SPECIAL_KEYS[_SPECIAL_ID.unpack_from(raw, 1)[0]]}
+    elif kind == KIND_NAMED:
+        key = {"kind": "special", "name": raw[1:].decode()}
+    elif kind == KIND_CHAR:
+        key = {"kind": "char", "char": raw[1:].decode()}
+    elif kind == KIND_VK:
+        key = {"kind": "vk", "vk": _VK.unpack_from(raw, 1)[0]}
+    else:
+        raise ValueError(f"unknown key kind {kind}")
+    if len(_unpacked_keys) < _CACHE_SIZE:
+        _unpacked_keys[raw] = key
+    return key
+
+
+def pack_mouse_move(dx: int, dy: int) -> bytes:
+    return _DELTA.pack(OP_MOUSE_MOVE, int(dx), int(dy))
+
+
+def pack_mouse_position(x: float, y: float) -> bytes:
+    return _POSITION.pack(OP_MOUSE_POSITION, x, y)
+
+
+def pack_mouse_click(button, pressed: bool) -> bytes:
+    name = serialize_button(button)
+    i = _BUTTON_IDS.get(name)
+    if i is None:
+        return _CLICK.pack(OP_MOUSE_CLICK, BUTTON_NAMED, pressed) + name.encode()
+    return _CLICK.pack(OP_MOUSE_CLICK, i, pressed)
+
+
+def pack_mouse_scroll(dx: int, dy: int) -> bytes:
+    return _DELTA.pack(OP_MOUSE_SCROLL, int(dx), int(dy))
+
+
+def pack_key_press(key) -> bytes:
+    return bytes([OP_KEY_PRESS]) + pack_key(key)
+
+
+def pack_key_release(key) -> bytes:
+    return bytes([OP_KEY_RELEASE]) + pack_key(key)
+
+
+def _unpack_move(data) -> dict:
+    _, dx, dy = _DELTA.unpack_from(data)
+    return {"type": "mouse_move", "dx": dx, "dy": dy}
+
+
+def _unpack_position(data) -> dict:
+    _, x, y = _POSITION.unpack_from(data)
+    return {"type": "mouse_position", "x": x, "y": y}
+
+
+def _unpack_scroll(data) -> dict:
+    _, dx, dy = _DELTA.unpack_from(data)
+    return {"type": "mouse_scroll", "dx": dx, "dy": dy}
+
+
+def _unpack_click(data) -> dict:
+    _, i, pressed = _CLICK.unpack_from(data)
+    name = bytes(data[_CLICK.size:]).decode() if i == BUTTON_NAMED else BUTTONS[i]
+    return {"type": "mouse_click", "button": name, "pressed": bool(pressed)}
+
+
+def _unpack_key_press(data) -> dict:
+    return {"type": "key_press", "key": unpack_key(data[1:])}
+
+
+def _unpack_key_release(data) -> dict:
+    return {"type": "key_release", "key": unpack_key(data[1:])}
+
+
+def pack_clipboard_chunk(transfer_id: int, seq: int, data: bytes) -> bytes:
+    return _CHUNK.pack(OP_CLIPBOARD_CHUNK, transfer_id, seq) + data
+
+
+def _unpack_clipboard_chunk(data) -> dict:
+    _, transfer_id, seq = _CHUNK.unpack_from(data)
+    return {"type": "clipboard_chunk", "id": transfer_id, "seq": seq,
+            "data": bytes(data[_CHUNK.size:])}
+
+
+# indexed by opcode; unpackers ignore the opcode byte itself, which
+# lets a timestamped event be unpacked in place (see unpack_event)
+_UNPACKERS = [None] * 256
+_UNPACKERS[OP_MOUSE_MOVE] = _unpack_move
+_UNPACKERS[OP_MOUSE_CLICK] = _unpack_click
+_UNPACKERS[OP_MOUSE_SCROLL] = _unpack_scroll
+_UNPACKERS[OP_KEY_PRESS] = _unpack_key_press
+_UNPACKERS[OP_KEY_RELEASE] = _unpack_key_release
+_UNPACKERS[OP_MOUSE_POSITION] = _unpack_position
+_UNPACKERS[OP_CLIPBOARD_CHUNK] = _unpack_clipboard_chunk
+
+
+def unpack_event(data: bytes) -> dict:
+    """Decode a binary event into the same dict its JSON form loads to."""
+    op = data[0]
+    unpack = _UNPACKERS[op & ~FLAG_TIME]
+    if unpack is None:
+        raise ValueError(f"unknown opcode 0x{op:02x}")
+    if op & FLAG_TIME:
+        # skip the timestamp: the byte before the fields stands in for the opcode
+        event = unpack(data[_TIME.size:])
+        event["t"] = _TIME.unpack_from(data, 1)[0]
+        return event
+    return unpack(data)
+
+
+# ── Timestamps ────────────────────────────────────────────────────
+
+# a JSON event as the constructors above write it: "type" comes first
+_TYPE_HEAD = ', "type": "'
+
+
+def stamp(message, t: int):
+    """Attach capture time ``t`` (monotonic ns) to an encoded event.
+    A JSON event gets ``t`` as its first key."""
+    if isinstance(message, str):
+        return '{"t": %d, %s' % (t, message[1:])
+    return bytes((message[0] | FLAG_TIME,)) + _TIME.pack(t) + message[1:]
+
+
+def peek_stamp(message):
+    """(event type, capture time) of a message produced by ``stamp``,
+    without decoding the rest of it if its type comes right after the
+    time (JSON events from other writers are decoded)."""
+    if isinstance(message, str):
+        i = message.index(",", 6)  # the end of the time stamp() put first
+        t = int(message[6:i])
+        if message.startswith(_TYPE_HEAD, i):
+            j = i + len(_TYPE_HEAD)
+            return message[j:message.index('"', j)], t
+        return json.loads(message)["type"], t
+    return OP_NAMES[message[0] & ~FLAG_TIME], _TIME.unpack_from(message, 1)[0]
+
+
+def unstamp(message):
+    """The event of a message produced by ``stamp``, without the time."""
+    if isinstance(message, str):
+        return "{" + message[message.index(",", 6) + 2:]
+    return bytes((message[0] & ~FLAG_TIME,)) + message[1 + _TIME.size:]
+
+
+# ── Frames ────────────────────────────────────────────────────────
+
+def pack_json_frame(events: list) -> str:
+    """Join JSON-encoded events into one array message."""
+    return "[" + ",".join(events) + "]"
+
+
+def pack_binary_frame(events: list) -> bytes:
+    """Join binary-encoded events into one length-prefixed OP_FRAME message."""
+    parts = [bytes([OP_FRAME])]
+    for e in events:
+        parts.append(_LENGTH.pack(len(e)))
+        parts.append(e)
+    return b"".join(parts)
+
+
+def unpack_binary_frame(data: bytes) -> list:
+    view = memoryview(data)
+    events = []
+    pos, end = 1, len(view)
+    while pos < end:
+        (n,) = _LENGTH.unpack_from(view, pos)
+        pos += _LENGTH.size
+        events.append(unpack_event(view[pos:pos + n]))
+        pos += n
+    return events
+
+
+# ── Codecs ────────────────────────────────────────────────────────
+
+class JsonCodec:
+    """Event constructors producing JSON text frames."""
+    subprotocol = JSON_SUBPROTOCOL
+    mouse_move = staticmethod(mouse_move_event)
+    mouse_position = staticmethod(mouse_position_event)
+    mouse_click = staticmethod(_memoized(mouse_click_event))
+    mouse_scroll = staticmethod(mouse_scroll_event)
+    key_press = staticmethod(_memoized(key_press_event))
+    key_release = staticmethod(_memoized(key_release_event))
+    frame = staticmethod(pack_json_frame)
+    clipboard_chunk = staticmethod(clipboard_chunk_event)
+
+
+class BinaryCodec:
+    """Event constructors producing binary frames."""
+    subprotocol = BINARY_SUBPROTOCOL
+    mouse_move = staticmethod(pack_mouse_move)
+    mouse_position = staticmethod(pack_mouse_position)
+    mouse_click = staticmethod(_memoized(pack_mouse_click))
+    mouse_scroll = staticmethod(pack_mouse_scroll)
+    key_press = staticmethod(_memoized(pack_key_press))
+    key_release = staticmethod(_memoized(pack_key_release))
+    frame = staticmethod(pack_binary_frame)
+    clipboard_chunk = staticmethod(pack_clipboard_chunk)
+
+
+CODECS = {c.subprotocol: c for c in (BinaryCodec, JsonCodec)}
+
+
+def codec_for(subprotocol):
+    """Codec for a negotiated subprotocol; JSON if none was agreed."""
+    return CODECS.get(subprotocol, JsonCodec)
+
+
+def decode_message(message) -> dict:
+    """Decode a received frame: binary frames are packed events, text is JSON."""
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        return unpack_event(message)
+    return json.loads(message)
+
+
+def decode_frame(message) -> list:
+    """Decode a received message into its list of events, in order."""
+    if isinstance(message, (bytes, bytearray, memoryview)):
+        if message[0] == OP_FRAME:
+            return unpack_binary_frame(message)
+        return [unpack_event(message)]
+    event = json.loads(message)
+    return event if isinstance(event, list) else [event]
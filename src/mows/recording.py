@@ -0,0 +1,264 @@
+"""Record and replay input sessions.
+
+``mows record FILE`` captures the EventBridge stream (mows.bin events,
+coalesced exactly as ``mows send`` would send them) into an append-only
+file; ``mows replay FILE`` plays it into a server at the original speed,
+scaled, or as fast as the connection takes it.
+
+File layout, little-endian:
+
+  header   8s magic "MOWSREC1" | H version | H flags | I reserved | q created (unix ns)
+  records  q t | H length | event          t: monotonic ns since the first event
+  footer   (q t, Q offset) * entries | q duration | I count | I entries | Q index offset | 8s "MOWSIDX1"
+
+Record times never decrease.  Every INDEX_EVERY-th record is indexed so
+a reader can seek by time; the index is written in the footer when the
+recording is closed.  A file without footer (recorder killed) is still
+readable: the index is rebuilt by scanning the records.  Readers map the
+file instead of reading it.
+"""
+
+import asyncio
+import bisect
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"MOWSREC1"
+INDEX_MAGIC = b"MOWSIDX1"
+VERSION = 1
+INDEX_EVERY = 1024
+
+_HEADER = struct.Struct("<8sHHIq")
+_RECORD = struct.Struct("<qH")
+_ENTRY = struct.Struct("<qQ")
+_TRAILER = struct.Struct("<qIIQ8s")
+
+
+class RecordingError(Exception):
+    pass
+
+
+# ── Writing ───────────────────────────────────────────────────────
+
+class RecordWriter:
+    """Appends events to a new recording.  Raises FileExistsError if
+    ``path`` exists, unless ``overwrite``."""
+
+    def __init__(self, path: str, overwrite: bool = False):
+        self._file = open(path, "wb" if overwrite else "xb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0, time.time_ns()))
+        self._offset = _HEADER.size
+        self._index = []
+        self._start = None
+        self.t = 0
+        self.count = 0
+
+    def add(self, t: int, event: bytes):
+        """Append ``event`` captured at monotonic time ``t`` (ns)."""
+        if self._start is None:
+            self._start = t
+        self.t = max(t - self._start, self.t)
+        if self.count % INDEX_EVERY == 0:
+            self._index.append((self.t, self._offset))
+        self._file.write(_RECORD.pack(self.t, len(event)))
+        self._file.write(event)
+        self._offset += _RECORD.size + len(event)
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        index_offset = self._offset
+        for t, offset in self._index:
+            self._file.write(_ENTRY.pack(t, offset))
+        self._file.write(_TRAILER.pack(self.t, self.count, len(self._index), index_offset, INDEX_MAGIC))
+        self._file.close()
+
+
+# ── Reading ───────────────────────────────────────────────────────
+
+class Recording:
+    """A memory-mapped recording: ``events()`` iterates (t, event) pairs."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise RecordingError(f"{path} is not a mows recording") from None
+        try:
+            magic, version, _, _, self.created = _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise RecordingError(f"{path} is not a version {VERSION} mows recording")
+        if not self._read_footer():
+            self._scan()
+        self._times = [t for t, _ in self.index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _read_footer(self) -> bool:
+        size = len(self._map)
+        if size < _HEADER.size + _TRAILER.size:
+            return False
+        duration, count, entries, index_offset, magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+        if magic != INDEX_MAGIC or index_offset + entries * _ENTRY.size + _TRAILER.size != size:
+            return False
+        self.duration, self.count, self._end = duration, count, index_offset
+        self.index = [_ENTRY.unpack_from(self._map, index_offset + i * _ENTRY.size)
+                      for i in range(entries)]
+        return True
+
+    def _scan(self):
+        """Rebuild the index of an unfinished recording; a torn last record is ignored."""
+        data, pos, size = self._map, _HEADER.size, len(self._map)
+        index, count, t = [], 0, 0
+        while pos + _RECORD.size <= size:
+            t_next, n = _RECORD.unpack_from(data, pos)
+            if pos + _RECORD.size + n > size:
+                break
+            if count % INDEX_EVERY == 0:
+                index.append((t_next, pos))
+            t = t_next
+            pos += _RECORD.size + n
+            count += 1
+        self.index, self.count, self.duration, self._end = index, count, t, pos
+
+    def seek(self, t: int) -> int:
+        """Offset of the first record at or after ``t`` ns."""
+        i = bisect.bisect_right(self._times, t) - 1
+        pos = self.index[i][1] if i >= 0 else _HEADER.size
+        data = self._map
+        while pos < self._end:
+            t_record, n = _RECORD.unpack_from(data, pos)
+            if t_record >= t:
+                break
+            pos += _RECORD.size + n
+        return pos
+
+    def events(self, start: int = 0, end: int | None = None):
+        """(t, event) for every record with ``start`` <= t <= ``end`` (ns)."""
+        data = self._map
+        pos = self.seek(start) if start > 0 else _HEADER.size
+        stop = self._end
+        unpack = _RECORD.unpack_from
+        while pos < stop:
+            t, n = unpack(data, pos)
+            if end is not None and t > end:
+                break
+            pos += _RECORD.size
+            yield t, data[pos:pos + n]
+            pos += n
+
+
+# ── Commands ──────────────────────────────────────────────────────
+
+async def _record(path: str, overwrite: bool):
+    from .client import _TOGGLE, _start_capture
+    from .protocol import BinaryCodec, peek_stamp, unstamp
+
+    queue: asyncio.Queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    writer = RecordWriter(path, overwrite)
+    try:
+        bridge, kl, ml = await asyncio.to_thread(
+            _start_capture, loop, queue, False, None, None, True, BinaryCodec)
+    except BaseException:
+        writer.close()
+        raise
+    print(f"recording to {path} — Ctrl+Tab to pause, Ctrl+Esc to stop")
+    last_flush = loop.time()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if item is _TOGGLE:
+                bridge.flush_pending()
+                bridge._active = not bridge._active
+                bridge._last_mouse_pos = None
+                print("RECORDING" if bridge._active else "PAUSED")
+                continue
+            writer.add(peek_stamp(item)[1], unstamp(item))
+            if loop.time() - last_flush > 1.0:
+                writer.flush()
+                last_flush = loop.time()
+    finally:
+        ml.stop()
+        kl.stop()
+        writer.close()
+        print(f"recorded {writer.count} events over {writer.t / 1e9:.1f}s to {path}")
+
+
+def run_record(path: str, overwrite: bool = False):
+    """Record to ``path``, which must not exist unless ``overwrite``."""
+    try:
+        asyncio.run(_record(path, overwrite))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _replay(path: str, host: str, port: int, speed: float, start: float, end: float | None):
+    import websockets
+    from .protocol import BINARY_SUBPROTOCOL, MAX_FRAME_EVENTS, pack_binary_frame
+
+    uri = f"ws://{host}:{port}"
+    loop = asyncio.get_running_loop()
+    with Recording(path) as rec:
+        first = int(start * 1e9)
+        last = None if end is None else int(end * 1e9)
+        async with websockets.connect(uri, subprotocols=[BINARY_SUBPROTOCOL]) as ws:
+            print(f"replaying {path} ({rec.count} events, {rec.duration / 1e9:.1f}s) to {uri}"
+                  f" at {'max speed' if speed <= 0 else f'{speed:g}x'}")
+            began = loop.time()
+            batch, sent = [], 0
+
+            async def send():
+                nonlocal batch, sent
+                await ws.send(batch[0] if len(batch) == 1 else pack_binary_frame(batch))
+                sent += len(batch)
+                batch = []
+
+            for t, event in rec.events(first, last):
+                if speed > 0:
+                    delay = began + (t - first) / 1e9 / speed - loop.time()
+                    if delay > 0:
+                        if batch:
+                            await send()
+                        await asyncio.sleep(delay)
+                batch.append(event)
+                if len(batch) >= MAX_FRAME_EVENTS:
+                    await send()
+            if batch:
+                await send()
+            elapsed = loop.time() - began
+    print(f"replayed {sent} events in {elapsed:.2f}s ({sent / max(elapsed, 1e-9):.0f} events/s)")
+
+
+def run_replay(path: str, host: str = "localhost", port: int = 8765, speed: float = 1.0,
+               start: float = 0, end: float | None = None):
+    """``speed`` scales the recorded timing; 0 sends as fast as possible.
+    ``start`` and ``end`` select a time range, in seconds."""
+    try:
+        asyncio.run(_replay(path, host, port, speed, start, end))
+    except KeyboardInterrupt:
+        print("replay interrupted")
+
+
+def describe(path: str) -> str:
+    with Recording(path) as rec:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(rec.created / 1e9))
+        return (f"{path}: {rec.count} events over {rec.duration / 1e9:.2f}s, recorded {created}, "
+                f"{len(rec.index)} index entries, {os.path.getsize(path)} bytes")
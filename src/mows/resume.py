@@ -0,0 +1,270 @@
+"""Session resume across dropped connections.
+
+The client names its session with a random id and numbers the input
+events it sends, implicitly: the n-th input event of the session is
+sequence number n, across reconnects.  Sent events stay in a bounded
+ReplayBuffer until the server acknowledges them.
+
+After (re)connecting, the client sends
+
+    {"type": "hello", "session": id, "next": first buffered seq, "last": last seq,
+     "priority": n, "release": [key or button releases]}
+
+followed by every buffered event and then live input.  The server keeps
+a Session per id and answers with
+
+    {"type": "welcome", "session": id, "ack": n, "resumed": bool}
+
+Replayed events the server already injected (seq <= ack) are dropped, so
+nothing is applied twice.  While connected the server sends
+{"type": "ack", "seq": n} every ACK_EVERY events so the client can trim
+its buffer.
+
+When the buffer overflows, the oldest events are dropped.  A dropped
+release may be all that stands between the server and a stuck key, so it
+is carried in the next hello's optional "release" list instead; the
+server injects it before the replay if the session still holds that key
+or button.
+
+The priority only matters to a server arbitrating in priority mode (see
+arbiter.py).
+
+When a connection drops, its session is kept for a grace period.  If the
+client does not come back in time, the keys and buttons it still holds
+are released and the session is forgotten; a later hello for it gets
+``resumed: false`` and its stale replay is dropped.
+"""
+
+import asyncio
+import json
+import secrets
+from collections import deque
+
+from .backlog import _peek
+from .protocol import decode_message
+
+REPLAY_LIMIT = 4096
+ACK_EVERY = 64
+GRACE = 2.0
+KEEPALIVE = 5.0  # seconds between WebSocket pings, and to wait for the pong
+
+INPUT_EVENTS = frozenset({
+    "mouse_move", "mouse_click", "mouse_scroll", "key_press", "key_release",
+    "motion",  # UDP motion totals sent reliably, see motion.py
+    "type_text",  # see text.py
+    "mouse_position",  # absolute pointer mode, see screen.py
+})
+
+
+def new_session_id() -> str:
+    return secrets.token_hex(8)
+
+
+# ── Client ────────────────────────────────────────────────────────
+
+class ReplayBuffer:
+    """Encoded input events sent but not yet acknowledged, oldest first.
+
+    Holds at most ``limit`` events; beyond that the oldest are dropped
+    and counted in ``dropped``.  Dropped releases are kept in ``released``
+    for the next hello until the server has seen them: their press was
+    sent, so losing them could leave a key stuck.
+    """
+
+    def __init__(self, limit: int = REPLAY_LIMIT):
+        self._events = deque()  # (seq, message)
+        self.limit = limit
+        self.seq = 0  # last sequence number assigned
+        self.dropped = 0
+        self.released = {}  # key or button -> (seq, message) of a dropped release
+        self._announced = {}  # the releases sent with the last hello
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, messages: list):
+        events = self._events
+        seq = self.seq
+        for message in messages:
+            seq += 1
+            events.append((seq, message))
+        self.seq = seq
+        overflow = len(events) - self.limit
+        if overflow > 0:
+            self.dropped += overflow
+            for _ in range(overflow):
+                self._drop(*events.popleft())
+
+    def _drop(self, seq: int, message):
+        _, _, held, pressed = _peek(message)
+        if held is None:
+            return
+        if pressed:
+            self.released.pop(held, None)  # the release to carry is a later one
+        else:
+            self.released[held] = (seq, message)
+
+    def ack(self, seq: int):
+        events = self._events
+        while events and events[0][0] <= seq:
+            events.popleft()
+        released = self.released
+        if released:
+            for held in [held for held, (n, _) in released.items() if n <= seq]:
+                del released[held]
+
+    def clear(self):
+        self._events.clear()
+        self.released.clear()
+
+    def pending(self) -> list:
+        return [message for _, message in self._events]
+
+    def hello(self, session: str, priority: int = 0) -> str:
+        first = self._events[0][0] if self._events else self.seq + 1
+        hello = {"type": "hello", "session": session, "next": first, "last": self.seq,
+                 "priority": priority}
+        self._announced = dict(self.released)
+        if self.released:
+            hello["release"] = [_bare(message) for _, message in self.released.values()]
+        return json.dumps(hello)
+
+    def welcomed(self):
+        """The server has handled the last hello, and the releases in it."""
+        released = self.released
+        for held, release in self._announced.items():
+            if released.get(held) == release:
+                del released[held]
+        self._announced = {}
+
+
+def _bare(message) -> dict:
+    event = decode_message(message)
+    event.pop("t", None)
+    return event
+
+
+class Backoff:
+    """Reconnect delays: doubling from ``first`` up to ``limit``, with jitter."""
+
+    def __init__(self, first: float = 0.1, limit: float = 5.0):
+        self.first = first
+        self.limit = limit
+        self._delay = first
+
+    def reset(self):
+        self._delay = self.first
+
+    def next(self) -> float:
+        delay = self._delay
+        self._delay = min(delay * 2, self.limit)
+        return delay * (0.75 + secrets.randbelow(500) / 1000)
+
+
+# ── Server ────────────────────────────────────────────────────────
+
+class Session:
+    """Server-side state of one client session.
+
+    ``received`` is the last sequence number injected.  Events numbered
+    up to ``drop_through`` are duplicates from a replay and are skipped.
+    Held keys and buttons are tracked (by the Arbiter) so they can be
+    released if the client never comes back.
+    """
+
+    def __init__(self, session_id: str | None):
+        self.id = session_id
+        self.received = 0
+        self.acked = 0
+        self._incoming = 0
+        self.drop_through = 0
+        self.duplicates = 0
+        self.keys = {}  # key identity -> serialized key, kept by the Arbiter
+        self.buttons = set()
+        self.priority = 0
+        self.control = None  # whether the Arbiter last granted or denied control
+        self.last_input = 0.0
+        self.injected = 0
+        self.denied = 0  # input dropped because another session had control
+        self.owner = None  # connection currently feeding the session
+        self.expiry = None  # asyncio.TimerHandle while detached
+
+    def start(self, first: int, drop_through: int):
+        self._incoming = first - 1
+        self.drop_through = drop_through
+        self.acked = max(self.acked, drop_through)
+
+    def accept(self, event: dict) -> bool:
+        """Number an incoming input event; False if it was already injected."""
+        self._incoming = seq = self._incoming + 1
+        if seq <= self.drop_through:
+            self.duplicates += 1
+            return False
+        self.received = seq
+        return True
+
+    def ack_due(self) -> bool:
+        return self.received - self.acked >= ACK_EVERY
+
+    def ack_message(self) -> str:
+        self.acked = self.received
+        return json.dumps({"type": "ack", "seq": self.received})
+
+    def holds(self, event: dict) -> bool:
+        """True if the key or button ``event`` releases is held."""
+        if event["type"] == "mouse_click":
+            return event["button"] in self.buttons
+        return tuple(sorted(event["key"].items())) in self.keys
+
+    def release_events(self) -> list:
+        """Events that let go of everything still held."""
+        events = [{"type": "key_release", "key": key} for key in self.keys.values()]
+        events += [{"type": "mouse_click", "button": button, "pressed": False}
+                   for button in self.buttons]
+        self.keys.clear()
+        self.buttons.clear()
+        return events
+
+
+class Sessions:
+    """Live and detached sessions, by id."""
+
+    def __init__(self, grace: float = GRACE):
+        self.grace = grace
+        self._sessions = {}
+
+    def resume(self, hello: dict, owner) -> tuple[Session, bool]:
+        session_id = hello["session"]
+        session = self._sessions.get(session_id)
+        resumed = session is not None
+        if resumed:
+            if session.expiry is not None:
+                session.expiry.cancel()
+                session.expiry = None
+            drop_through = session.received
+        else:
+            session = self._sessions[session_id] = Session(session_id)
+            drop_through = hello["last"] if hello["next"] > 1 else 0  # stale replay
+        session.priority = hello.get("priority", 0)
+        session.start(hello["next"], drop_through)
+        session.owner = owner
+        return session, resumed
+
+    def detach(self, session: Session, owner, release):
+        """``owner``'s connection is gone: await ``release(session)``, which
+        lets go of what it holds, unless it resumes within the grace period.
+        A connection the session has already moved away from is ignored."""
+        if session.owner is not owner:
+            return
+        session.owner = None
+
+        def expire():
+            session.expiry = None
+            if session.id is not None:
+                self._sessions.pop(session.id, None)
+            asyncio.ensure_future(release(session))
+
+        if self.grace <= 0:
+            expire()
+        else:
+            session.expiry = asyncio.get_running_loop().call_later(self.grace, expire)
@@ -0,0 +1,171 @@
+"""Desktop geometry for the absolute pointer mode.
+
+With ``mows send --pointer absolute`` the client sends where its pointer
+is, as a fraction of its virtual desktop (the bounding box of all its
+monitors): mouse_position x and y, from 0.0 at the left/top edge to 1.0
+at the right/bottom one.  The server maps the fraction onto its own
+virtual desktop.  Screens of different sizes and layouts line up edge to
+edge, and every position replaces the one before it, so a position that
+is merged away or lost leaves no drift behind.
+
+Finding the desktop bounds costs a round trip to the X server (or a
+system call) — too much for every move.  A Desktop caches them, looks
+again every REFRESH seconds, and at once when a point falls outside
+them, so monitors being added, removed or rearranged are picked up
+without a restart.
+"""
+
+import ctypes
+import ctypes.util
+import sys
+import threading
+import time
+
+REFRESH = 2.0
+
+
+class Desktop:
+    """Cached bounds (x, y, width, height) of a virtual desktop, as found
+    by ``probe()``, which returns None when they are unknown."""
+
+    def __init__(self, probe, refresh: float = REFRESH):
+        self._probe = probe
+        self.refresh = refresh
+        self._bounds = None
+        self._checked = 0.0
+        self.probes = 0
+
+    def bounds(self) -> tuple:
+        now = time.monotonic()
+        if self._bounds is None or now - self._checked >= self.refresh:
+            self.update(now)
+        return self._bounds
+
+    def update(self, now: float | None = None):
+        """Look at the desktop again; raises if its bounds were never found."""
+        self._checked = time.monotonic() if now is None else now
+        self.probes += 1
+        bounds = self._probe()
+        if bounds is not None and bounds != self._bounds:
+            x, y, w, h = bounds
+            verb = "is" if self._bounds is None else "changed to"
+            print(f"desktop {verb} {w}x{h}{x:+d}{y:+d}")
+            self._bounds = bounds
+        if self._bounds is None:
+            raise RuntimeError("desktop size unknown")
+
+    def clamp(self, x, y) -> tuple:
+        """The point of the desktop nearest to (``x``, ``y``)."""
+        x0, y0, w, h = self.bounds()
+        return min(max(x, x0), x0 + w - 1), min(max(y, y0), y0 + h - 1)
+
+    def normalize(self, x, y) -> tuple:
+        """The fraction of the desktop at which (``x``, ``y``) lies."""
+        x0, y0, w, h = self.bounds()
+        if not (x0 <= x < x0 + w and y0 <= y < y0 + h):
+            self.update()  # a monitor may have been added
+            x0, y0, w, h = self._bounds
+        fx = (x - x0) / (w - 1) if w > 1 else 0.0
+        fy = (y - y0) / (h - 1) if h > 1 else 0.0
+        return min(max(fx, 0.0), 1.0), min(max(fy, 0.0), 1.0)
+
+    def place(self, fx: float, fy: float) -> tuple:
+        """The pixel at fraction (``fx``, ``fy``) of the desktop."""
+        x0, y0, w, h = self.bounds()
+        fx = min(max(fx, 0.0), 1.0)
+        fy = min(max(fy, 0.0), 1.0)
+        return x0 + round(fx * (w - 1)), y0 + round(fy * (h - 1))
+
+
+# ── probes ────────────────────────────────────────────────────────
+
+def probe() -> tuple | None:
+    """Bounds of this machine's virtual desktop, or None."""
+    try:
+        if sys.platform == "win32":
+            return _windows()
+        if sys.platform == "darwin":
+            return _quartz()
+        return _x11()
+    except Exception:
+        return None
+
+
+def x11_root_bounds(x11, dpy) -> tuple | None:
+    """Size of the root window of ``dpy``, which spans all monitors.
+    Asks the server each time, so layout changes are seen."""
+    x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+    x11.XDefaultRootWindow.restype = ctypes.c_ulong
+    uint_p = ctypes.POINTER(ctypes.c_uint)
+    int_p = ctypes.POINTER(ctypes.c_int)
+    x11.XGetGeometry.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                                 int_p, int_p, uint_p, uint_p, uint_p, uint_p]
+    root, x, y = ctypes.c_ulong(), ctypes.c_int(), ctypes.c_int()
+    w, h, border, depth = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+    if not x11.XGetGeometry(dpy, x11.XDefaultRootWindow(dpy), ctypes.byref(root),
+                            ctypes.byref(x), ctypes.byref(y), ctypes.byref(w), ctypes.byref(h),
+                            ctypes.byref(border), ctypes.byref(depth)):
+        return None
+    return 0, 0, w.value, h.value
+
+
+_libx11 = None
+_libx11_lock = threading.Lock()
+
+
+def libx11():
+    """libX11 through ctypes, or None if it is missing.
+
+    One process may drive X from several threads: an injector thread per
+    display (xtest.py), the clipboard watcher's thread, desktop probes on
+    the event loop.  Xlib supports that only if XInitThreads is the first
+    Xlib call the process makes, so every Xlib user here loads the
+    library through this function, which makes that call once.
+    """
+    global _libx11
+    with _libx11_lock:
+        if _libx11 is None:
+            path = ctypes.util.find_library("X11")
+            if not path:
+                return None
+            x11 = ctypes.cdll.LoadLibrary(path)
+            x11.XInitThreads()
+            _libx11 = x11
+    return _libx11
+
+
+_display = None  # (libX11, Display *), opened on first use
+
+
+def _x11():
+    global _display
+    if _display is None:
+        x11 = libx11()
+        if x11 is None:
+            return None
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        dpy = x11.XOpenDisplay(None)
+        if not dpy:
+            return None
+        _display = (x11, dpy)
+    return x11_root_bounds(*_display)
+
+
+def _windows():
+    metrics = ctypes.windll.user32.GetSystemMetrics
+    # SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN
+    return metrics(76), metrics(77), metrics(78), metrics(79)
+
+
+def _quartz():
+    import Quartz
+    err, ids, count = Quartz.CGGetActiveDisplayList(32, None, None)
+    if err or not count:
+        return None
+    rects = [Quartz.CGDisplayBounds(i) for i in ids[:count]]
+    left = min(r.origin.x for r in rects)
+    top = min(r.origin.y for r in rects)
+    right = max(r.origin.x + r.size.width for r in rects)
+    bottom = max(r.origin.y + r.size.height for r in rects)
+    return int(left), int(top), int(right - left), int(bottom - top)
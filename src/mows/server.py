@@ -2,134 +2,626 @@
 
 import asyncio
 import json
-import sys
+import time
+from http import HTTPStatus
 
-import pyperclip
 import websockets
-from pynput.keyboard import Controller as KeyboardController
-from pynput.mouse import Controller as MouseController
 
-from .protocol import deserialize_button, deserialize_key
+from . import profiles
+from .arbiter import IDLE, Arbiter
+from .backends import Backend, make_backend
+from .clipboard import MAX_CLIPBOARD, ClipboardSession, ClipboardWatcher, Transfer
+from .injector import Injector
+from .metrics import Metrics, format_snapshot
+from .motion import MotionChannel, MotionEndpoint
+from .pointer import Pointer
+from .protocol import SUBPROTOCOLS, codec_for, decode_frame, display_path, path_display
+from .resume import GRACE, INPUT_EVENTS, Session, Sessions
+from .screen import Desktop
+from .text import chunks
+from .trace import INJECTOR, LOOP, Tracer
 
 
-def _make_rel_mover():
-    """Bypass pynput's mouse.move() to avoid its position read-back,
-    which causes drift from DPI rounding (Win) or async lag (X11).
+def _make_injection(backend: Backend, metrics: Metrics | None = None,
+                    pointer: Pointer | None = None, tracer: Tracer | None = None):
+    """Return the function the injector thread applies to each event.
 
-    On Linux:  XWarpPointer with src=dst=0 does a true relative move
-               without querying the current position first.
-    On Windows: mouse_event(MOUSEEVENTF_MOVE) sends relative pixel
-               deltas directly; DPI awareness is set so coordinates
-               are consistent.
+    Events are routed through a table keyed by event type, built once,
+    instead of a string if/elif chain per event.  With ``metrics``, the
+    queue wait, injection call and end-to-end latency are recorded; with
+    ``tracer``, the injection call of sampled events is traced.
+    With ``pointer``, moves go through it (scaling, sub-pixel remainders,
+    playback) and clicks, scrolls and absolute positions wait for the
+    motion before them.  Absolute positions are placed on the backend's
+    desktop, whose bounds are cached (screen.Desktop).
     """
-    if sys.platform == 'linux':
-        try:
-            import ctypes
-            import ctypes.util
-            path = ctypes.util.find_library('X11')
-            if not path:
-                return None
-            x11 = ctypes.cdll.LoadLibrary(path)
-            x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
-            x11.XOpenDisplay.restype = ctypes.c_void_p
-            x11.XFlush.argtypes = [ctypes.c_void_p]
-            x11.XFlush.restype = ctypes.c_int
-            x11.XWarpPointer.argtypes = [
-                ctypes.c_void_p,               # Display *
-                ctypes.c_ulong, ctypes.c_ulong, # src_window, dst_window
-                ctypes.c_int, ctypes.c_int,     # src_x, src_y
-                ctypes.c_uint, ctypes.c_uint,   # src_width, src_height
-                ctypes.c_int, ctypes.c_int,     # dst_x, dst_y
-            ]
-            x11.XWarpPointer.restype = ctypes.c_int
-            dpy = x11.XOpenDisplay(None)
-            if not dpy:
-                return None
-
-            def move(dx, dy):
-                x11.XWarpPointer(dpy, 0, 0, 0, 0, 0, 0, int(dx), int(dy))
-                x11.XFlush(dpy)
-
-            return move
-        except Exception:
-            return None
-
-    if sys.platform == 'win32':
-        try:
-            import ctypes
-            try:
-                ctypes.windll.shcore.SetProcessDpiAwareness(2)
-            except Exception:
-                pass
+    move, button, scroll, key = backend.move, backend.button, backend.scroll, backend.key
+    move_to, place = backend.move_to, Desktop(backend.desktop).place
+
+    if pointer is None:
+        def mouse_move(event):
+            move(event["dx"], event["dy"])
+
+        def mouse_position(event):
+            move_to(*place(event["x"], event["y"]))
+
+        def mouse_click(event):
+            button(event["button"], event["pressed"])
+
+        def mouse_scroll(event):
+            scroll(event["dx"], event["dy"])
+    else:
+        shaped, settle = pointer.move, pointer.settle
+
+        def mouse_move(event):
+            shaped(event["dx"], event["dy"])
+
+        def mouse_position(event):
+            settle()
+            move_to(*place(event["x"], event["y"]))
+
+        def mouse_click(event):
+            settle()
+            button(event["button"], event["pressed"])
+
+        def mouse_scroll(event):
+            settle()
+            scroll(event["dx"], event["dy"])
+
+    def key_press(event):
+        key(event["key"], True)
+
+    def key_release(event):
+        key(event["key"], False)
+
+    def type_text(event):
+        backend.type_text(event["text"])
+
+    def clipboard_push(event):
+        backend.clipboard_set(event["text"])
+        print(f"clipboard updated from client ({len(event['text'])} chars)")
+
+    def clipboard_pull(event):
+        return backend.clipboard_get()
+
+    table = {
+        "mouse_move": mouse_move,
+        "mouse_position": mouse_position,
+        "mouse_click": mouse_click,
+        "mouse_scroll": mouse_scroll,
+        "key_press": key_press,
+        "key_release": key_release,
+        "type_text": type_text,
+        "clipboard_push": clipboard_push,
+        "clipboard_pull": clipboard_pull,
+    }
+
+    def apply(event: dict):
+        handler = table.get(event["type"])
+        if handler is not None:
+            return handler(event)
+
+    if metrics is None and tracer is None:
+        return apply
+
+    def timed(event: dict):
+        start = time.monotonic_ns()
+        result = apply(event)
+        end = time.monotonic_ns()
+        t = event["type"]
+        if tracer is not None and tracer.sampled(event.get("t")):
+            tracer.span("inject", start, end, INJECTOR, {"event": t})
+        if metrics is None:
+            return result
+        rx = event.get("_rx")
+        if rx is not None:
+            metrics.record("queue", t, start - rx)
+        metrics.record("inject", t, end - start)
+        cap = event.get("_cap")
+        if cap is not None:
+            metrics.record("total", t, end - cap)
+        return result
 
-            def move(dx, dy):
-                ctypes.windll.user32.mouse_event(0x0001, int(dx), int(dy), 0, 0)
+    return timed
 
-            return move
-        except Exception:
-            return None
 
-    return None
+class _Client:
+    """Per-connection state."""
 
+    def __init__(self, websocket, injector: Injector, clipboard_limit: int = MAX_CLIPBOARD):
+        self.websocket = websocket
+        self.clock_offset = None  # server - client monotonic ns, as estimated by the client
+        self.session = None  # resume.Session, once the client said hello or sent input
+        self.motion = None  # motion.MotionChannel, once the client opened one
+        self.typing = asyncio.Lock()  # held while a type_text message is typed
+        self.tasks = set()
+        self.clipboard = ClipboardSession(
+            websocket.send, codec_for(websocket.subprotocol),
+            read=lambda: injector.call({"type": "clipboard_pull"}),
+            write=lambda text: injector.call({"type": "clipboard_push", "text": text}),
+            limit=clipboard_limit, spawn=self.spawn)
 
-def _make_handler(mouse: MouseController, keyboard: KeyboardController):
-    rel_move = _make_rel_mover()
+    def spawn(self, coro):
+        """Run ``coro`` alongside the connection's read loop."""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled():
+            e = task.exception()
+            if e is not None and not isinstance(e, websockets.ConnectionClosed):
+                print(f"client task failed: {e!r}")
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+
+
+class _ClipboardHub:
+    """Pushes local clipboard changes to every client that asked for sync.
+
+    The watcher starts with the first subscriber.  A client is skipped if
+    it already holds the new content, which includes the client the
+    content just came from.
+    """
+
+    def __init__(self, injector: Injector, display: str | None = None):
+        self._injector = injector
+        self._display = display
+        self.clients = set()
+        self._watcher = None
+
+    def subscribe(self, client: _Client):
+        self.clients.add(client)
+        if self._watcher is None:
+            self._watcher = ClipboardWatcher(
+                lambda: self._injector.call({"type": "clipboard_pull"}),
+                self._changed, initial=False, display=self._display)
+            self._watcher.start()
+
+    def unsubscribe(self, client: _Client):
+        self.clients.discard(client)
+
+    def stop(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+
+    async def _changed(self, text: str):
+        if not self.clients:
+            return
+        transfer = await asyncio.to_thread(Transfer, text)
+        for client in list(self.clients):
+            client.spawn(client.clipboard.push_transfer(transfer))
+
+
+def _notify_control(session: Session, granted: bool):
+    """Tell a session's client it gained or lost control of the input."""
+    client = session.owner
+    if client is None:
+        return
+    client.spawn(client.websocket.send(json.dumps({"type": "control", "granted": granted})))
+    print(f"{client.websocket.remote_address}: control {'granted' if granted else 'denied'}")
+
+
+def _session_line(session: Session, injector: Injector) -> str:
+    line = (f"session {session.id or 'anonymous'}: injected={session.injected} "
+            f"denied={session.denied} duplicates={session.duplicates}")
+    stats = injector.lane_stats(session) or {}
+    if session.owner is not None and session.owner.motion is not None:
+        stats.update(session.owner.motion.stats())
+    if stats:
+        line += " " + " ".join(f"{k}={v}" for k, v in stats.items())
+    return line
+
+
+def _make_handler(injector: Injector, metrics: Metrics | None = None,
+                  clipboard_limit: int = MAX_CLIPBOARD, hub: _ClipboardHub | None = None,
+                  sessions: Sessions | None = None, arbiter: Arbiter | None = None,
+                  motion: MotionEndpoint | None = None, tracer: Tracer | None = None,
+                  display: str | None = None):
+    hub = hub or _ClipboardHub(injector, display)
+    sessions = sessions or Sessions()
+    arbiter = arbiter or Arbiter()
+
+    async def release(session: Session):
+        events = arbiter.leave(session)
+        for event in events:
+            await injector.put(event, session)
+        injector.close(session)
+        if events:
+            print(f"released {len(events)} held keys/buttons of a lost session")
 
     async def handler(websocket):
-        print(f"client connected: {websocket.remote_address}")
+        print(f"client connected: {websocket.remote_address} ({websocket.subprotocol or 'json'})"
+              + (f" on display {display}" if display is not None else ""))
+        client = _Client(websocket, injector, clipboard_limit)
         try:
             async for message in websocket:
-                event = json.loads(message)
-                await _dispatch(event, websocket, mouse, keyboard, rel_move)
+                if metrics is None and tracer is None:
+                    for event in decode_frame(message):
+                        await _dispatch(event, client, injector, hub, sessions, arbiter, motion)
+                    continue
+                rx = time.monotonic_ns()
+                events = decode_frame(message)
+                if tracer is None:
+                    for event in events:
+                        _mark_received(event, client, rx, metrics)
+                        await _dispatch(event, client, injector, hub, sessions, arbiter, motion)
+                    continue
+                if tracer.sampled(events[0].get("t") if events else None):
+                    tracer.span("decode", rx, time.monotonic_ns(), LOOP,
+                                {"events": len(events), "bytes": len(message)})
+                for event in events:
+                    _mark_received(event, client, rx, metrics)
+                    if not tracer.sampled(event.get("t")):
+                        await _dispatch(event, client, injector, hub, sessions, arbiter, motion)
+                        continue
+                    cap = event.get("_cap")
+                    if cap is not None:
+                        tracer.span("receive", cap, rx, LOOP, {"event": event["type"]})
+                    start = time.monotonic_ns()
+                    await _dispatch(event, client, injector, hub, sessions, arbiter, motion)
+                    tracer.span("dispatch", start, time.monotonic_ns(), LOOP, {"event": event["type"]})
         except websockets.ConnectionClosed:
             pass
         finally:
+            hub.unsubscribe(client)
+            client.close()
             print(f"client disconnected: {websocket.remote_address}")
+            if client.session is not None:
+                print(_session_line(client.session, injector))
+                sessions.detach(client.session, client, release)
+            if client.motion is not None:
+                motion.close(client.motion)
+            print(("" if display is None else f"display {display} ") + f"injector: {injector.stats_line()}")
     return handler
 
 
-async def _dispatch(event: dict, websocket, mouse: MouseController,
-                    keyboard: KeyboardController, rel_move):
+def _mark_received(event: dict, client: _Client, rx: int, metrics: Metrics | None):
+    """Stamp receive time and, if the client's clock offset is known,
+    capture time on our clock; record the capture -> receive latency."""
+    event["_rx"] = rx
+    t = event.get("t")
+    if t is not None and client.clock_offset is not None:
+        cap = t + client.clock_offset
+        event["_cap"] = cap
+        if metrics is not None:
+            metrics.record("transport", event["type"], rx - cap)
+
+
+def _session(client: _Client) -> Session:
+    session = client.session
+    if session is None:  # client without resume support
+        session = client.session = Session(None)
+        session.owner = client
+    return session
+
+
+async def _put_each(injector: Injector, pending: list):
+    for producer, event in pending:
+        await injector.put(event, producer)
+
+
+async def _dispatch(event: dict, client: _Client, injector: Injector,
+                    hub: _ClipboardHub, sessions: Sessions, arbiter: Arbiter,
+                    motion: MotionEndpoint | None = None):
     t = event["type"]
-    if t == "mouse_move":
-        if rel_move:
-            rel_move(event["dx"], event["dy"])
-        else:
-            mouse.move(event["dx"], event["dy"])
-    elif t == "mouse_click":
-        btn = deserialize_button(event["button"])
-        if event["pressed"]:
-            mouse.press(btn)
-        else:
-            mouse.release(btn)
-    elif t == "mouse_scroll":
-        mouse.scroll(event["dx"], event["dy"])
-    elif t == "key_press":
-        key = deserialize_key(event["key"])
-        keyboard.press(key)
-    elif t == "key_release":
-        key = deserialize_key(event["key"])
-        keyboard.release(key)
-    elif t == "clipboard_push":
-        pyperclip.copy(event["text"])
-        print(f"clipboard updated from client ({len(event['text'])} chars)")
+    if t in INPUT_EVENTS:
+        session = client.session or _session(client)
+        if session.accept(event):
+            if t == "motion":
+                event = _motion_sync(event, client)
+            if event is not None and arbiter.admit(session, event):
+                if arbiter.pending:
+                    pending, arbiter.pending = arbiter.pending, []
+                    await _put_each(injector, pending)
+                session.injected += 1
+                if t == "type_text":
+                    client.spawn(_type_text(event, client, session, injector))
+                else:
+                    await injector.put(event, session)
+            elif t == "type_text":
+                await client.websocket.send(json.dumps({"type": "typed", "chars": 0}))
+            if session.ack_due():
+                await client.websocket.send(session.ack_message())
+    elif t == "hello":
+        client.session, resumed = sessions.resume(event, client)
+        session = client.session
+        if resumed:
+            for release in event.get("release", ()):  # dropped from the client's replay
+                if session.holds(release) and arbiter.admit(session, release):
+                    await injector.put(release, session)
+        await client.websocket.send(json.dumps({
+            "type": "welcome", "session": session.id, "ack": session.received, "resumed": resumed}))
+        if resumed:
+            print(f"session {session.id} resumed at {session.received}")
+    elif t == "motion_open":
+        await client.websocket.send(json.dumps(_open_motion(client, motion, injector, arbiter)))
+    elif t == "ping":
+        await client.websocket.send(json.dumps(
+            {"type": "pong", "t": event["t"], "server": time.monotonic_ns()}))
+    elif t == "clock":
+        client.clock_offset = event["offset"]
+    elif t == "clipboard_sync":
+        hub.subscribe(client)
+        print(f"clipboard sync enabled for {client.websocket.remote_address}")
+    elif await client.clipboard.handle(event):
+        pass
     elif t == "clipboard_pull":
-        text = pyperclip.paste()
-        await websocket.send(json.dumps({"type": "clipboard_data", "text": text}))
+        text = await injector.call(event)
+        await client.websocket.send(json.dumps({"type": "clipboard_data", "text": text}))
         print(f"clipboard sent to client ({len(text)} chars)")
+    else:
+        await injector.put(event)
+
+
+async def _type_text(event: dict, client: _Client, session: Session, injector: Injector):
+    """Type a type_text message on the session's lane, one chunk at a time."""
+    rate = event.get("rate") or 0
+    loop = asyncio.get_running_loop()
+    typed = 0
+    async with client.typing:
+        start = loop.time()
+        try:
+            for chunk in chunks(event["text"], rate):
+                await injector.call({"type": "type_text", "text": chunk}, session)
+                typed += len(chunk)
+                if rate > 0:
+                    delay = start + typed / rate - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+        except Exception as e:
+            print(f"typing failed after {typed} chars: {e!r}")
+    await client.websocket.send(json.dumps({"type": "typed", "chars": typed}))
+
+
+# ── UDP motion ────────────────────────────────────────────────────
+
+def _open_motion(client: _Client, motion: MotionEndpoint | None, injector: Injector,
+                 arbiter: Arbiter) -> dict:
+    """Open a motion channel for ``client``; the reply to its motion_open."""
+    if motion is None:
+        return {"type": "motion_channel", "port": None}
+    if client.motion is not None:
+        motion.close(client.motion)
+    channel = client.motion = motion.open()
+    channel.on_motion = lambda channel: _motion_datagram(channel, client, injector, arbiter)
+    print(f"{client.websocket.remote_address}: udp motion channel opened")
+    return {"type": "motion_channel", "port": motion.port, **channel.offer()}
+
+
+def _motion_datagram(channel: MotionChannel, client: _Client, injector: Injector,
+                     arbiter: Arbiter):
+    """Inject the motion a fresh datagram brought.  If the client's lane
+    is full the motion stays pending and goes out with the next one."""
+    dx, dy = channel.pending()
+    if not (dx or dy):
+        return
+    session = client.session or _session(client)
+    event = {"type": "mouse_move", "dx": dx, "dy": dy}
+    if not arbiter.admit(session, event):
+        channel.applied()
+        return
+    if arbiter.pending:
+        pending, arbiter.pending = arbiter.pending, []
+        client.spawn(_put_each(injector, pending))
+    if injector.offer(event, session):
+        channel.applied()
+        session.injected += 1
+
+
+def _motion_sync(event: dict, client: _Client) -> dict | None:
+    """The move still owed for motion totals sent over the WebSocket."""
+    channel = client.motion
+    if channel is None or not channel.sync(event):
+        return None
+    dx, dy = channel.pending()
+    channel.applied()
+    if not (dx or dy):
+        return None
+    return {"type": "mouse_move", "dx": dx, "dy": dy}
+
+
+async def _report(displays: dict, metrics: Metrics | None, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for display in list(displays.values()):
+            prefix = "" if display.name is None else f"display {display.name} "
+            print(f"{prefix}injector: {display.injector.stats_line()}")
+            for session in list(display.arbiter.sessions):
+                print(_session_line(session, display.injector))
+        if metrics is not None:
+            print(format_snapshot(metrics.snapshot()))
+
+
+async def _serve_metrics(metrics: Metrics, host: str, port: int):
+    """Minimal HTTP endpoint: /metrics (Prometheus text) and /stats (JSON)."""
+
+    async def handle(reader, writer):
+        try:
+            request = (await reader.readline()).decode(errors="replace").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            path = request[1] if len(request) > 1 else "/"
+            if path.startswith("/metrics"):
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", metrics.prometheus()
+            elif path.startswith("/stats"):
+                status, ctype, body = "200 OK", "application/json", json.dumps(metrics.snapshot())
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", "not found\n"
+            data = body.encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+# ── displays ──────────────────────────────────────────────────────
+
+class _Display:
+    """What the server keeps per display it injects into: the backend,
+    pointer shaping, an injector thread, the arbiter, resume sessions,
+    the clipboard hub and the connection handler.  Displays share
+    nothing else, so clients of one display never wait on another's
+    injector.  ``name`` is the X display, None for the server's own."""
+
+    def __init__(self, name: str | None, impl: Backend, loop: asyncio.AbstractEventLoop,
+                 queue_size: int, metrics: Metrics | None, tracer: Tracer | None,
+                 sensitivity: float, interpolate_hz: float, arbitration: str,
+                 idle_handover: float, resume_grace: float, clipboard_limit: int,
+                 motion: MotionEndpoint | None):
+        self.name = name
+        self.backend = impl
+        self.pointer = None
+        if sensitivity != 1.0 or interpolate_hz > 0:
+            self.pointer = Pointer(impl.move, sensitivity, interpolate_hz)
+        self.injector = Injector(_make_injection(impl, metrics, self.pointer, tracer), loop,
+                                 maxsize=queue_size, flush=impl.flush,
+                                 tick=self.pointer.tick if interpolate_hz > 0 else None)
+        self.arbiter = Arbiter(arbitration, idle_handover, notify=_notify_control)
+        self.hub = _ClipboardHub(self.injector, name)
+        self.handler = _make_handler(self.injector, metrics, clipboard_limit, self.hub,
+                                     Sessions(resume_grace), self.arbiter, motion, tracer, name)
+        self.injector.start()
+
+    def close(self):
+        self.hub.stop()
+        self.injector.stop()
+        self.backend.close()
 
 
-async def _serve(host: str, port: int):
-    mouse = MouseController()
-    keyboard = KeyboardController()
-    handler = _make_handler(mouse, keyboard)
-    async with websockets.serve(handler, host, port):
-        print(f"mows server listening on {host}:{port}")
-        await asyncio.Future()  # run forever
+async def _serve(host: str, port: int, queue_size: int = 256, stats_interval: float = 0,
+                 backend: str = "pynput", metrics_port: int | None = None,
+                 metrics_host: str = "127.0.0.1", clipboard_limit: int = MAX_CLIPBOARD,
+                 resume_grace: float = GRACE, arbitration: str = "shared",
+                 idle_handover: float = IDLE, udp_motion: bool = False,
+                 udp_port: int | None = None, profile: str = "default",
+                 sensitivity: float = 1.0, interpolate_hz: float = 0,
+                 trace: str | None = None, trace_sample: int = 1,
+                 displays: list | None = None):
+    metrics = Metrics() if stats_interval > 0 or metrics_port else None
+    tracer = Tracer(trace, "server", trace_sample) if trace else None
+    loop = asyncio.get_running_loop()
+    motion = transport = None
+    if udp_motion:
+        motion = MotionEndpoint()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: motion, local_addr=(host, udp_port or port))
+        motion.port = transport.get_extra_info("sockname")[1]
+
+    def open_display(name: str | None, impl: Backend) -> _Display:
+        return _Display(name, impl, loop, queue_size, metrics, tracer, sensitivity,
+                        interpolate_hz, arbitration, idle_handover, resume_grace,
+                        clipboard_limit, motion)
+
+    # display name -> _Display; other displays are opened on their first
+    # connection, then kept for the next ones
+    opened = {None: open_display(None, make_backend(backend))}
+    allowed = set(displays or ())
+    opening = asyncio.Lock()
+
+    async def display_for(name: str | None) -> _Display:
+        display = opened.get(name)
+        if display is None:
+            async with opening:
+                display = opened.get(name)
+                if display is None:
+                    impl = await asyncio.to_thread(make_backend, backend, name)
+                    display = opened[name] = open_display(name, impl)
+                    print(f"display {name} opened ({backend} backend)")
+        return display
+
+    if metrics is not None:
+        def total(stat):
+            return lambda: sum(stat(d) for d in list(opened.values()))
+        metrics.gauges.update({
+            "injector_depth": total(lambda d: d.injector.depth),
+            "injector_peak_depth": lambda: max(d.injector.peak_depth for d in list(opened.values())),
+            "injector_merged": total(lambda d: d.injector.merged),
+            "injector_injected": total(lambda d: d.injector.injected),
+            "sessions": total(lambda d: len(d.arbiter.sessions)),
+            "handovers": total(lambda d: d.arbiter.handovers),
+            "displays": lambda: len(opened),
+        })
+
+    def route(connection, request):
+        """Refuse the handshake for a path naming no display served here."""
+        try:
+            name = path_display(request.path)
+        except ValueError:
+            name = ""
+        if name is not None and name not in allowed:
+            return connection.respond(HTTPStatus.NOT_FOUND, "no such display\n")
+
+    async def tuned(websocket):
+        profiles.tune(websocket, profile)
+        name = path_display(websocket.request.path)
+        try:
+            display = await display_for(name)
+        except Exception as e:
+            print(f"cannot open display {name}: {e!r}")
+            await websocket.close(1011, f"cannot open display {name}")
+            return
+        await display.handler(websocket)
+
+    try:
+        async with websockets.serve(tuned, host, port, subprotocols=SUBPROTOCOLS,
+                                    process_request=route, **profiles.options(profile)):
+            print(f"mows server listening on {host}:{port} ({backend} backend, {arbitration} input, "
+                  f"{profile} profile on {profiles.loop_name()})")
+            for name in sorted(allowed):
+                print(f"display {name} at ws://{host}:{port}{display_path(name)}")
+            if motion is not None:
+                print(f"udp motion on {host}:{motion.port}")
+            if opened[None].pointer is not None:
+                print(f"pointer sensitivity {sensitivity:g}"
+                      + (f", interpolated at {interpolate_hz:g} Hz" if interpolate_hz > 0 else ""))
+            if metrics_port:
+                await _serve_metrics(metrics, metrics_host, metrics_port)
+                print(f"metrics at http://{metrics_host}:{metrics_port}/metrics")
+            if stats_interval > 0:
+                await _report(opened, metrics, stats_interval)
+            else:
+                await asyncio.Future()  # run forever
+    finally:
+        if transport is not None:
+            transport.close()
+        for display in opened.values():
+            display.close()
+        if tracer is not None:
+            tracer.write()
 
 
-def run_server(host: str = "0.0.0.0", port: int = 8765):
+def run_server(host: str = "0.0.0.0", port: int = 8765, queue_size: int = 256,
+               stats_interval: float = 0, backend: str = "pynput",
+               metrics_port: int | None = None, metrics_host: str = "127.0.0.1",
+               clipboard_limit: int = MAX_CLIPBOARD, resume_grace: float = GRACE,
+               arbitration: str = "shared", idle_handover: float = IDLE,
+               udp_motion: bool = False, udp_port: int | None = None,
+               profile: str = "default", sensitivity: float = 1.0, interpolate_hz: float = 0,
+               trace: str | None = None, trace_sample: int = 1,
+               displays: list | None = None):
+    """``arbitration`` decides whose input is injected when several
+    clients are connected; see arbiter.py.  ``udp_motion`` accepts
+    pointer motion as UDP datagrams on ``udp_port`` (default: ``port``);
+    see motion.py.  ``profile`` is a transport profile from profiles.py.
+    ``sensitivity`` scales pointer motion and ``interpolate_hz`` spreads
+    it over display refresh intervals; see pointer.py.  ``trace`` writes
+    sampled per-stage spans to that file on exit; see trace.py.
+    ``displays`` are X displays served besides the default one, each to
+    clients connecting to its path (protocol.display_path), with its own
+    backend and injector thread, opened on first use."""
     try:
-        asyncio.run(_serve(host, port))
+        profiles.run(_serve(host, port, queue_size, stats_interval, backend,
+                            metrics_port, metrics_host, clipboard_limit, resume_grace,
+                            arbitration, idle_handover, udp_motion, udp_port, profile,
+                            sensitivity, interpolate_hz, trace, trace_sample, displays), profile)
     except KeyboardInterrupt:
         print('goodbye')
@@ -0,0 +1,70 @@
+"""Typing a string on the server: ``mows type`` and the type_text message.
+
+Sending text as key events costs two messages, two dispatches and two
+backend calls per character.  Instead the client sends the whole string
+once:
+
+    -> {"type": "type_text", "text": "...", "rate": 40}
+    <- {"type": "typed", "chars": n}       (n is 0 if input was denied)
+
+``rate`` (characters per second) is optional; without it the text goes
+as fast as the backend takes it.  type_text is an input event: it is
+numbered for resume and arbitrated like keys.  The server types the
+text in chunks on the sender's injector lane, one chunk in flight at a
+time, so other clients' input and the sender's own live input are
+interleaved between chunks instead of waiting for the whole string.
+Texts from one client are typed one after another, never interleaved.
+"""
+
+import asyncio
+import json
+
+CHUNK = 32  # characters per injector call when typing at full speed
+TICK = 0.02  # seconds of text per chunk when typing at a rate
+
+
+def type_text_message(text: str, rate: float = 0) -> str:
+    message = {"type": "type_text", "text": text}
+    if rate > 0:
+        message["rate"] = rate
+    return json.dumps(message)
+
+
+def chunks(text: str, rate: float = 0):
+    """The pieces of ``text`` the injector types one at a time."""
+    text = text.replace("\r\n", "\n")
+    size = max(1, int(rate * TICK)) if rate > 0 else CHUNK
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+async def _type(host: str, port: int, text: str, rate: float, display: str | None = None):
+    import websockets
+    from .protocol import SUBPROTOCOLS, display_path
+
+    uri = f"ws://{host}:{port}{display_path(display)}"
+    reply = None
+    async with websockets.connect(uri, subprotocols=SUBPROTOCOLS) as ws:
+        await ws.send(type_text_message(text, rate))
+        async for message in ws:
+            if isinstance(message, str):
+                event = json.loads(message)
+                if event["type"] == "typed":
+                    reply = event
+                    break
+    if reply is None:
+        print("connection closed before the text was typed")
+    elif reply["chars"] or not text:
+        print(f"typed {reply['chars']} chars on the server")
+    else:
+        print("typing denied: another client has control")
+
+
+def run_type(text: str, host: str = "localhost", port: int = 8765, rate: float = 0,
+             display: str | None = None):
+    """``rate`` limits typing to that many characters per second;
+    ``display`` picks a display of a server started with ``--display``."""
+    try:
+        asyncio.run(_type(host, port, text, rate, display))
+    except KeyboardInterrupt:
+        print("typing interrupted")
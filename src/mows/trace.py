@@ -0,0 +1,126 @@
+"""Per-stage tracing in Chrome trace event format.
+
+``mows send --trace FILE`` and ``mows serve --trace FILE`` record a span
+per stage of each sampled event, and write them when the command exits
+as Chrome trace event JSON, which chrome://tracing and ui.perfetto.dev
+open:
+
+  client  hook       a pynput callback, on the hook thread
+          serialize  coalescing and encoding of a captured event
+          queue      capture -> taken from the send queue
+          ws.send    one ws.send call
+  server  receive    capture -> message received (once the client's clock
+                     offset is known)
+          decode     decode_frame of a message: json.loads or unpacking
+          dispatch   _dispatch of one event
+          inject     the backend call (rel_move, pynput, XTest), on the
+                     injector thread
+
+``--trace-sample N`` keeps 1 in N events.  Events are picked by a hash of
+their capture time, so client and server sample the same ones; hook
+callbacks, which run before the capture time is known, every Nth.  At
+most LIMIT spans are kept, the oldest are dropped.  Recording a span
+appends a tuple to a deque; formatting waits until the file is written.
+
+Span times are each machine's monotonic clock.  A client's file also
+holds its estimate of the offset to the server's clock, and
+
+    mows trace-merge SERVER.json CLIENT.json ... -o MERGED.json
+
+moves client spans onto the server's clock, for a single timeline.
+"""
+
+import json
+import time
+from collections import deque
+
+LIMIT = 200_000
+
+# Chrome trace thread ids
+LOOP = 1
+HOOK = 2
+INJECTOR = 3
+_THREADS = {LOOP: "event loop", HOOK: "hook", INJECTOR: "injector"}
+
+
+class Tracer:
+    """Bounded buffer of spans for one process.
+
+    ``span`` may be called from any thread.
+    """
+
+    def __init__(self, path: str, role: str, sample: int = 1, limit: int = LIMIT):
+        self.path = path
+        self.role = role  # "client" or "server"
+        self.sample = max(1, sample)
+        self._spans = deque(maxlen=limit)  # (name, start ns, end ns, tid, args)
+        self._count = 0
+        self.clock_offset = None  # client: server - client monotonic ns, when written
+
+    def sampled(self, t: int | None) -> bool:
+        """True if the event captured at ``t`` (ns) is traced."""
+        if self.sample == 1:
+            return True
+        if t is None:
+            self._count += 1
+            return self._count % self.sample == 0
+        return (t * 0x9E3779B1 >> 16) % self.sample == 0
+
+    def span(self, name: str, start: int, end: int, tid: int = LOOP, args: dict | None = None):
+        self._spans.append((name, start, end, tid, args))
+
+    def wrap(self, name: str, fn, tid: int):
+        """``fn`` with a span around every sampled call."""
+        spans, sampled, now = self._spans, self.sampled, time.monotonic_ns
+
+        def traced(*args):
+            start = now()
+            result = fn(*args)
+            if sampled(None):
+                spans.append((name, start, now(), tid, None))
+            return result
+        return traced
+
+    def write(self):
+        pid = 1
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                   "args": {"name": f"mows {self.role}"}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in _THREADS.items()]
+        for name, start, end, tid, args in list(self._spans):
+            event = {"name": name, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": start / 1e3, "dur": (end - start) / 1e3}
+            if args:
+                event["args"] = args
+            events.append(event)
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"mows": self.role, "clock_offset_ns": self.clock_offset}}, f)
+        print(f"wrote {len(events) - 1 - len(_THREADS)} spans to {self.path}")
+
+
+def merge(paths: list, out: str):
+    """Combine trace files onto the server's clock, one process per file."""
+    merged = []
+    for pid, path in enumerate(paths, 1):
+        with open(path) as f:
+            trace = json.load(f)
+        info = trace.get("otherData", {})
+        shift = 0.0
+        if info.get("mows") == "client":
+            offset = info.get("clock_offset_ns")
+            if offset is None:
+                print(f"{path}: no clock offset recorded, left on the client's clock")
+            else:
+                shift = offset / 1e3
+        for event in trace["traceEvents"]:
+            event = dict(event, pid=pid)
+            if event["ph"] == "M" and event["name"] == "process_name":
+                event["args"] = {"name": f"{event['args']['name']} ({path})"}
+            elif "ts" in event:
+                event["ts"] += shift
+            merged.append(event)
+    with open(out, "w") as f:
+        json.dump({"traceEvents": merged, "displayTimeUnit": "ms"}, f)
+    print(f"merged {len(paths)} traces into {out}")
+
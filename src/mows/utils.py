@@ -1,28 +1,46 @@
+from __future__ import annotations
+
 import os
 import time
-from datetime import datetime as dt
-from pathlib import Path
+
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, without importing typing at startup
+if TYPE_CHECKING:  # datetime is imported where it is used, for the same reason
+    from datetime import datetime as dt
 
 USER = "hallamlab"
-MODULE_ROOT = Path(os.path.realpath(__file__)).parent
-NAME = MODULE_ROOT.name.lower()
+_ROOT = os.path.dirname(os.path.realpath(__file__))
+NAME = os.path.basename(_ROOT).lower()
 ENTRY_POINTS = [NAME]
 
 def _get_version() -> str:
-    with open(MODULE_ROOT.joinpath("version.txt")) as v:
+    with open(os.path.join(_ROOT, "version.txt")) as v:
         return v.readline().strip()
-VERSION = _get_version()
+
+def __getattr__(name):
+    # VERSION and MODULE_ROOT are computed on first access so importing the
+    # CLI does not read version.txt or load pathlib
+    global VERSION, MODULE_ROOT
+    if name == "VERSION":
+        VERSION = _get_version()
+        return VERSION
+    if name == "MODULE_ROOT":
+        from pathlib import Path
+        MODULE_ROOT = Path(_ROOT)
+        return MODULE_ROOT
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class StdTime:
     FORMAT = '%Y-%m-%d_%H-%M-%S'
 
     @classmethod
     def Timestamp(cls, timestamp: dt|None = None):
+        from datetime import datetime as dt
         ts = dt.now() if timestamp is None else timestamp
         return f"{ts.strftime(StdTime.FORMAT)}"
     
     @classmethod
     def Parse(cls, timestamp: str|int):
+        from datetime import datetime as dt
         if isinstance(timestamp, str):
             return dt.strptime(timestamp, StdTime.FORMAT)
         else:
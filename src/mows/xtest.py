@@ -0,0 +1,298 @@
+"""Native X11 injection through the XTest extension (Linux).
+
+Moves, buttons, wheel and keys all go straight to libXtst via ctypes,
+skipping pynput's per-call overhead.  Requests are only buffered by
+Xlib; nothing reaches the X server until ``flush``, which the injector
+calls once per drained batch rather than once per event.
+
+Keys arrive as serialized key dicts (see ``protocol.serialize_key``).
+Keysym -> keycode lookups for the special keys are resolved once at
+startup; other keysyms are cached on first use.  A keysym with no
+keycode in the current layout is bound to one of up to SPARE_KEYCODES
+keycodes that have no keysyms, taken in turn, least recently used
+first.  X clients look a keycode up when they handle its event, not when
+it was sent, so a keycode rebound while a client is still behind comes
+out as its new keysym.  Taking the spares in turn keeps a rebinding as
+far from the keycode's last use as possible, and a spare still held down
+is never rebound.  A slow client may still garble a burst of more than
+SPARE_KEYCODES different unmapped characters.
+
+An XTest backend may drive any display, not only the one in DISPLAY
+(``mows serve --display``).  The clipboard of such a display is read
+and written with xclip.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import subprocess
+
+from .backends import TYPED_KEYS, Backend
+from .screen import libx11, x11_root_bounds
+
+SPARE_KEYCODES = 8
+
+# pynput Key names -> X keysym names
+SPECIAL_KEYSYMS = {
+    "alt": "Alt_L", "alt_l": "Alt_L", "alt_r": "Alt_R", "alt_gr": "Mode_switch",
+    "backspace": "BackSpace", "caps_lock": "Caps_Lock",
+    "cmd": "Super_L", "cmd_l": "Super_L", "cmd_r": "Super_R",
+    "ctrl": "Control_L", "ctrl_l": "Control_L", "ctrl_r": "Control_R",
+    "delete": "Delete", "down": "Down", "end": "End", "enter": "Return",
+    "esc": "Escape", "home": "Home", "left": "Left",
+    "page_down": "Page_Down", "page_up": "Page_Up", "right": "Right",
+    "shift": "Shift_L", "shift_l": "Shift_L", "shift_r": "Shift_R",
+    "space": "space", "tab": "Tab", "up": "Up",
+    "insert": "Insert", "menu": "Menu", "num_lock": "Num_Lock",
+    "pause": "Pause", "print_screen": "Print", "scroll_lock": "Scroll_Lock",
+    "media_play_pause": "XF86AudioPlay", "media_stop": "XF86AudioStop",
+    "media_volume_mute": "XF86AudioMute",
+    "media_volume_down": "XF86AudioLowerVolume",
+    "media_volume_up": "XF86AudioRaiseVolume",
+    "media_previous": "XF86AudioPrev", "media_next": "XF86AudioNext",
+    "media_eject": "XF86Eject",
+    **{f"f{i}": f"F{i}" for i in range(1, 25)},
+}
+
+# pynput Button names -> X button numbers
+BUTTONS = {
+    "left": 1, "middle": 2, "right": 3,
+    "scroll_up": 4, "scroll_down": 5, "scroll_left": 6, "scroll_right": 7,
+    "x1": 8, "x2": 9,
+    **{f"button{i}": i for i in range(8, 31)},
+}
+
+
+def _char_keysym(char: str) -> int:
+    code = ord(char)
+    if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+        return code
+    return 0x01000000 | code
+
+
+class XTest(Backend):
+    """XTest injection backend bound to one X display."""
+
+    name = "xtest"
+
+    def __init__(self, display_name: str | None = None):
+        x11 = libx11()
+        xtst_path = ctypes.util.find_library('Xtst')
+        if x11 is None or not xtst_path:
+            raise OSError("xtest backend needs libX11 and libXtst")
+        xtst = ctypes.cdll.LoadLibrary(xtst_path)
+        dpy_p = ctypes.c_void_p
+        int_p = ctypes.POINTER(ctypes.c_int)
+
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = dpy_p
+        x11.XFlush.argtypes = [dpy_p]
+        x11.XSync.argtypes = [dpy_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [dpy_p]
+        x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        x11.XStringToKeysym.restype = ctypes.c_ulong
+        x11.XKeysymToKeycode.argtypes = [dpy_p, ctypes.c_ulong]
+        x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        x11.XDisplayKeycodes.argtypes = [dpy_p, int_p, int_p]
+        x11.XGetKeyboardMapping.argtypes = [dpy_p, ctypes.c_ubyte, ctypes.c_int, int_p]
+        x11.XGetKeyboardMapping.restype = ctypes.POINTER(ctypes.c_ulong)
+        x11.XChangeKeyboardMapping.argtypes = [
+            dpy_p, ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_ulong), ctypes.c_int]
+        xtst.XTestQueryExtension.argtypes = [dpy_p, int_p, int_p, int_p, int_p]
+        xtst.XTestFakeRelativeMotionEvent.argtypes = [
+            dpy_p, ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        xtst.XTestFakeMotionEvent.argtypes = [
+            dpy_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        xtst.XTestFakeButtonEvent.argtypes = [
+            dpy_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+        xtst.XTestFakeKeyEvent.argtypes = [
+            dpy_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+
+        dpy = x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not dpy:
+            raise OSError(f"cannot open X display {display_name or '(DISPLAY)'}")
+        ints = [ctypes.c_int() for _ in range(4)]
+        if not xtst.XTestQueryExtension(dpy, *[ctypes.byref(i) for i in ints]):
+            raise OSError("X server lacks the XTEST extension")
+
+        self._x11 = x11
+        self._dpy = dpy
+        self.display_name = display_name
+        self._motion = xtst.XTestFakeRelativeMotionEvent
+        self._motion_to = xtst.XTestFakeMotionEvent
+        self._button = xtst.XTestFakeButtonEvent
+        self._key = xtst.XTestFakeKeyEvent
+        self._keycodes = {}  # keysym -> keycode
+        self._special = {}   # pynput Key name -> keysym
+        self._spares = {}  # spare keycode -> keysym bound to it, least recently used first
+        self._held = set()  # spare keycodes pressed and not released
+        self._levels = None  # keysym -> (keycode, shifted), for type_text
+        for name, sym_name in SPECIAL_KEYSYMS.items():
+            keysym = x11.XStringToKeysym(sym_name.encode())
+            if keysym:
+                self._special[name] = keysym
+                self._keycode(keysym)
+        self._spares = dict.fromkeys(self._find_spare_keycodes())
+
+    def _find_spare_keycodes(self) -> list:
+        """Up to SPARE_KEYCODES of the highest keycodes with no keysyms
+        bound, used for unmapped keysyms."""
+        lo, hi = ctypes.c_int(), ctypes.c_int()
+        self._x11.XDisplayKeycodes(self._dpy, ctypes.byref(lo), ctypes.byref(hi))
+        per = ctypes.c_int()
+        count = hi.value - lo.value + 1
+        syms = self._x11.XGetKeyboardMapping(self._dpy, lo.value, count, ctypes.byref(per))
+        if not syms:
+            return []
+        spares = []
+        try:
+            for code in range(hi.value, lo.value - 1, -1):
+                row = (code - lo.value) * per.value
+                if not any(syms[row + i] for i in range(per.value)):
+                    spares.append(code)
+                    if len(spares) == SPARE_KEYCODES:
+                        break
+        finally:
+            self._x11.XFree(syms)
+        return spares
+
+    def _keyboard_levels(self) -> dict:
+        """keysym -> (keycode, shifted) for the unshifted and shifted
+        keysyms of every keycode; unshifted ones win."""
+        lo, hi = ctypes.c_int(), ctypes.c_int()
+        self._x11.XDisplayKeycodes(self._dpy, ctypes.byref(lo), ctypes.byref(hi))
+        per = ctypes.c_int()
+        count = hi.value - lo.value + 1
+        syms = self._x11.XGetKeyboardMapping(self._dpy, lo.value, count, ctypes.byref(per))
+        levels = {}
+        if not syms:
+            return levels
+        try:
+            for level in range(min(per.value, 2)):
+                for code in range(lo.value, hi.value + 1):
+                    sym = syms[(code - lo.value) * per.value + level]
+                    if sym and code not in self._spares:
+                        levels.setdefault(sym, (code, level == 1))
+        finally:
+            self._x11.XFree(syms)
+        return levels
+
+    def _keycode(self, keysym: int):
+        code = self._keycodes.get(keysym)
+        if code is None:
+            code = self._x11.XKeysymToKeycode(self._dpy, keysym)
+            if not code or code in self._spares:
+                return self._remap(keysym)
+            self._keycodes[keysym] = code
+        return code
+
+    def _remap(self, keysym: int):
+        """The spare keycode bound to ``keysym``, binding the least
+        recently used one not held down if need be; None if there is none."""
+        spares = self._spares
+        for code, bound in spares.items():
+            if bound == keysym:
+                break
+        else:
+            code = next((code for code in spares if code not in self._held), None)
+            if code is None:
+                return None
+            syms = (ctypes.c_ulong * 2)(keysym, keysym)
+            self._x11.XChangeKeyboardMapping(self._dpy, code, 2, syms, 1)
+            self._x11.XSync(self._dpy, 0)
+        del spares[code]
+        spares[code] = keysym  # most recently used last
+        return code
+
+    def keysym(self, key: dict):
+        """X keysym for a serialized key dict, or None if unknown."""
+        kind = key["kind"]
+        if kind == "special":
+            return self._special.get(key["name"])
+        elif kind == "char":
+            return _char_keysym(key["char"]) if len(key["char"]) == 1 else None
+        elif kind == "vk":
+            return key["vk"]  # pynput reports X keysyms as vk on xorg
+
+    # ── injection ────────────────────────────────────────────────────
+
+    def move(self, dx, dy):
+        self._motion(self._dpy, int(dx), int(dy), 0)
+
+    def move_to(self, x: int, y: int):
+        self._motion_to(self._dpy, -1, int(x), int(y), 0)  # -1: the pointer's screen
+
+    def desktop(self) -> tuple | None:
+        return x11_root_bounds(self._x11, self._dpy)
+
+    def button(self, name: str, pressed: bool):
+        number = BUTTONS.get(name)
+        if number is None:
+            raise ValueError(f"unknown mouse button {name!r}")
+        self._button(self._dpy, number, pressed, 0)
+
+    def scroll(self, dx, dy):
+        for button, n in ((4 if dy > 0 else 5, abs(int(dy))),
+                          (7 if dx > 0 else 6, abs(int(dx)))):
+            for _ in range(n):
+                self._button(self._dpy, button, True, 0)
+                self._button(self._dpy, button, False, 0)
+
+    def key(self, key: dict, pressed: bool):
+        keysym = self.keysym(key)
+        code = self._keycode(keysym) if keysym else None
+        if not code:
+            raise ValueError(f"no keycode for key {key}")
+        if code in self._spares:
+            if pressed:
+                self._held.add(code)
+            else:
+                self._held.discard(code)
+        self._key(self._dpy, code, pressed, 0)
+
+    def type_text(self, text: str):
+        """Type ``text``, holding Shift for characters on a shifted level
+        and mapping the rest onto spare keycodes."""
+        if self._levels is None:
+            self._levels = self._keyboard_levels()
+        levels, fake, dpy = self._levels, self._key, self._dpy
+        shift = self._keycode(self._special["shift"])
+        for char in text:
+            special = TYPED_KEYS.get(char)
+            keysym = self._special.get(special["name"]) if special else _char_keysym(char)
+            if keysym is None:  # a special key this X server has no keysym for
+                raise ValueError(f"no keycode for {char!r}")
+            code, shifted = levels.get(keysym, (None, False))
+            if code is None:
+                code = self._remap(keysym)
+                if code is None:
+                    raise ValueError(f"no keycode for {char!r}")
+            if shifted:
+                fake(dpy, shift, True, 0)
+            fake(dpy, code, True, 0)
+            fake(dpy, code, False, 0)
+            if shifted:
+                fake(dpy, shift, False, 0)
+
+    def clipboard_get(self) -> str:
+        if self.display_name is None:
+            return super().clipboard_get()
+        out = subprocess.run(["xclip", "-selection", "clipboard", "-o"], env=self._env(),
+                             capture_output=True, text=True)
+        return out.stdout if out.returncode == 0 else ""  # fails while the clipboard is empty
+
+    def clipboard_set(self, text: str):
+        if self.display_name is None:
+            return super().clipboard_set(text)
+        subprocess.run(["xclip", "-selection", "clipboard"], input=text, env=self._env(),
+                       text=True, check=True)
+
+    def _env(self) -> dict:
+        return dict(os.environ, DISPLAY=self.display_name)
+
+    def flush(self):
+        self._x11.XFlush(self._dpy)
+
+    def close(self):
+        self._x11.XCloseDisplay(self._dpy)
@@ -0,0 +1,27 @@
+import os, sys
+from pathlib import Path
+
+import pytest
+
+HERE = Path(os.path.realpath(__file__)).parent
+sys.path.insert(0, str(HERE.parent.joinpath("src")))
+os.environ.setdefault("PYNPUT_BACKEND", "dummy")  # no display needed to import the client
+
+
+@pytest.fixture
+def xvfb():
+    """``xvfb(n)`` starts n Xvfb servers and returns their display names;
+    the test is skipped without Xvfb, libX11 or libXtst."""
+    from mows.bench import BenchUnavailable, _start_xvfb, _stop_xvfb
+    started = []
+
+    def start(count: int = 1) -> list:
+        try:
+            servers = _start_xvfb(count)
+        except BenchUnavailable as e:
+            pytest.skip(str(e))
+        started.extend(servers)
+        return [name for name, _ in servers]
+
+    yield start
+    _stop_xvfb(started)
@@ -0,0 +1,92 @@
+import time
+
+from mows.arbiter import Arbiter
+from mows.resume import Session
+
+ALT = {"kind": "special", "name": "alt"}
+PRESS = {"type": "key_press", "key": ALT}
+RELEASE = {"type": "key_release", "key": ALT}
+MOVE = {"type": "mouse_move", "dx": 1, "dy": 0}
+
+
+def _click(pressed: bool) -> dict:
+    return {"type": "mouse_click", "button": "left", "pressed": pressed}
+
+
+def _session(name: str, priority: int = 0) -> Session:
+    session = Session(name)
+    session.priority = priority
+    return session
+
+
+def test_shared_counts_holders():
+    arbiter = Arbiter()
+    a, b = _session("a"), _session("b")
+    assert arbiter.admit(a, PRESS)
+    assert arbiter.admit(a, PRESS)  # autorepeat from the only holder
+    assert not arbiter.admit(b, PRESS)  # already held: not pressed again
+    assert not arbiter.admit(a, RELEASE)  # b still holds it
+    assert arbiter.admit(b, RELEASE)  # the last holder lets go
+    assert arbiter.admit(a, MOVE) and arbiter.admit(b, MOVE)
+    assert arbiter.admit(b, RELEASE)  # a release of what nobody holds passes
+
+
+def test_leave_releases_only_unshared_input():
+    arbiter = Arbiter()
+    a, b = _session("a"), _session("b")
+    arbiter.admit(a, PRESS)
+    arbiter.admit(b, PRESS)
+    arbiter.admit(a, _click(True))
+    assert arbiter.leave(a) == [_click(False)]
+    assert arbiter.leave(b) == [RELEASE]
+    assert not arbiter.sessions
+
+
+def test_exclusive_hands_over_when_idle():
+    granted = []
+    arbiter = Arbiter("exclusive", idle=0.05,
+                      notify=lambda session, ok: granted.append((session.id, ok)))
+    a, b = _session("a"), _session("b")
+    assert arbiter.admit(a, PRESS)
+    assert not arbiter.admit(b, MOVE)
+    assert not arbiter.admit(b, MOVE)
+    assert b.denied == 2
+    assert granted == [("a", True), ("b", False)]  # b is told once
+    time.sleep(0.06)
+    assert arbiter.admit(b, MOVE)
+    assert arbiter.controller is b and arbiter.handovers == 1
+    assert granted[2:] == [("a", False), ("b", True)]
+    # a lost control holding alt: its release waits for the caller
+    assert arbiter.pending == [(a, RELEASE)]
+    assert not a.keys
+    assert not arbiter.admit(a, MOVE)
+
+
+def test_exclusive_hands_over_when_controller_leaves():
+    arbiter = Arbiter("exclusive", idle=60)
+    a, b = _session("a"), _session("b")
+    assert arbiter.admit(a, MOVE)
+    assert not arbiter.admit(b, MOVE)
+    arbiter.leave(a)
+    assert arbiter.admit(b, MOVE) and arbiter.controller is b
+    assert arbiter.handovers == 0
+
+
+def test_priority_preempts():
+    arbiter = Arbiter("priority", idle=60)
+    low, high, other = _session("low", 1), _session("high", 5), _session("other", 1)
+    assert arbiter.admit(low, _click(True))
+    assert not arbiter.admit(other, MOVE)  # same priority waits for idle
+    assert arbiter.admit(high, MOVE)  # higher priority takes over at once
+    assert arbiter.controller is high and low.control is False
+    assert arbiter.pending == [(low, _click(False))]
+    assert not arbiter.admit(low, MOVE)
+
+
+def test_lost_control_keeps_shared_holds():
+    arbiter = Arbiter("priority", idle=60)
+    low, high = _session("low", 1), _session("high", 5)
+    assert arbiter.admit(low, PRESS)
+    assert arbiter.admit(high, MOVE)
+    assert arbiter.admit(high, PRESS)  # low's hold went with its control
+    assert arbiter.pending == [(low, RELEASE)]
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+from pynput.keyboard import Key
+from pynput.mouse import Button
+
+from mows.backlog import LOW_WATER, Backlog
+from mows.protocol import BinaryCodec, JsonCodec, decode_message, peek_stamp, stamp
+
+CODECS = [JsonCodec, BinaryCodec]
+_STOP = object()  # stands in for the client's control sentinels
+
+
+def _drain(backlog: Backlog) -> list:
+    return [backlog.get_nowait() for _ in range(backlog.qsize())]
+
+
+def _decoded(backlog: Backlog) -> list:
+    return [item if item is None or item is _STOP else decode_message(item)
+            for item in _drain(backlog)]
+
+
+def _motion(seq: int) -> str:
+    return json.dumps({"type": "motion", "channel": 1, "seq": seq, "dx": seq, "dy": -seq})
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_merges_runs_keeping_oldest_stamp(codec):
+    b = Backlog(limit=8)
+    for i in range(4):
+        b.put_nowait(stamp(codec.mouse_move(1, 2), 100 + i))
+    for i in range(3):
+        b.put_nowait(stamp(codec.mouse_scroll(0, -1), 200 + i))
+    b.put_nowait(codec.key_press(Key.alt))
+    b.put_nowait(codec.mouse_move(5, 5))  # full: compacts first
+    items = _drain(b)
+    assert peek_stamp(items[0]) == ("mouse_move", 100)
+    assert peek_stamp(items[1]) == ("mouse_scroll", 200)
+    assert [decode_message(item) for item in items] == [
+        {"type": "mouse_move", "dx": 4, "dy": 8, "t": 100},
+        {"type": "mouse_scroll", "dx": 0, "dy": -3, "t": 200},
+        {"type": "key_press", "key": {"kind": "special", "name": "alt"}},
+        {"type": "mouse_move", "dx": 5, "dy": 5},
+    ]
+    assert b.compacted == 5 and b.dropped == 0
+
+
+def test_keeps_newest_motion_sync_and_position():
+    b = Backlog(limit=8)
+    for seq in range(1, 5):
+        b.put_nowait(_motion(seq))
+    for x in (0.1, 0.2, 0.3, 0.4):
+        b.put_nowait(BinaryCodec.mouse_position(x, 0.5))
+    b.put_nowait(_motion(5))
+    events = _decoded(b)
+    assert events[0]["seq"] == 4
+    assert events[1]["type"] == "mouse_position" and events[1]["x"] == pytest.approx(0.4)
+    assert events[2]["seq"] == 5
+    assert len(events) == 3
+
+
+def test_does_not_merge_across_encodings():
+    b = Backlog(limit=4)
+    for codec in (JsonCodec, BinaryCodec, JsonCodec, BinaryCodec):
+        b.put_nowait(codec.mouse_move(1, 1))
+    b.put_nowait(JsonCodec.mouse_move(1, 1))
+    assert b.compacted == 0 and b.dropped == 1
+    assert [type(item) for item in _drain(b)] == [bytes, str, bytes, str]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_drops_autorepeat(codec):
+    b = Backlog(limit=6)
+    for _ in range(4):
+        b.put_nowait(codec.key_press(Key.shift))
+    b.put_nowait(codec.key_release(Key.shift))
+    b.put_nowait(codec.key_press(Key.shift))  # a new press after the release
+    b.put_nowait(codec.key_press(Key.shift))  # full: compacts first
+    events = _decoded(b)
+    assert [e["type"] for e in events] == ["key_press", "key_release", "key_press", "key_press"]
+    assert b.compacted == 3
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_sheds_to_low_water(codec):
+    b = Backlog(limit=8)
+    for i in range(8):
+        b.put_nowait(codec.mouse_click(Button.left, i % 2 == 0))
+    b.put_nowait(codec.mouse_move(1, 1))
+    low = int(8 * LOW_WATER)
+    assert b.qsize() == low + 1
+    events = _decoded(b)
+    assert [e.get("pressed") for e in events] == [True, False] * (low // 2) + [None]
+    assert b.dropped == 8 - low
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_shed_press_takes_later_release(codec):
+    b = Backlog(limit=4)
+    b.put_nowait(codec.key_press(Key.ctrl))
+    b.put_nowait(codec.mouse_click(Button.left, True))
+    b.put_nowait(codec.mouse_click(Button.left, False))
+    b.put_nowait(codec.mouse_click(Button.right, True))
+    b.put_nowait(codec.mouse_click(Button.right, False))  # full: ctrl is shed
+    b.put_nowait(codec.key_release(Key.ctrl))  # captured later: dropped with it
+    assert [(e["button"], e["pressed"]) for e in _decoded(b)] == [
+        ("left", True), ("left", False), ("right", True), ("right", False)]
+    assert b.dropped == 2
+    b.put_nowait(codec.key_press(Key.ctrl))
+    b.put_nowait(codec.key_release(Key.ctrl))  # a new pair is kept
+    assert [e["type"] for e in _decoded(b)] == ["key_press", "key_release"]
+    assert b.dropped == 2
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_keeps_release_whose_press_was_sent(codec):
+    async def main():
+        b = Backlog(limit=4)
+        b.put_nowait(codec.key_press(Key.ctrl))
+        assert await b.get()  # sent
+        b.put_nowait(codec.key_release(Key.ctrl))
+        for _ in range(6):
+            b.put_nowait(codec.mouse_move(1, 0))
+            b.put_nowait(codec.mouse_scroll(0, 1))
+        return b
+
+    b = asyncio.run(main())
+    events = _decoded(b)
+    assert events[0] == decode_message(codec.key_release(Key.ctrl))
+    assert len(events) <= 4 and b.dropped > 0
+
+
+def test_always_keeps_control_items():
+    b = Backlog(limit=4)
+    b.put_nowait(_STOP)
+    b.put_nowait(None)
+    for i in range(10):
+        b.put_nowait(BinaryCodec.mouse_click(Button.left, i % 2 == 0))
+    items = _drain(b)
+    assert items[:2] == [_STOP, None]
+    assert len(items) <= 4
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from mows import bench
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(bench, "BENCHMARKS", {})
+    monkeypatch.setattr(bench, "UNITS", {})
+    monkeypatch.setattr(bench, "BUDGETS", {})
+
+
+def _register(name, fn):
+    bench.bench(name)(fn)
+
+
+def _fast():
+    return {"a": 1.0, "b": 2.0}
+
+
+def test_passes(registry):
+    _register("fake.fast", _fast)
+    assert bench.run_benchmarks() == 0
+
+
+def test_unavailable_is_skipped(registry):
+    def unavailable():
+        raise bench.BenchUnavailable("no Xvfb")
+    _register("fake.fast", _fast)
+    _register("fake.unavailable", unavailable)
+    assert bench.run_benchmarks() == 0
+
+
+@pytest.mark.parametrize("error", [bench.BenchFailure("misplaced"), RuntimeError("broken"),
+                                   ImportError("no module")])
+def test_other_exceptions_fail(registry, error):
+    def broken():
+        raise error
+    _register("fake.broken", broken)
+    assert bench.run_benchmarks() == 1
+
+
+def test_over_budget_fails(registry):
+    bench.bench("fake.fast", budgets={"b": 1.5})(_fast)
+    assert bench.run_benchmarks() == 1
+
+
+def test_baseline_result_not_measured_fails(registry, tmp_path):
+    def unavailable():
+        raise bench.BenchUnavailable("no Xvfb")
+    _register("fake.fast", _fast)
+    _register("fake.unavailable", unavailable)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"fake.fast.a": 1.0, "fake.unavailable": 5.0}))
+    assert bench.run_benchmarks(baseline=str(baseline), tolerance=10) == 1
+    # results of benchmarks left out by -k are not missing
+    assert bench.run_benchmarks(select="fast", baseline=str(baseline), tolerance=10) == 0
+
+
+def test_regression_fails(registry, tmp_path):
+    _register("fake.fast", _fast)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"fake.fast.a": 0.5}))
+    assert bench.run_benchmarks(baseline=str(baseline), tolerance=0.3) == 1
+    assert bench.run_benchmarks(baseline=str(baseline), tolerance=2) == 0
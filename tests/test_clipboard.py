@@ -0,0 +1,265 @@
+import asyncio
+import json
+import os
+import select
+
+import pytest
+
+from mows import clipboard
+from mows.clipboard import (MAX_CLIPBOARD, ClipboardSession, Receiver, Transfer, TransferError,
+                            _SelectionWatch, content_hash)
+from mows.protocol import BinaryCodec, JsonCodec, decode_message
+
+
+class _FakeX11:
+    """The few Xlib calls _SelectionWatch makes, over a pipe standing in
+    for the X connection: each byte written is one event."""
+
+    def __init__(self):
+        self.server, self.events = os.pipe()
+        self.closed = []
+
+    def XConnectionNumber(self, dpy):
+        return self.server
+
+    def XPending(self, dpy):
+        return bool(select.select([self.server], [], [], 0)[0])
+
+    def XNextEvent(self, dpy, event):
+        os.read(self.server, 1)
+
+    def XCloseDisplay(self, dpy):
+        self.closed.append(dpy)
+
+
+def test_selection_watch_signals_and_closes():
+    async def run():
+        x11 = _FakeX11()
+        watch = _SelectionWatch(asyncio.get_running_loop(), x11, "dpy")
+        os.write(x11.events, b"e")
+        await asyncio.wait_for(watch.changed.wait(), 2)
+        watch.close()
+        assert not watch._thread.is_alive()
+        assert x11.closed == ["dpy"]
+        watch.close()  # a second close does nothing
+        assert x11.closed == ["dpy"]
+        os.close(x11.server)
+        os.close(x11.events)
+
+    asyncio.run(run())
+
+
+def test_watchers_do_not_leak_threads():
+    import threading
+
+    async def run():
+        x11 = _FakeX11()
+        loop = asyncio.get_running_loop()
+        for _ in range(20):  # a reconnect each
+            _SelectionWatch(loop, x11, "dpy").close()
+        assert len(x11.closed) == 20
+
+    asyncio.run(run())
+    assert not [t for t in threading.enumerate() if t.name == "mows-clipboard-watch"]
+
+
+def test_watcher_stop_releases_the_display(monkeypatch):
+    from mows import clipboard
+
+    async def run():
+        x11 = _FakeX11()
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(clipboard._SelectionWatch, "open",
+                            classmethod(lambda cls, loop, display=None: cls(loop, x11, display)))
+        texts = iter(["a", "b"])
+        changes = []
+
+        async def read():
+            return next(texts, "b")
+
+        async def on_change(text):
+            changes.append(text)
+
+        watcher = clipboard.ClipboardWatcher(read, on_change, display=":7")
+        watcher.start()
+        await asyncio.sleep(0.01)
+        os.write(x11.events, b"e")  # the owner changed
+        for _ in range(200):
+            if changes == ["a", "b"]:
+                break
+            await asyncio.sleep(0.01)
+        assert changes == ["a", "b"]
+        watcher.stop()
+        assert x11.closed == [":7"]
+
+    asyncio.run(run())
+
+
+# ── transfers ─────────────────────────────────────────────────────
+
+async def _round_trip(text: str, codec, limit: int = MAX_CLIPBOARD) -> tuple:
+    transfer = Transfer(text)
+    frames = []
+
+    async def send(frame):
+        frames.append(frame)
+
+    await transfer.stream(send, codec)
+    receiver = Receiver(json.loads(transfer.offer()), limit)
+    done = [receiver.add(decode_message(frame)) for frame in frames]
+    assert done == [False] * (len(frames) - 1) + [True]
+    return transfer, frames, receiver.text()
+
+
+@pytest.mark.parametrize("codec", [JsonCodec, BinaryCodec])
+def test_round_trip_in_chunks(codec, monkeypatch):
+    monkeypatch.setattr(clipboard, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(clipboard, "COMPRESS_RATIO", 0)  # never compress
+    text = "".join(chr(0x20 + (i * 7919) % 0x2000) for i in range(3000))
+    transfer, frames, received = asyncio.run(_round_trip(text, codec))
+    assert received == text
+    assert not transfer.compressed
+    assert transfer.chunks == len(frames) == -(-len(text.encode()) // 1000)
+
+
+def test_round_trip_compressed_chunks(monkeypatch):
+    monkeypatch.setattr(clipboard, "CHUNK_SIZE", 100)
+    text = "".join(chr(0x20 + (i * 7919) % 0x2000) for i in range(3000))
+    transfer, frames, received = asyncio.run(_round_trip(text, BinaryCodec))
+    assert received == text
+    assert transfer.compressed and len(frames) == -(-len(transfer.payload) // 100) > 1
+
+
+def test_compresses_only_when_it_pays():
+    assert Transfer("abc" * 10_000).compressed
+    assert not Transfer("abc").compressed  # zlib's overhead outweighs the saving
+    transfer, frames, received = asyncio.run(_round_trip("abc" * 100_000, BinaryCodec))
+    assert received == "abc" * 100_000
+    assert transfer.compressed and len(transfer.payload) < 300_000 * 0.9
+    assert json.loads(transfer.offer())["size"] == 300_000
+
+
+def test_empty_clipboard_is_one_chunk():
+    transfer, frames, received = asyncio.run(_round_trip("", JsonCodec))
+    assert received == "" and transfer.chunks == len(frames) == 1
+
+
+def test_rejects_oversize_offer():
+    offer = json.loads(Transfer("x" * 100).offer())
+    with pytest.raises(TransferError, match="exceeds limit"):
+        Receiver(offer, limit=99)
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_rejects_more_data_than_announced(compressed):
+    transfer = Transfer("y" * 10_000)
+    assert transfer.compressed
+    payload = transfer.payload if compressed else transfer.raw
+    offer = dict(json.loads(transfer.offer()), size=5000, compressed=compressed)
+    receiver = Receiver(offer)
+    with pytest.raises(TransferError, match="larger than announced"):
+        receiver.add({"seq": 0, "data": payload})
+
+
+def test_rejects_mismatched_hash():
+    transfer = Transfer("hello")
+    offer = dict(json.loads(transfer.offer()), hash=content_hash(b"jello"))
+    receiver = Receiver(offer)
+    assert receiver.add({"seq": 0, "data": transfer.payload})
+    with pytest.raises(TransferError, match="does not match its hash"):
+        receiver.text()
+
+
+def test_rejects_out_of_order_chunk():
+    receiver = Receiver(json.loads(Transfer("z").offer()))
+    with pytest.raises(TransferError, match="out of order"):
+        receiver.add({"seq": 1, "data": b"z"})
+
+
+def _pair(local: dict, remote: dict):
+    """Two ClipboardSessions wired to each other, each with its own
+    in-memory clipboard."""
+    sessions = []
+
+    def make(store, peer_index):
+        async def send(message):
+            await sessions[peer_index].handle(decode_message(message))
+
+        async def read():
+            return store["text"]
+
+        async def write(text):
+            store["text"] = text
+
+        return ClipboardSession(send, BinaryCodec, read, write)
+
+    sessions += [make(local, 1), make(remote, 0)]
+    return sessions
+
+
+def test_push_skips_content_the_peer_holds():
+    async def main():
+        local, remote = {"text": "same"}, {"text": "same"}
+        a, _ = _pair(local, remote)
+        first = await a.push("same")
+        second = await a.push("same")  # known now: nothing is sent
+        remote["text"] = "other"
+        third = await a.push("new")
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return first, second, third, remote["text"]
+
+    assert asyncio.run(main()) == ("have", "have", "done", "new")
+
+
+def test_pull_round_trip():
+    async def main():
+        local, remote = {"text": "mine"}, {"text": "theirs" * 1000}
+        a, _ = _pair(local, remote)
+        result = await a.pull()
+        again = await a.pull()
+        return result, again, local["text"]
+
+    assert asyncio.run(main()) == ("done", "have", "theirs" * 1000)
+
+
+class _Server:
+    """A WebSocket end answering copy-from with canned messages."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+
+    async def recv(self):
+        if not self.replies:
+            await asyncio.sleep(3600)
+        return self.replies.pop(0)
+
+
+def test_copy_from_reports_server_error():
+    ws = _Server(json.dumps({"type": "clipboard_error", "id": 1, "error": "no clipboard"}))
+    with pytest.raises(TransferError, match="no clipboard"):
+        asyncio.run(clipboard._pulled(ws, decode_message))
+
+
+def test_copy_from_reports_error_mid_transfer(monkeypatch):
+    monkeypatch.setattr(clipboard, "CHUNK_SIZE", 10)
+    transfer = Transfer(os.urandom(20).hex())
+    ws = _Server(transfer.offer(), BinaryCodec.clipboard_chunk(transfer.id, 0, transfer.payload[:10]),
+                 json.dumps({"type": "clipboard_error", "id": transfer.id, "error": "gone"}))
+    with pytest.raises(TransferError, match="gone"):
+        asyncio.run(clipboard._pulled(ws, decode_message))
+
+
+def test_copy_from_times_out(monkeypatch):
+    monkeypatch.setattr(clipboard, "REPLY_TIMEOUT", 0.01)
+    transfer = Transfer("hi")
+    with pytest.raises(TransferError, match="no reply"):
+        asyncio.run(clipboard._pulled(_Server(transfer.offer()), decode_message))
+
+
+def test_copy_from_receives():
+    transfer = Transfer("hi there")
+    ws = _Server(transfer.offer(), JsonCodec.clipboard_chunk(transfer.id, 0, transfer.payload))
+    assert asyncio.run(clipboard._pulled(ws, decode_message)) == "hi there"
+    have = _Server(json.dumps({"type": "clipboard_have", "id": 1}))
+    assert asyncio.run(clipboard._pulled(have, decode_message)) is None
@@ -0,0 +1,28 @@
+from mows.coalesce import MAX_HZ, CoalescePolicy, Coalescer
+
+
+def test_accumulates_until_taken():
+    c = Coalescer(CoalescePolicy())
+    assert not c.pending and c.take() == (0, 0, None)
+    assert c.add(3, -1, now=10.0)  # the first delta schedules a flush
+    assert not c.add(2, 5, now=10.001)
+    assert c.pending
+    assert c.take() == (5, 4, 10.0)
+    assert not c.pending and c.take() == (0, 0, None)
+
+
+def test_delay_bounded_by_staleness():
+    policy = CoalescePolicy(target_hz=250, max_staleness=0.05)
+    c = Coalescer(policy)
+    assert c.delay(0) == 0.0
+    c.add(1, 1)
+    assert 0 < c.delay(0) <= 1 / 250
+    assert c.delay(10_000) <= 0.05
+
+
+def test_interval():
+    policy = CoalescePolicy(target_hz=250, max_staleness=0.05, reference_speed=1000)
+    assert policy.interval(1000, 0) == 1 / 250
+    assert policy.interval(1e9, 0) == 1 / MAX_HZ
+    assert policy.interval(0, 0) == 0.05
+    assert policy.interval(1000, 32) == 2 / 250
@@ -0,0 +1,116 @@
+import asyncio
+import os
+
+import pytest
+
+from mows import control
+
+pytestmark = pytest.mark.skipif(not control.available(), reason="no Unix-domain sockets")
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    base = tmp_path / "run"
+    base.mkdir(mode=0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(base))
+    return base
+
+
+async def _echo(req):
+    return f"{len(req['text'])} chars"
+
+
+async def _ask(**args):
+    server = await control.serve("localhost", 1, {"type": _echo})
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: control.request("localhost", 1, "type", **args))
+    finally:
+        control.close(server, "localhost", 1)
+
+
+def test_round_trip_past_stream_limit(run_dir):
+    text = "x" * (1 << 20)  # 16 times asyncio's default readline limit
+    reply = asyncio.run(_ask(text=text))
+    assert reply == {"ok": True, "message": f"{len(text)} chars"}
+
+
+def test_unknown_command(run_dir):
+    async def ask():
+        server = await control.serve("localhost", 1, {})
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: control.request("localhost", 1, "nope"))
+        finally:
+            control.close(server, "localhost", 1)
+    reply = asyncio.run(ask())
+    assert not reply["ok"] and "nope" in reply["message"]
+
+
+def test_socket_is_private(run_dir):
+    async def mode():
+        server = await control.serve("localhost", 1, {})
+        try:
+            return os.stat(control.control_path("localhost", 1)).st_mode & 0o777
+        finally:
+            control.close(server, "localhost", 1)
+    assert asyncio.run(mode()) == 0o600
+
+
+def test_refuses_open_directory(run_dir):
+    run_dir.chmod(0o755)
+    assert asyncio.run(control.serve("localhost", 1, {})) is None
+    assert not os.path.exists(control.control_path("localhost", 1))
+
+
+def test_refuses_symlinked_directory(tmp_path, monkeypatch):
+    real = tmp_path / "real"
+    real.mkdir(mode=0o700)
+    link = tmp_path / "link"
+    link.symlink_to(real)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(link))
+    assert asyncio.run(control.serve("localhost", 1, {})) is None
+
+
+def test_request_ignores_socket_in_open_directory(run_dir):
+    async def ask():
+        server = await control.serve("localhost", 1, {"type": _echo})
+        try:
+            run_dir.chmod(0o777)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, lambda: control.request("localhost", 1, "type", text="secret"))
+        finally:
+            run_dir.chmod(0o700)
+            control.close(server, "localhost", 1)
+    assert asyncio.run(ask()) is None
+
+
+def test_tmp_fallback_directory_checked(tmp_path, monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setenv("TMPDIR", str(tmp_path))
+    import tempfile
+    monkeypatch.setattr(tempfile, "tempdir", None)
+    planted = tmp_path / f"mows-{os.getuid()}"
+    planted.mkdir(mode=0o777)
+    planted.chmod(0o777)
+    assert asyncio.run(control.serve("localhost", 1, {})) is None
+
+
+def test_display_has_its_own_socket(run_dir):
+    async def ask():
+        async def which(req):
+            return "display :3"
+        plain = await control.serve("localhost", 1, {"which": _echo})
+        other = await control.serve("localhost", 1, {"which": which}, ":3")
+        try:
+            assert other is not None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, lambda: control.request("localhost", 1, "which", ":3"))
+        finally:
+            control.close(other, "localhost", 1, ":3")
+            control.close(plain, "localhost", 1)
+    assert asyncio.run(ask()) == {"ok": True, "message": "display :3"}
+    assert control.control_path("localhost", 1) != control.control_path("localhost", 1, ":3")
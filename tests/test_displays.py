@@ -0,0 +1,91 @@
+"""One ``mows serve --backend xtest`` driving several Xvfb displays:
+input sent to /display/NAME must land on that display and no other.
+Skipped without Xvfb."""
+
+import asyncio
+import subprocess
+import sys
+
+import pytest
+import websockets
+
+from mows.bench import XVFB_SCREEN, _env, _free_port, _PointerProbe, _wait_for_port
+from mows.protocol import BINARY_SUBPROTOCOL, BinaryCodec, display_path
+from mows.screen import Desktop
+
+DISPLAYS = 3
+
+
+@pytest.fixture
+def server(xvfb):
+    names = xvfb(DISPLAYS + 1)
+    default, listed = names[0], names[1:]
+    port = _free_port()
+    args = [a for name in listed for a in ("--display", name)]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "mows", "serve", "--host", "127.0.0.1", "--port", str(port),
+         "--backend", "xtest", *args],
+        env=dict(_env(), DISPLAY=default), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    probes = {name: _PointerProbe(name) for name in names}
+    try:
+        _wait_for_port(port)
+        yield port, default, listed, probes
+    finally:
+        proc.terminate()
+        proc.wait()
+        for probe in probes.values():
+            probe.close()
+
+
+async def _place(port: int, display: str | None, fx: float, fy: float):
+    uri = f"ws://127.0.0.1:{port}{display_path(display)}"
+    async with websockets.connect(uri, subprotocols=[BINARY_SUBPROTOCOL]) as ws:
+        await ws.send(BinaryCodec.mouse_position(fx, fy))
+        await ws.send('{"type": "ping", "t": 0}')  # answered once the position is dispatched
+        while "pong" not in str(await ws.recv()):
+            pass
+
+
+async def _settle(probes: dict, expected: dict, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if all(probes[name].position() == pos for name, pos in expected.items()):
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_each_display_gets_only_its_own_input(server):
+    port, default, listed, probes = server
+    place = Desktop(lambda: (0, 0, *XVFB_SCREEN)).place
+    expected = {name: probe.position() for name, probe in probes.items()}
+
+    async def drive():
+        for i, name in enumerate([None, *listed]):
+            target = (0.1 + 0.2 * i, 0.8 - 0.2 * i)
+            await _place(port, name, *target)
+            expected[name or default] = place(*target)
+            await _settle(probes, expected)
+            assert {n: p.position() for n, p in probes.items()} == expected
+
+    asyncio.run(drive())
+
+
+def test_displays_driven_at_once(server):
+    from mows.bench import _drive_displays
+    port, _, listed, probes = server
+    misplaced = []
+    asyncio.run(_drive_displays(port, {name: probes[name] for name in listed}, misplaced))
+    assert not misplaced
+
+
+def test_unlisted_display_is_refused(server):
+    port = server[0]
+
+    async def connect():
+        uri = f"ws://127.0.0.1:{port}{display_path(':999')}"
+        async with websockets.connect(uri, subprotocols=[BINARY_SUBPROTOCOL]):
+            pass
+
+    with pytest.raises(websockets.InvalidStatus) as e:
+        asyncio.run(connect())
+    assert e.value.response.status_code == 404
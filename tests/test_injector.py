@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+from mows.backends import RecordingBackend
+from mows.injector import Injector
+from mows.server import _make_injection
+
+
+def _click(button: str, pressed: bool = True) -> dict:
+    return {"type": "mouse_click", "button": button, "pressed": pressed}
+
+
+def _injector(loop, maxsize: int = 256):
+    backend = RecordingBackend()
+    injector = Injector(_make_injection(backend), loop, maxsize=maxsize, flush=backend.flush)
+    return injector, backend
+
+
+async def _drained(backend: RecordingBackend, method: str = "flush", n: int = 1) -> list:
+    """The calls recorded once ``method`` was called ``n`` times, by
+    default up to the injector's next flush."""
+    deadline = time.monotonic() + 2
+    while backend.counts[method] < n:
+        assert time.monotonic() < deadline, "injector did not drain"
+        await asyncio.sleep(0.005)
+    calls = [(method, *args) for _, method, args in backend.calls]
+    backend.calls.clear()
+    backend.counts.clear()
+    return calls
+
+
+def test_lanes_take_turns():
+    async def main():
+        injector, backend = _injector(asyncio.get_running_loop())
+        for i in range(4):
+            await injector.put(_click(f"a{i}"), "a")
+        await injector.put(_click("b0"), "b")
+        await injector.put(_click("n0"))  # the server's own lane
+        await injector.put(_click("b1"), "b")
+        injector.start()
+        try:
+            return await _drained(backend)
+        finally:
+            injector.stop()
+
+    calls = asyncio.run(main())
+    assert [args[1] for args in calls if args[0] == "button"] == [
+        "a0", "b0", "n0", "a1", "b1", "a2", "a3"]
+
+
+def test_full_lane_pushes_back_on_its_producer_only():
+    async def main():
+        injector, backend = _injector(asyncio.get_running_loop(), maxsize=2)
+        await injector.put(_click("a0"), "a")
+        await injector.put(_click("a1"), "a")
+        assert not injector.offer(_click("a2"), "a")
+        blocked = asyncio.create_task(injector.put(_click("a2"), "a"))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        assert injector.offer(_click("b0"), "b")  # other lanes still have room
+        assert injector.lane_stats("a")["waits"] == 1
+        injector.start()
+        try:
+            await asyncio.wait_for(blocked, 1)
+            return await _drained(backend, "button", 4), injector.stats()
+        finally:
+            injector.stop()
+
+    calls, stats = asyncio.run(main())
+    assert sorted(args[1] for args in calls if args[0] == "button") == ["a0", "a1", "a2", "b0"]
+    assert stats["peak_depth"] == 3
+
+
+def _move(dx: int, dy: int, **extra) -> dict:
+    return {"type": "mouse_move", "dx": dx, "dy": dy, **extra}
+
+
+def _key(pressed: bool) -> dict:
+    return {"type": "key_press" if pressed else "key_release",
+            "key": {"kind": "special", "name": "alt"}}
+
+
+def test_merges_queued_moves():
+    async def main():
+        injector, backend = _injector(asyncio.get_running_loop())
+        injector.offer(_move(1, 2, t=100))
+        injector.offer(_move(3, 4, t=200))
+        injector.offer({"type": "mouse_position", "x": 0.1, "y": 0.1, "t": 300})
+        injector.offer({"type": "mouse_position", "x": 0.5, "y": 0.25, "t": 400})
+        injector.offer(_click("left"))
+        injector.offer(_move(5, 6))
+        injector.offer(_move(1, 1))
+        stats = injector.stats()
+        injector.start()
+        try:
+            return await _drained(backend), stats
+        finally:
+            injector.stop()
+
+    calls, stats = asyncio.run(main())
+    assert calls == [("move", 4, 6), ("move_to", 960, 270), ("button", "left", True),
+                     ("move", 6, 7), ("flush",)]
+    assert stats["merged"] == 3 and stats["depth"] == 4
+
+
+def test_merged_move_keeps_older_fields():
+    async def main():
+        applied = []
+        injector = Injector(applied.append, asyncio.get_running_loop())
+        injector.offer(_move(1, 2, t=100))
+        injector.offer(_move(3, 4, t=200))
+        injector.start()
+        try:
+            await injector.call({"type": "done"})
+        finally:
+            injector.stop()
+        return applied
+
+    assert asyncio.run(main()) == [_move(4, 6, t=100), {"type": "done"}]
+
+
+def test_keys_jump_only_tail_motion():
+    async def main():
+        injector, backend = _injector(asyncio.get_running_loop())
+        injector.offer(_click("left"))
+        injector.offer(_move(1, 0))
+        injector.offer(_key(True))  # ahead of the move, not the click
+        injector.offer(_click("left", False))
+        injector.offer(_key(False))  # the click stays ahead of it
+        injector.start()
+        try:
+            return await _drained(backend)
+        finally:
+            injector.stop()
+
+    assert [call[0] if call[0] != "key" else call[2] for call in asyncio.run(main())] == [
+        "button", True, "move", "button", False, "flush"]
+
+
+def test_flush_once_per_drain():
+    async def main():
+        injector, backend = _injector(asyncio.get_running_loop())
+        for button in ("a", "b", "c"):
+            injector.offer(_click(button))
+        injector.start()
+        try:
+            first = await _drained(backend)
+            await injector.call(_click("d"))
+            second = await _drained(backend)
+            return first, second
+        finally:
+            injector.stop()
+
+    first, second = asyncio.run(main())
+    assert [call[0] for call in first].count("flush") == 1
+    assert first[-1] == ("flush",)
+    assert second == [("button", "d", True), ("flush",)]
+
+
+def test_call_waits_for_room_and_returns_the_result():
+    async def main():
+        backend = RecordingBackend()
+        backend.clipboard_set("hello")
+        injector = Injector(_make_injection(backend), asyncio.get_running_loop(), maxsize=1)
+        injector.offer(_click("a"), "a")
+        pull = asyncio.create_task(injector.call({"type": "clipboard_pull"}, "a"))
+        await asyncio.sleep(0.01)
+        assert not pull.done() and injector.lane_stats("a")["waits"] == 1
+        injector.start()
+        try:
+            return await asyncio.wait_for(pull, 1)
+        finally:
+            injector.stop()
+
+    assert asyncio.run(main()) == "hello"
@@ -0,0 +1,179 @@
+"""The UDP motion channel over a link that loses, reorders and
+duplicates datagrams: the totals must still converge, and the counters
+must say what the link did."""
+
+import asyncio
+import json
+import random
+
+from mows.motion import _BODY, DATAGRAM_SIZE, MAC_BYTES, MotionEndpoint, MotionSender, _mac
+
+
+class _BadLink:
+    """Stands in for the sender's UDP socket: loses, duplicates and
+    holds back datagrams, then hands them over in the order they arrive."""
+
+    def __init__(self, seed: int, loss=0.2, duplicate=0.1, reorder=0.2):
+        self._random = random.Random(seed)
+        self.loss, self.duplicate, self.reorder = loss, duplicate, reorder
+        self.arrived = []
+        self._held = []
+
+    def send(self, datagram: bytes):
+        r = self._random
+        if r.random() < self.loss:
+            return
+        copies = 2 if r.random() < self.duplicate else 1
+        for _ in range(copies):
+            if r.random() < self.reorder:
+                self._held.append(datagram)
+            else:
+                self.arrived.append(datagram)
+                if self._held and r.random() < 0.5:  # a held one arrives late
+                    self.arrived.append(self._held.pop(r.randrange(len(self._held))))
+
+    def drain(self) -> list:
+        arrived, self.arrived = self.arrived + self._held, []
+        self._held = []
+        return arrived
+
+    def close(self):
+        pass
+
+
+def _expected_counters(seqs: list) -> dict:
+    newest = lost = reordered = duplicates = 0
+    for seq in seqs:
+        if seq > newest:
+            lost += seq - newest - 1
+            newest = seq
+        elif seq == newest:
+            duplicates += 1
+        else:
+            reordered += 1
+    return {"udp_received": len(seqs), "udp_lost": lost, "udp_reordered": reordered,
+            "udp_duplicates": duplicates, "udp_rejected": 0}
+
+
+def _pair(loop, link=None, loss=0.0, port=9):
+    endpoint = MotionEndpoint()
+    channel = endpoint.open()
+    sender = MotionSender(loop, "127.0.0.1", port, channel.channel, channel.key, loss)
+    if link is not None:
+        sender._sock.close()
+        sender._sock = link
+    return endpoint, channel, sender
+
+
+def test_totals_converge_over_a_bad_link():
+    async def run():
+        link = _BadLink(seed=17)
+        endpoint, channel, sender = _pair(asyncio.get_running_loop(), link)
+        r = random.Random(3)
+        moves = [(r.randint(-9, 9), r.randint(-9, 9)) for _ in range(2000)]
+        applied = [0, 0]
+
+        def on_motion(ch):
+            dx, dy = ch.pending()
+            applied[0] += dx
+            applied[1] += dy
+            ch.applied()
+        channel.on_motion = on_motion
+
+        for dx, dy in moves:
+            sender.move(dx, dy)
+        arrived = link.drain()
+        for datagram in arrived:
+            endpoint.datagram_received(datagram, None)
+        seqs = [_BODY.unpack_from(d)[1] for d in arrived]
+        assert channel.stats() == _expected_counters(seqs)
+        assert channel.lost and channel.reordered and channel.duplicates
+
+        # the reliable sync brings the rest, however much was lost
+        channel.sync(json.loads(sender.sync()))
+        on_motion(channel)
+        assert applied == [sum(dx for dx, _ in moves), sum(dy for _, dy in moves)]
+        assert channel.pending() == (0, 0)
+        assert sender.sync() is None  # nothing new since
+        sender.close()
+
+    asyncio.run(run())
+
+
+def test_counters_by_hand():
+    async def run():
+        link = _BadLink(seed=0, loss=0, duplicate=0, reorder=0)
+        endpoint, channel, sender = _pair(asyncio.get_running_loop(), link)
+        for _ in range(5):
+            sender.move(1, -1)
+        d = link.drain()
+        for i in (0, 2, 1, 2, 4):  # seq 1, 3, 2 (late), 3 (again), 5
+            endpoint.datagram_received(d[i], None)
+        assert channel.stats() == {"udp_received": 5, "udp_lost": 2, "udp_reordered": 1,
+                                   "udp_duplicates": 1, "udp_rejected": 0}
+        assert channel.pending() == (5, -5)
+        sender.close()
+
+    asyncio.run(run())
+
+
+def test_forged_and_stale_datagrams():
+    async def run():
+        link = _BadLink(seed=0, loss=0, duplicate=0, reorder=0)
+        endpoint, channel, sender = _pair(asyncio.get_running_loop(), link)
+        sender.move(10, 20)
+        sender.move(1, 1)
+        first, second = link.drain()
+        moved = []
+        channel.on_motion = lambda ch: moved.append(ch.pending())
+
+        bad_mac = second[:-1] + bytes([second[-1] ^ 1])
+        endpoint.datagram_received(bad_mac, None)
+        body = _BODY.pack(channel.channel, 99, 1000, 1000)
+        endpoint.datagram_received(body + _mac(b"\0" * 32, body), None)  # wrong key
+        endpoint.datagram_received(second[:-1], None)  # truncated
+        assert channel.rejected == 3 and channel.received == 0 and not moved
+
+        endpoint.datagram_received(second, None)
+        endpoint.datagram_received(first, None)  # stale: counted, not applied
+        assert moved == [(11, 21)]
+        assert channel.received == 2 and channel.reordered == 1
+
+        other = _BODY.pack(channel.channel + 1, 1, 5, 5)
+        endpoint.datagram_received(other + _mac(channel.key, other), None)
+        endpoint.datagram_received(b"\1\2", None)
+        assert endpoint.unknown == 2
+        assert len(first) == DATAGRAM_SIZE == _BODY.size + MAC_BYTES
+        sender.close()
+
+    asyncio.run(run())
+
+
+def test_loopback_with_loss_and_tail_repeat():
+    """Over a real UDP socket, with the sender dropping 30% on purpose;
+    the last datagram of a burst is repeated after TAIL."""
+    async def run():
+        loop = asyncio.get_running_loop()
+        endpoint = MotionEndpoint()
+        transport, _ = await loop.create_datagram_endpoint(lambda: endpoint,
+                                                           local_addr=("127.0.0.1", 0))
+        port = transport.get_extra_info("sockname")[1]
+        channel = endpoint.open()
+        sender = MotionSender(loop, "127.0.0.1", port, channel.channel, channel.key, loss=0.3)
+        random.seed(5)
+        try:
+            for _ in range(1000):
+                sender.move(1, 2)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if channel.seq == 1000:
+                    break
+            assert sender.dropped and channel.lost
+            if channel.seq < 1000:  # the repeat was dropped too
+                channel.sync(json.loads(sender.sync()))
+            assert (channel.dx, channel.dy) == (1000, 2000)
+        finally:
+            sender.close()
+            transport.close()
+
+    asyncio.run(run())
@@ -0,0 +1,80 @@
+import math
+
+import pytest
+
+from mows import pointer
+from mows.backends import RecordingBackend
+from mows.pointer import Pointer
+from mows.server import _make_injection
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock that only moves when the test says so."""
+    now = [100.0]
+    monkeypatch.setattr(pointer.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _play(p: Pointer, clock) -> float:
+    """Run the injector's tick loop on ``clock``; seconds it took."""
+    start = clock[0]
+    while (delay := p.tick()) is not None:
+        clock[0] += delay
+    return clock[0] - start
+
+
+def test_sensitivity_carries_remainders():
+    moves = []
+    p = Pointer(lambda dx, dy: moves.append((dx, dy)), sensitivity=0.5)
+    for _ in range(101):
+        p.move(1, -1)
+    assert (sum(dx for dx, _ in moves), sum(dy for _, dy in moves)) == (50, -50)
+    assert p.moves == 50 and set(moves) == {(1, -1)}
+
+
+def test_sensitivity_above_one():
+    moves = []
+    p = Pointer(lambda dx, dy: moves.append((dx, dy)), sensitivity=1.5)
+    for _ in range(4):
+        p.move(1, 0)
+    assert moves == [(1, 0), (2, 0), (1, 0), (2, 0)]
+
+
+def test_interpolation_spreads_a_move_over_one_refresh(clock):
+    moves = []
+    p = Pointer(lambda dx, dy: moves.append((dx, dy)), refresh_hz=60)
+    p.move(32, 0)
+    assert not moves
+    took = _play(p, clock)
+    assert sum(dx for dx, _ in moves) == 32 and all(dy == 0 for _, dy in moves)
+    assert len(moves) == math.ceil((1 / 60) / pointer.STEP)  # one per STEP
+    assert all(0 < dx <= 2 for dx, _ in moves)
+    assert took <= 1 / 60
+
+
+def test_new_motion_extends_playback(clock):
+    moves = []
+    p = Pointer(lambda dx, dy: moves.append((dx, dy)), refresh_hz=100)
+    p.move(10, -10)
+    p.tick()
+    clock[0] += 0.005
+    p.move(10, -10)
+    _play(p, clock)
+    assert (sum(dx for dx, _ in moves), sum(dy for _, dy in moves)) == (20, -20)
+
+
+def test_click_settles_motion_first(clock):
+    backend = RecordingBackend()
+    p = Pointer(backend.move, refresh_hz=60)
+    apply = _make_injection(backend, pointer=p)
+    apply({"type": "mouse_move", "dx": 100, "dy": 7})
+    p.tick()  # one micro-move played
+    apply({"type": "mouse_click", "button": "left", "pressed": True})
+    apply({"type": "mouse_scroll", "dx": 0, "dy": 1})
+    calls = [(method, *args) for _, method, args in backend.calls]
+    assert calls[-2:] == [("button", "left", True), ("scroll", 0, 1)]
+    moved = calls[:-2]
+    assert len(moved) == 2 and all(call[0] == "move" for call in moved)
+    assert (sum(c[1] for c in moved), sum(c[2] for c in moved)) == (100, 7)
+    assert p.tick() is None  # nothing left to play
@@ -0,0 +1,139 @@
+import enum
+import json
+
+import pytest
+from pynput.keyboard import Key, KeyCode
+from pynput.mouse import Button
+
+from mows import protocol
+from mows.protocol import (FLAG_TIME, KIND_NAMED, OP_FRAME, BinaryCodec, JsonCodec, decode_frame,
+                           decode_message, peek_stamp, stamp, unstamp)
+
+CODECS = [JsonCodec, BinaryCodec]
+
+
+class _Extra(enum.Enum):
+    """A button with no id in protocol.BUTTONS, sent by name."""
+    button99 = 99
+
+
+def _events(codec):
+    """(encoded event, the dict it decodes to) for every event type."""
+    return [
+        (codec.mouse_move(3, -7), {"type": "mouse_move", "dx": 3, "dy": -7}),
+        (codec.mouse_position(0.25, 0.75), {"type": "mouse_position", "x": 0.25, "y": 0.75}),
+        (codec.mouse_click(Button.left, True),
+         {"type": "mouse_click", "button": "left", "pressed": True}),
+        (codec.mouse_click(Button.right, False),
+         {"type": "mouse_click", "button": "right", "pressed": False}),
+        (codec.mouse_click(_Extra.button99, True),
+         {"type": "mouse_click", "button": "button99", "pressed": True}),
+        (codec.mouse_scroll(0, -2), {"type": "mouse_scroll", "dx": 0, "dy": -2}),
+        (codec.key_press(Key.alt), {"type": "key_press", "key": {"kind": "special", "name": "alt"}}),
+        (codec.key_release(Key.alt),
+         {"type": "key_release", "key": {"kind": "special", "name": "alt"}}),
+        (codec.key_press(KeyCode.from_char("é")),
+         {"type": "key_press", "key": {"kind": "char", "char": "é"}}),
+        (codec.key_release(KeyCode.from_vk(65027)),
+         {"type": "key_release", "key": {"kind": "vk", "vk": 65027}}),
+    ]
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.__name__)
+def test_every_event_round_trips(codec):
+    for message, event in _events(codec):
+        assert isinstance(message, bytes if codec is BinaryCodec else str)
+        assert decode_message(message) == event
+        assert decode_frame(message) == [event]
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.__name__)
+def test_decoded_keys_rebuild_pynput_keys(codec):
+    for key in (Key.alt, KeyCode.from_char("q"), KeyCode.from_vk(65027)):
+        assert protocol.deserialize_key(decode_message(codec.key_press(key))["key"]) == key
+    assert protocol.deserialize_button(decode_message(codec.mouse_click(Button.middle, 1))["button"]) \
+        == Button.middle
+
+
+def test_clipboard_chunk():
+    data = bytes(range(256))
+    event = decode_message(BinaryCodec.clipboard_chunk(7, 3, data))
+    assert event == {"type": "clipboard_chunk", "id": 7, "seq": 3, "data": data}
+    event = decode_message(JsonCodec.clipboard_chunk(7, 3, data))
+    assert event["id"] == 7 and event["seq"] == 3
+    assert protocol.base64.b64decode(event["data"]) == data
+
+
+def test_named_key():
+    assert protocol.unpack_key(bytes([KIND_NAMED]) + b"hyper") == {"kind": "special", "name": "hyper"}
+
+
+def test_unknown_opcode():
+    with pytest.raises(ValueError):
+        decode_message(bytes([0x7f, 0, 0]))
+
+
+def test_json_events_start_with_type():
+    # stamp() and peek_stamp() read JSON events without decoding them,
+    # relying on the constructors writing "type" first
+    for message, _ in _events(JsonCodec):
+        assert message.startswith('{"type": "')
+    assert JsonCodec.clipboard_chunk(1, 1, b"x").startswith('{"type": "')
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.__name__)
+def test_stamp(codec):
+    t = 1_234_567_890_123
+    for message, event in _events(codec):
+        stamped = stamp(message, t)
+        assert decode_message(stamped) == dict(event, t=t)
+        assert peek_stamp(stamped) == (event["type"], t)
+        assert unstamp(stamped) == message
+        if codec is BinaryCodec:
+            assert stamped[0] == message[0] | FLAG_TIME
+        else:
+            assert next(iter(json.loads(stamped))) == "t"
+
+
+def test_peek_stamp_type_not_first():
+    message = stamp(json.dumps({"dx": 1, "dy": 2, "type": "mouse_move"}), 42)
+    assert peek_stamp(message) == ("mouse_move", 42)
+    message = stamp(json.dumps({"type": "mouse_move", "dx": 1, "dy": 2}, separators=(",", ":")), 42)
+    assert peek_stamp(message) == ("mouse_move", 42)
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.__name__)
+def test_frame(codec):
+    pairs = _events(codec)
+    messages = [m for m, _ in pairs]
+    messages[0] = stamp(messages[0], 99)
+    expected = [e for _, e in pairs]
+    expected[0] = dict(expected[0], t=99)
+    frame = codec.frame(messages)
+    if codec is BinaryCodec:
+        assert frame[0] == OP_FRAME
+    assert decode_frame(frame) == expected
+
+
+def test_frame_of_one_and_of_many():
+    moves = [BinaryCodec.mouse_move(i, -i) for i in range(protocol.MAX_FRAME_EVENTS)]
+    assert decode_frame(BinaryCodec.frame(moves[:1])) == [decode_message(moves[0])]
+    assert [e["dx"] for e in decode_frame(BinaryCodec.frame(moves))] == list(range(len(moves)))
+    assert decode_frame(JsonCodec.frame([JsonCodec.mouse_move(1, 1)])) == \
+        [{"type": "mouse_move", "dx": 1, "dy": 1}]
+
+
+def test_memoized_constructors_return_the_same_message():
+    assert JsonCodec.key_press(Key.alt) is JsonCodec.key_press(Key.alt)
+    assert BinaryCodec.mouse_click(Button.left, True) is BinaryCodec.mouse_click(Button.left, True)
+
+
+def test_display_path():
+    assert protocol.display_path(None) == ""
+    for name in (":3", "host:0.1", "a b"):
+        assert protocol.path_display(protocol.display_path(name)) == name
+    assert protocol.path_display("/") is None
+    assert protocol.path_display("/?x=1") is None
+    for bad in ("/display/", "/other"):
+        with pytest.raises(ValueError):
+            protocol.path_display(bad)
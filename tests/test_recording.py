@@ -0,0 +1,56 @@
+import pytest
+
+from mows.protocol import BinaryCodec, decode_message
+from mows.recording import INDEX_EVERY, Recording, RecordingError, RecordWriter
+
+N = 3 * INDEX_EVERY + 5
+
+
+def _write(path, overwrite=False, n=N):
+    writer = RecordWriter(str(path), overwrite)
+    for i in range(n):
+        writer.add(1_000_000 * i, BinaryCodec.mouse_move(i, -i))
+    return writer
+
+
+def test_round_trip_and_seek(tmp_path):
+    path = tmp_path / "session.mrec"
+    _write(path).close()
+    with Recording(str(path)) as rec:
+        assert rec.count == N and rec.duration == 1_000_000 * (N - 1)
+        assert len(rec.index) == 4
+        events = list(rec.events())
+        assert [t for t, _ in events] == [1_000_000 * i for i in range(N)]
+        assert decode_message(events[7][1]) == {"type": "mouse_move", "dx": 7, "dy": -7}
+        t0 = 1_000_000 * 2000
+        part = list(rec.events(t0, t0 + 2_000_000))
+        assert [t for t, _ in part] == [t0, t0 + 1_000_000, t0 + 2_000_000]
+
+
+def test_without_footer(tmp_path):
+    path = tmp_path / "killed.mrec"
+    writer = _write(path)
+    writer.flush()  # the recorder dies before close()
+    with Recording(str(path)) as rec:
+        assert rec.count == N and len(rec.index) == 4
+        assert len(list(rec.events())) == N
+    writer.close()
+
+
+def test_refuses_to_overwrite(tmp_path):
+    path = tmp_path / "session.mrec"
+    _write(path, n=10).close()
+    before = path.read_bytes()
+    with pytest.raises(FileExistsError):
+        RecordWriter(str(path))
+    assert path.read_bytes() == before
+    _write(path, overwrite=True, n=3).close()
+    with Recording(str(path)) as rec:
+        assert rec.count == 3
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"not a recording at all")
+    with pytest.raises(RecordingError):
+        Recording(str(path))
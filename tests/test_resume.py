@@ -0,0 +1,207 @@
+import asyncio
+import json
+
+from pynput.keyboard import Key
+from pynput.mouse import Button
+
+from mows import client, server
+from mows.arbiter import Arbiter
+from mows.backlog import Backlog
+from mows.protocol import BinaryCodec, JsonCodec, decode_message
+from mows.resume import ReplayBuffer, Sessions
+
+ALT = {"kind": "special", "name": "alt"}
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+class _Client:
+    def __init__(self):
+        self.session = None
+        self.websocket = _Socket()
+
+
+class _Injector:
+    def __init__(self):
+        self.events = []
+
+    async def put(self, event, producer=None):
+        self.events.append(event)
+
+
+# ── replay overflow ───────────────────────────────────────────────
+
+def test_overflow_carries_dropped_release():
+    for codec in (JsonCodec, BinaryCodec):
+        replay = ReplayBuffer(limit=4)
+        replay.add([codec.key_press(Key.alt), codec.mouse_move(1, 1)])
+        replay.ack(1)  # the server has the press
+        replay.add([codec.key_release(Key.alt)] + [codec.mouse_move(1, 1)] * 4)
+        assert len(replay) == 4 and replay.dropped == 2
+        hello = json.loads(replay.hello("s"))
+        assert hello["next"] == 4 and hello["last"] == 7
+        assert hello["release"] == [{"type": "key_release", "key": ALT}]
+        replay.welcomed()
+        assert "release" not in json.loads(replay.hello("s"))
+
+
+def test_overflow_carries_only_the_last_release():
+    replay = ReplayBuffer(limit=1)
+    codec = BinaryCodec
+    replay.add([codec.key_press(Key.alt), codec.key_release(Key.alt), codec.key_press(Key.alt),
+                codec.mouse_move(1, 1)])
+    assert not replay.released  # alt was pressed again: its next release is the one owed
+    replay.add([codec.mouse_click(Button.left, False), codec.key_release(Key.alt),
+                codec.mouse_move(1, 1)])
+    assert json.loads(replay.hello("s"))["release"] == [
+        {"type": "mouse_click", "button": "left", "pressed": False},
+        {"type": "key_release", "key": ALT}]
+
+
+def test_acked_release_is_not_carried():
+    replay = ReplayBuffer(limit=1)
+    replay.add([JsonCodec.key_release(Key.alt), JsonCodec.mouse_move(1, 1)])
+    assert replay.released
+    replay.ack(1)  # the server saw it after all
+    assert not replay.released
+    assert "release" not in json.loads(replay.hello("s"))
+
+
+def test_hello_release_only_for_held_input():
+    sessions = Sessions(grace=0)
+    arbiter = Arbiter()
+    injector = _Injector()
+    client = _Client()
+
+    async def main():
+        hello = {"type": "hello", "session": "s", "next": 1, "last": 0}
+        await server._dispatch(dict(hello), client, injector, None, sessions, arbiter)
+        await server._dispatch({"type": "key_press", "key": ALT}, client, injector, None,
+                               sessions, arbiter)
+        client.session.owner = None  # the connection dropped
+        release = [{"type": "key_release", "key": ALT},
+                   {"type": "mouse_click", "button": "left", "pressed": False}]
+        await server._dispatch({**hello, "next": 2, "last": 1, "release": release},
+                               client, injector, None, sessions, arbiter)
+
+    asyncio.run(main())
+    assert injector.events == [{"type": "key_press", "key": ALT},
+                               {"type": "key_release", "key": ALT}]
+    assert client.websocket.sent[-1]["resumed"] is True
+    assert not client.session.keys
+
+
+# ── offline input ─────────────────────────────────────────────────
+
+def test_offline_input_is_compacted_not_replayed():
+    toggles = []
+
+    async def main():
+        queue, unsent = Backlog(), Backlog(limit=8)
+        for _ in range(20):
+            queue.put_nowait(BinaryCodec.mouse_move(1, 2))
+        queue.put_nowait(client._TOGGLE)
+        queue.put_nowait(client._LOST)
+        queue.put_nowait(BinaryCodec.key_press(Key.alt))
+        stopped = await client._offline(queue, unsent, 0.05, lambda: toggles.append(1))
+        return stopped, [unsent.get_nowait() for _ in range(unsent.qsize())], unsent
+
+    stopped, events, unsent = asyncio.run(main())
+    assert not stopped and toggles == [1]
+    events = [decode_message(e) for e in events]
+    assert len(events) <= 8 and unsent.compacted > 0
+    assert events[-1] == {"type": "key_press", "key": ALT}
+    assert sum(e["dx"] for e in events[:-1]) == 20 and sum(e["dy"] for e in events[:-1]) == 40
+
+
+def test_offline_stops_on_ctrl_esc():
+    async def main():
+        queue = Backlog()
+        queue.put_nowait(None)
+        return await client._offline(queue, Backlog(), 10, None)
+
+    assert asyncio.run(main()) is True
+
+
+# ── sessions ──────────────────────────────────────────────────────
+
+def _hello(replay: ReplayBuffer) -> dict:
+    return json.loads(replay.hello("s"))
+
+
+def test_resume_drops_duplicates():
+    sessions = Sessions()
+    replay = ReplayBuffer()
+    replay.add([JsonCodec.mouse_move(1, 0)] * 5)
+    session, resumed = sessions.resume(_hello(replay), "a")
+    assert not resumed
+    assert all(session.accept({}) for _ in range(3))  # the connection dropped after 3
+    replay.add([JsonCodec.mouse_move(1, 0)] * 2)
+    session.owner = None
+    again, resumed = sessions.resume(_hello(replay), "b")
+    assert again is session and resumed
+    accepted = [session.accept({}) for _ in replay.pending()]
+    assert accepted == [False] * 3 + [True] * 4
+    assert session.duplicates == 3 and session.received == 7
+
+
+def test_ack_every_64():
+    session, _ = Sessions().resume({"session": "s", "next": 1, "last": 0}, "a")
+    replay = ReplayBuffer()
+    acks = []
+    for _ in range(200):
+        replay.add([JsonCodec.mouse_move(1, 0)])
+        session.accept({})
+        if session.ack_due():
+            acks.append(json.loads(session.ack_message())["seq"])
+            replay.ack(acks[-1])
+    assert acks == [64, 128, 192]
+    assert len(replay) == 8
+
+
+def test_stale_replay_is_dropped():
+    sessions = Sessions()
+    replay = ReplayBuffer()
+    replay.add([JsonCodec.mouse_move(1, 0)] * 10)
+    replay.ack(4)
+    session, resumed = sessions.resume(_hello(replay), "a")  # the server restarted
+    assert not resumed
+    assert not any(session.accept({}) for _ in replay.pending())
+    assert session.duplicates == 6
+    assert session.accept({}) and session.received == 11
+    client._welcome({"type": "welcome", "session": "s", "ack": 0, "resumed": False}, replay)
+    assert len(replay) == 0 and replay.pending() == []
+
+
+def test_release_after_grace():
+    released = []
+
+    async def release(session):
+        released.append(session.release_events())
+
+    async def main():
+        sessions = Sessions(grace=0.05)
+        arbiter = Arbiter()
+        session, _ = sessions.resume({"session": "s", "next": 1, "last": 0}, "a")
+        arbiter.admit(session, {"type": "key_press", "key": ALT})
+        arbiter.admit(session, {"type": "mouse_click", "button": "left", "pressed": True})
+        sessions.detach(session, "b", release)  # not the connection feeding it
+        assert session.owner == "a"
+        sessions.detach(session, "a", release)
+        await asyncio.sleep(0.02)
+        resumed, ok = sessions.resume({"session": "s", "next": 1, "last": 0}, "c")
+        assert ok and resumed is session  # back within the grace period
+        sessions.detach(session, "c", release)
+        await asyncio.sleep(0.1)
+        assert released == [[{"type": "key_release", "key": ALT},
+                             {"type": "mouse_click", "button": "left", "pressed": False}]]
+        _, ok = sessions.resume({"session": "s", "next": 1, "last": 0}, "d")
+        assert not ok  # forgotten
+
+    asyncio.run(main())
@@ -0,0 +1,18 @@
+"""Import time of each command's modules, against the budgets the
+startup.import benchmark enforces (python -X importtime)."""
+
+import pytest
+
+from mows import bench
+
+LIGHT = {"help", "copy_session"}  # commands that must not load the heavy packages
+
+
+@pytest.mark.parametrize("variant", list(bench.STARTUP_IMPORTS))
+def test_import_budget(variant):
+    runs = [bench._import_us(bench.STARTUP_IMPORTS[variant]) for _ in range(3)]
+    us = min(us for us, _ in runs)
+    budget = bench.BUDGETS[f"startup.import.{variant}"]
+    assert us <= budget, f"{variant} imports in {us} us, budget {budget} us"
+    if variant in LIGHT:
+        assert runs[0][1] == [], f"{variant} loads {runs[0][1]}"
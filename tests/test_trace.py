@@ -0,0 +1,49 @@
+import json
+
+from mows.trace import INJECTOR, Tracer, merge
+
+OFFSET = 5_000_000_000  # server clock - client clock, ns
+
+
+def test_sampling_picks_the_same_events_on_both_ends():
+    client, server = Tracer("c", "client", 8), Tracer("s", "server", 8)
+    captured = [1_000_000_000 + i * 1_234_567 for i in range(4000)]
+    picked = [t for t in captured if client.sampled(t)]
+    assert picked == [t for t in captured if server.sampled(t)]
+    assert 300 < len(picked) < 700  # about 1 in 8
+    assert all(Tracer("x", "client", 1).sampled(t) for t in captured[:10])
+
+
+def test_unstamped_calls_sample_every_nth():
+    tracer = Tracer("x", "client", 3)
+    assert [tracer.sampled(None) for _ in range(7)] == [False, False, True] * 2 + [False]
+
+
+def test_merge_moves_client_spans_onto_server_clock(tmp_path, capsys):
+    client = Tracer(str(tmp_path / "client.json"), "client")
+    client.span("ws.send", 2_000_000, 2_500_000)
+    client.clock_offset = OFFSET
+    client.write()
+    server = Tracer(str(tmp_path / "server.json"), "server")
+    server.span("inject", OFFSET + 3_000_000, OFFSET + 3_100_000, INJECTOR, {"type": "mouse_move"})
+    server.write()
+    stale = Tracer(str(tmp_path / "stale.json"), "client")  # never learned the offset
+    stale.span("ws.send", 7_000_000, 7_001_000)
+    stale.write()
+
+    out = tmp_path / "merged.json"
+    merge([server.path, client.path, stale.path], str(out))
+    assert "no clock offset recorded" in capsys.readouterr().out
+    with open(out) as f:
+        events = json.load(f)["traceEvents"]
+    spans = {(e["pid"], e["name"]): e for e in events if e["ph"] == "X"}
+    assert spans[1, "inject"]["ts"] == (OFFSET + 3_000_000) / 1e3
+    assert spans[1, "inject"]["args"] == {"type": "mouse_move"}
+    assert spans[2, "ws.send"]["ts"] == (OFFSET + 2_000_000) / 1e3
+    assert spans[2, "ws.send"]["dur"] == 500.0
+    assert spans[3, "ws.send"]["ts"] == 7_000.0  # left on its own clock
+    # the client's send comes before the server's injection on one timeline
+    assert spans[2, "ws.send"]["ts"] < spans[1, "inject"]["ts"]
+    names = [e["args"]["name"] for e in events if e["name"] == "process_name"]
+    assert names == [f"mows server ({server.path})", f"mows client ({client.path})",
+                     f"mows client ({stale.path})"]
@@ -0,0 +1,204 @@
+"""XTest injection read back from a private Xvfb server: the pointer
+with XQueryPointer, keys with XQueryKeymap.  Skipped without Xvfb."""
+
+import ctypes
+import time
+
+import pytest
+
+from mows.backends import make_backend
+from mows.screen import libx11
+from mows.xtest import XTest
+
+Button1Mask, Button3Mask = 1 << 8, 1 << 10
+
+
+class _Probe:
+    """A second X connection reading the state the backend left behind."""
+
+    def __init__(self, name: str):
+        x11 = self.x11 = libx11()
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XQueryKeymap.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        ulong_p, int_p = ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int)
+        x11.XQueryPointer.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ulong_p, ulong_p,
+                                      int_p, int_p, int_p, int_p, ctypes.POINTER(ctypes.c_uint)]
+        self.dpy = x11.XOpenDisplay(name.encode())
+        assert self.dpy
+
+    def pointer(self) -> tuple:
+        """(x, y, button and modifier mask)"""
+        c = ctypes
+        root, child = c.c_ulong(), c.c_ulong()
+        x, y, wx, wy, mask = c.c_int(), c.c_int(), c.c_int(), c.c_int(), c.c_uint()
+        self.x11.XQueryPointer(self.dpy, self.x11.XDefaultRootWindow(self.dpy), c.byref(root),
+                               c.byref(child), c.byref(x), c.byref(y), c.byref(wx), c.byref(wy),
+                               c.byref(mask))
+        return x.value, y.value, mask.value
+
+    def keys_down(self) -> set:
+        keymap = ctypes.create_string_buffer(32)
+        self.x11.XQueryKeymap(self.dpy, keymap)
+        return {i * 8 + b for i, byte in enumerate(keymap.raw) for b in range(8) if byte >> b & 1}
+
+    def keycode(self, keysym: int) -> int:
+        return self.x11.XKeysymToKeycode(self.dpy, keysym)
+
+    def close(self):
+        self.x11.XCloseDisplay(self.dpy)
+
+
+def _until(check, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return check()
+
+
+@pytest.fixture
+def display(xvfb):
+    name = xvfb(1)[0]
+    backend = make_backend("xtest", name)
+    probe = _Probe(name)
+    yield backend, probe
+    probe.close()
+    backend.close()
+
+
+def test_moves(display):
+    backend, probe = display
+    backend.move_to(100, 200)
+    backend.flush()
+    assert _until(lambda: probe.pointer()[:2] == (100, 200))
+    backend.move(15, -50)
+    backend.flush()
+    assert _until(lambda: probe.pointer()[:2] == (115, 150))
+    assert backend.desktop() == (0, 0, 1280, 800)
+
+
+def test_buttons(display):
+    backend, probe = display
+    backend.button("left", True)
+    backend.button("right", True)
+    backend.flush()
+    assert _until(lambda: probe.pointer()[2] & (Button1Mask | Button3Mask) == Button1Mask | Button3Mask)
+    backend.button("left", False)
+    backend.flush()
+    assert _until(lambda: probe.pointer()[2] & (Button1Mask | Button3Mask) == Button3Mask)
+    backend.button("right", False)
+    backend.flush()
+    assert _until(lambda: not probe.pointer()[2] & (Button1Mask | Button3Mask))
+
+
+def test_keys(display):
+    backend, probe = display
+    a = probe.keycode(ord("a"))
+    shift = probe.keycode(backend.keysym({"kind": "special", "name": "shift"}))
+    backend.key({"kind": "char", "char": "a"}, True)
+    backend.key({"kind": "special", "name": "shift"}, True)
+    backend.flush()
+    assert _until(lambda: {a, shift} <= probe.keys_down())
+    backend.key({"kind": "char", "char": "a"}, False)
+    backend.key({"kind": "special", "name": "shift"}, False)
+    backend.flush()
+    assert _until(lambda: not {a, shift} & probe.keys_down())
+
+
+def test_unmapped_key_uses_spare_keycode(display):
+    backend, probe = display
+    euro = {"kind": "char", "char": "€"}
+    backend.key(euro, True)
+    backend.flush()
+    spare = backend._keycode(backend.keysym(euro))
+    assert spare in backend._spares and _until(lambda: spare in probe.keys_down())
+    backend.key(euro, False)
+    backend.flush()
+    assert _until(lambda: spare not in probe.keys_down())
+
+
+def test_type_text_releases_everything(display):
+    backend, probe = display
+    backend.type_text("aB€\n\t")
+    backend.flush()
+    assert _until(lambda: not probe.keys_down())
+
+
+def test_type_text_special_key_without_keysym(display):
+    backend, _ = display
+    del backend._special["enter"]
+    with pytest.raises(ValueError, match="no keycode for '\\\\n'"):
+        backend.type_text("\n")
+
+
+def test_unmapped_keys_take_spares_in_turn(display):
+    backend, probe = display
+    chars = "€₽¤µ"
+    codes = [backend._keycode(backend.keysym({"kind": "char", "char": c})) for c in chars]
+    assert len(set(codes)) == len(chars) and set(codes) <= set(backend._spares)
+    assert [probe.keycode(backend.keysym({"kind": "char", "char": c})) for c in chars] == codes
+
+
+def test_unknown_button(display):
+    backend, _ = display
+    with pytest.raises(ValueError, match="unknown mouse button 'unknown'"):
+        backend.button("unknown", True)
+
+
+# ── without an X server ───────────────────────────────────────────
+
+class _Mapping:
+    """XChangeKeyboardMapping calls, recorded."""
+
+    def __init__(self):
+        self.bound = []
+
+    def XChangeKeyboardMapping(self, dpy, code, per, syms, count):
+        self.bound.append((code, syms[0]))
+
+    def XSync(self, dpy, discard):
+        pass
+
+
+def _offline_backend(spares: list) -> XTest:
+    backend = XTest.__new__(XTest)
+    backend._x11 = _Mapping()
+    backend._dpy = None
+    backend._spares = dict.fromkeys(spares)
+    backend._held = set()
+    backend._keycodes = {}
+    backend._key = backend._button = lambda *args: None
+    return backend
+
+
+def test_remap_rotates_least_recently_used():
+    backend = _offline_backend([250, 251, 252])
+    assert [backend._remap(sym) for sym in (1, 2, 3, 1, 4, 5)] == [250, 251, 252, 250, 251, 252]
+    # 1 was used again before 4 came, so 2 and then 3 made way
+    assert backend._x11.bound == [(250, 1), (251, 2), (252, 3), (251, 4), (252, 5)]
+
+
+def test_remap_never_rebinds_a_held_key():
+    backend = _offline_backend([250, 251])
+    backend._x11.XKeysymToKeycode = lambda dpy, keysym: 0
+    backend.key({"kind": "vk", "vk": 0x10020ac}, True)  # held down
+    assert backend._remap(2) == 251
+    assert backend._remap(3) == 251  # 250 is held
+    backend.key({"kind": "vk", "vk": 0x10020ac}, False)  # uses 250 again, so
+    assert backend._remap(4) == 251
+    backend.key({"kind": "vk", "vk": 5}, True)
+    backend.key({"kind": "vk", "vk": 6}, True)
+    with pytest.raises(ValueError, match="no keycode"):
+        backend.key({"kind": "vk", "vk": 7}, True)  # every spare is held
+
+
+def test_button_rejects_unknown_names():
+    backend = _offline_backend([])
+    backend.button("left", True)
+    with pytest.raises(ValueError, match="unknown mouse button"):
+        backend.button("unknown", True)